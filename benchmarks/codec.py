@@ -0,0 +1,68 @@
+"""
+Encoding and decoding of event states: eventsourcing's JSON transcoder
+compared with gqles.codec.
+
+    python -m benchmarks.codec --number 20000
+"""
+import argparse
+import json
+import timeit
+import uuid
+
+import eventsourcing.infrastructure.sequenceditemmapper
+
+import gqles.infrastructure
+
+import example.domain
+
+
+def measure(mapper, event, number):
+    item = mapper.item_from_event(event)
+
+    def encode():
+        mapper.item_from_event(event)
+
+    def decode():
+        mapper.event_from_item(item)
+
+    return dict(
+        bytes=len(item.state),
+        **{
+            name: number / min(timeit.repeat(func, number=number, repeat=3))
+            for name, func in (
+                ("encodePerSecond", encode),
+                ("decodePerSecond", decode),
+            )
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--number", type=int, default=10000)
+    args = parser.parse_args()
+
+    order = example.domain.Order.create(command_id=uuid.uuid4())
+    order.set_is_reserved(uuid.uuid4())
+    created, reserved = order.__batch_pending_events__()
+
+    options = dict(
+        sequence_id_attr_name="originator_id",
+        position_attr_name="originator_version",
+    )
+    mappers = dict(
+        json=eventsourcing.infrastructure.sequenceditemmapper
+        .SequencedItemMapper(**options),
+        binary=gqles.infrastructure.BinarySequencedItemMapper(**options),
+    )
+    print(json.dumps({
+        name: dict(
+            created=measure(mapper, created, args.number),
+            reserved=measure(mapper, reserved, args.number),
+        )
+        for name, mapper in mappers.items()
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare two result files of benchmarks.resolvers.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def key(result):
+    return (result["name"], result["pageSize"], result["applications"])
+
+
+def compare(before, after, statistic="median"):
+    """
+    Return:
+        [(key, before, after, ratio), ...] for the benchmarks in both.
+    """
+    previous = {key(result): result[statistic] for result in before["results"]}
+    return [
+        (key(result), previous[key(result)], result[statistic],
+         result[statistic] / previous[key(result)])
+        for result in after["results"]
+        if key(result) in previous
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--statistic", choices=["min", "median", "mean"], default="median",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.1,
+        help="Flag benchmarks that got slower by more than this ratio.",
+    )
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print("%s -> %s" % (before.get("commit"), after.get("commit")))
+    for (name, page_size, applications), old, new, ratio in compare(
+            before, after, args.statistic,
+    ):
+        print("%-28s page %4d apps %d  %9.2fms %9.2fms  x%.2f%s" % (
+            name, page_size, applications, old * 1e3, new * 1e3, ratio,
+            "  SLOWER" if ratio > args.threshold else "",
+        ))
+
+
+if __name__ == "__main__":
+    main()
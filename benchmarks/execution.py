@@ -0,0 +1,125 @@
+"""
+Per-request overhead of the backstage's execution pipeline.
+
+Compares a plain ariadne GraphQL app, configured like BackstageGraphQL
+used to be, with BackstageGraphQL using its document cache, with
+persisted queries, and with the stdlib serializer. Requests are made
+directly to the ASGI apps, without a server in between.
+
+    python -m benchmarks.execution --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import ariadne.asgi
+
+import gqles
+import gqles.application
+import gqles.dataloaders
+import gqles.execution
+import gqles.schema
+import gqles.validation
+
+import example.application
+import example.policies
+
+
+# Cheap to resolve, so what is measured is the pipeline around it.
+QUERY = """
+query GetEventLog($id: UUID!) {
+  event(applicationName: "commands", originatorId: $id, originatorVersion: 0) {
+    id
+    topic
+    originatorId
+    originatorVersion
+    previousEvents(last: 2) { pageInfo { hasPreviousPage } }
+  }
+  eventCache { hits misses entries size maxSize }
+}
+"""
+
+
+async def post(app, data):
+    body = json.dumps(data).encode()
+    scope = dict(
+        type="http", http_version="1.1", method="POST", scheme="http",
+        path="/", raw_path=b"/", query_string=b"", root_path="",
+        headers=[(b"content-type", b"application/json")],
+        client=("benchmark", 0), server=("benchmark", 80),
+    )
+    messages = [dict(type="http.request", body=body, more_body=False)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    assert sent[0]["status"] == 200, sent
+
+
+async def measure(app, data, requests):
+    # Warm up, so that caches are filled.
+    await post(app, data)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await post(app, data)
+    elapsed = time.perf_counter() - started
+
+    return dict(requests=requests, microsecondsPerRequest=elapsed / requests * 1e6)
+
+
+async def run(requests):
+    await gqles.application.start_system_runner(
+        example.application.SystemRunner(),
+    )
+    try:
+        command_id = example.policies.Commands.create_order()
+        variables = dict(id=str(command_id))
+        data = dict(query=QUERY, variables=variables)
+        persisted = dict(
+            variables=variables,
+            extensions=dict(persistedQuery=dict(
+                version=1, sha256Hash=gqles.execution.get_query_hash(QUERY),
+            )),
+        )
+
+        baseline = ariadne.asgi.GraphQL(
+            gqles.schema.schema,
+            context_value=gqles.dataloaders.get_context,
+            validation_rules=gqles.validation.get_validation_rules(),
+            extensions=[gqles.validation.QueryCostExtension],
+        )
+        backstage = gqles.BackstageGraphQL()
+        stdlib = gqles.BackstageGraphQL(
+            serializer=gqles.execution.dumps_stdlib,
+        )
+        # Register the persisted query.
+        await post(backstage, dict(data, **persisted))
+
+        return dict(
+            baseline=await measure(baseline, data, requests),
+            documentCache=await measure(backstage, data, requests),
+            documentCacheStdlibJSON=await measure(stdlib, data, requests),
+            persistedQuery=await measure(backstage, persisted, requests),
+        )
+    finally:
+        await gqles.application.close_system_runner()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(run(args.requests))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
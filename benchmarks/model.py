@@ -0,0 +1,185 @@
+"""
+Throughput of gqles.model.Model aggregates: construction, replay of
+their events, and attribute writes.
+
+Compares Model with the routing it used to have, looking up the class's
+own annotations on every write, and replays with and without validation
+of a model whose fields have validators.
+
+    python -m benchmarks.model --number 20000
+"""
+import argparse
+import contextlib
+import json
+import timeit
+import uuid
+
+import pydantic
+
+from typing import List, Optional
+
+from eventsourcing.domain.model.aggregate import AggregateRoot
+from eventsourcing.domain.model.decorators import subclassevents
+
+import gqles.model
+from gqles.model import Model, ModelMetaclassWithMetaDomainEntity
+
+
+class AnnotationsModel(
+        pydantic.BaseModel, metaclass=ModelMetaclassWithMetaDomainEntity,
+):
+
+    def __is_annotated(self, name):
+        try:
+            return name in self.__annotations__
+        except AttributeError:
+            return False
+
+    def __init__(self, **kwargs):
+        pydantic.BaseModel.__init__(self, **kwargs)
+        super(pydantic.BaseModel, self).__init__(**{
+            k: v for k, v in kwargs.items() if not self.__is_annotated(k)
+        })
+
+    def __setattr__(self, attr, value):
+        return (
+            super(AnnotationsModel, self) if self.__is_annotated(attr)
+            else super(pydantic.BaseModel, self)
+        ).__setattr__(attr, value)
+
+
+# Events are looked up by topic, the classes must be module-level.
+@subclassevents
+class Order(Model, AggregateRoot):
+
+    command_id: uuid.UUID
+    reservation_id: Optional[uuid.UUID]
+    payment_id: Optional[uuid.UUID]
+
+    class Reserved(AggregateRoot.Event):
+        def mutate(self, order):
+            order.reservation_id = self.reservation_id
+
+    class Paid(AggregateRoot.Event):
+        def mutate(self, order):
+            order.payment_id = self.payment_id
+
+
+@subclassevents
+class AnnotationsOrder(AnnotationsModel, AggregateRoot):
+
+    command_id: uuid.UUID
+    reservation_id: Optional[uuid.UUID]
+    payment_id: Optional[uuid.UUID]
+
+    class Reserved(AggregateRoot.Event):
+        def mutate(self, order):
+            order.reservation_id = self.reservation_id
+
+    class Paid(AggregateRoot.Event):
+        def mutate(self, order):
+            order.payment_id = self.payment_id
+
+
+class Line(pydantic.BaseModel):
+
+    sku: pydantic.constr(regex=r"^[A-Z]{3}-[0-9]{4}$")
+    quantity: pydantic.conint(gt=0)
+    price: pydantic.condecimal(ge=0, decimal_places=2)
+
+
+@subclassevents
+class Cart(Model, AggregateRoot):
+
+    customer_id: uuid.UUID
+    email: str
+    lines: List[Line]
+    note: Optional[str]
+
+
+def rate(func, number, trusted=False):
+    # Like the repository, trusted() is entered once for all the events
+    # of a load, not once per event: its overhead is left out.
+    with gqles.model.trusted() if trusted else contextlib.nullcontext():
+        return number / min(timeit.repeat(func, number=number, repeat=5))
+
+
+def replayer(events):
+
+    def replay():
+        aggregate = None
+        for event in events:
+            aggregate = event.__mutate__(aggregate)
+
+    return replay
+
+
+def measure(order_class, number):
+    order = order_class.__create__(command_id=uuid.uuid4())
+    order.__trigger_event__(order_class.Reserved, reservation_id=uuid.uuid4())
+    order.__trigger_event__(order_class.Paid, payment_id=uuid.uuid4())
+    events = order.__batch_pending_events__()
+
+    def construct():
+        order_class.__create__(command_id=uuid.uuid4())
+
+    def setattr_():
+        order.reservation_id = None
+        order.__head__ = None
+
+    return dict(
+        constructPerSecond=rate(construct, number),
+        replayPerSecond=rate(replayer(events), number),
+        setattrPerSecond=rate(setattr_, number),
+    )
+
+
+def measure_validation(number):
+    """
+    Replays of a cart of 20 lines, whose fields are validated unless
+    the replay is trusted.
+
+    The orders above only have a UUID to validate, which costs about as
+    much as assigning the fields without validating them: their replays
+    are dominated by checking the hash chain.
+    """
+    cart = Cart.__create__(
+        customer_id=uuid.uuid4(),
+        email="customer@example.com",
+        lines=[
+            dict(sku="SKU-%04d" % i, quantity=i + 1, price="9.99")
+            for i in range(20)
+        ],
+    )
+    events = cart.__batch_pending_events__()
+    replay = replayer(events)
+
+    # What the created event does to construct the aggregate, without
+    # checking the hash chain.
+    kwargs = events[0].__entity_kwargs__
+
+    def rehydrate():
+        Cart(**kwargs)
+
+    return dict(
+        replayPerSecond=rate(replay, number),
+        trustedReplayPerSecond=rate(replay, number, trusted=True),
+        rehydratePerSecond=rate(rehydrate, number),
+        trustedRehydratePerSecond=rate(rehydrate, number, trusted=True),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--number", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(json.dumps(dict(
+        model=measure(Order, args.number),
+        annotations=measure(AnnotationsOrder, args.number),
+        validation=measure_validation(args.number),
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Time the backstage resolvers against a seeded example system.
+
+Queries are executed with ariadne against gqles.schema, for several
+page sizes and application counts, and the results are written as JSON
+so they can be compared between commits with benchmarks.compare.
+
+    python -m benchmarks.resolvers --orders 200 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import ariadne
+
+import gqles.application
+import gqles.cache
+import gqles.schema
+
+import example.application
+
+import benchmarks.seed
+
+
+NOTIFICATIONS = """
+query ($last: Int, $applicationNames: [String!]) {
+  notifications(last: $last, applicationNames: $applicationNames) {
+    edges { node { notificationId topic event { timestamp } } }
+  }
+}
+"""
+
+APPLICATION_NOTIFICATIONS = """
+query ($last: Int) {
+  applications {
+    notifications(last: $last) {
+      edges { node { notificationId topic event { timestamp } } }
+    }
+  }
+}
+"""
+
+ORIGINATOR_EVENTS = """
+query ($uuids: [UUID!]!, $last: Int) {
+  insights(uuids: $uuids) {
+    originator {
+      events(last: $last) {
+        edges { node { originatorVersion timestamp } }
+      }
+    }
+  }
+}
+"""
+
+INSIGHTS = """
+query ($uuids: [UUID!]!) {
+  insights(uuids: $uuids) {
+    applicationName
+    originator { originatorId topic last { originatorVersion timestamp } }
+  }
+}
+"""
+
+EVENT = """
+query ($id: UUID!, $version: Int!) {
+  event(applicationName: "commands", originatorId: $id, originatorVersion: $version) {
+    topic
+    timestamp
+    stateInsight { key text }
+  }
+}
+"""
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def execute(query, variables):
+    success, result = await ariadne.graphql(
+        gqles.schema.schema,
+        dict(query=query, variables=variables),
+        context_value={},
+    )
+    assert success and "errors" not in result, result
+
+
+async def measure(query, variables, repeat, cold):
+    # One run to warm up the caches, unless they are cleared anyway.
+    if not cold:
+        await execute(query, variables)
+
+    samples = []
+    for _ in range(repeat):
+        if cold:
+            gqles.cache.event_cache.clear()
+        started = time.perf_counter()
+        await execute(query, variables)
+        samples.append(time.perf_counter() - started)
+
+    return dict(
+        samples=len(samples),
+        min=min(samples),
+        median=statistics.median(samples),
+        mean=statistics.mean(samples),
+    )
+
+
+async def run(args):
+    system_runner = await gqles.application.start_system_runner(
+        example.application.SystemRunner(),
+    )
+    try:
+        started = time.perf_counter()
+        command_ids = benchmarks.seed.seed(
+            system_runner, args.orders, extra_events=args.extra_events,
+        )
+        seeding = time.perf_counter() - started
+
+        names = list(system_runner.processes)
+        uuids = [str(command_id) for command_id in command_ids]
+        results = []
+
+        async def bench(name, query, variables, **parameters):
+            timing = await measure(query, variables, args.repeat, args.cold)
+            results.append(dict(name=name, **parameters, **timing))
+
+        for page_size in args.page_sizes:
+            for count in args.application_counts:
+                await bench(
+                    "Query.notifications", NOTIFICATIONS,
+                    dict(last=page_size, applicationNames=names[:count]),
+                    pageSize=page_size, applications=min(count, len(names)),
+                )
+            await bench(
+                "Application.notifications", APPLICATION_NOTIFICATIONS,
+                dict(last=page_size),
+                pageSize=page_size, applications=len(names),
+            )
+            await bench(
+                "Originator.events", ORIGINATOR_EVENTS,
+                dict(uuids=uuids[:1], last=page_size),
+                pageSize=page_size, applications=len(names),
+            )
+            await bench(
+                "Query.insights", INSIGHTS,
+                dict(uuids=uuids[:page_size]),
+                pageSize=min(page_size, len(uuids)),
+                applications=len(names),
+            )
+
+        await bench(
+            "Query.event", EVENT,
+            dict(id=uuids[-1], version=0),
+            pageSize=1, applications=1,
+        )
+
+        return dict(
+            commit=get_commit(),
+            python=platform.python_version(),
+            orders=args.orders,
+            extraEvents=args.extra_events,
+            repeat=args.repeat,
+            cold=args.cold,
+            seedingSeconds=seeding,
+            results=results,
+        )
+    finally:
+        await gqles.application.close_system_runner()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument(
+        "--extra-events", type=int, default=0,
+        help="Extra events recorded on every command.",
+    )
+    parser.add_argument(
+        "--page-sizes", type=int, nargs="+", default=[10, 50, 200],
+    )
+    parser.add_argument(
+        "--application-counts", type=int, nargs="+", default=[1, 2, 4],
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--cold", action="store_true",
+        help="Clear the decoded event cache before every sample.",
+    )
+    parser.add_argument("--output", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Seed the example system with orders.
+
+Every order goes through the whole saga, so it adds events to every
+application of example.policies.system. Extra events can be added to
+the commands, to get longer originator histories.
+"""
+import example.policies
+
+
+def seed(system_runner, orders, extra_events=0):
+    """
+    Create orders, and wait for the saga to process them.
+
+    Return:
+        The IDs of the commands that created the orders.
+    """
+    commands = system_runner.processes["commands"]
+
+    command_ids = []
+    for _ in range(orders):
+        command_id = example.policies.Commands.create_order()
+        if extra_events:
+            command = commands.repository[command_id]
+            for _ in range(extra_events):
+                # Setting the attribute again records an event.
+                command.order_id = command.order_id
+            command.__save__()
+        command_ids.append(command_id)
+
+    return command_ids
@@ -10,6 +10,10 @@ import sqlalchemy
 
 import gqles
 import gqles.application
+import gqles.database
+import gqles.export
+import gqles.metrics
+import gqles.profiling
 
 import example.application
 import example.database
@@ -22,13 +26,21 @@ app = FastAPI()
 
 app.mount("/backstage/graphql", gqles.BackstageGraphQL(
     debug=True,
+    profiling=True,
 ))
 
 app.mount("/graphql", GraphQL(
     example.schema.schema,
     debug=True,
+    extensions=[gqles.profiling.ProfilingExtension],
 ))
 
+app.add_route("/backstage/metrics", gqles.metrics.prometheus_endpoint)
+
+app.add_route(
+    "/backstage/export/{application}", gqles.export.export_endpoint,
+)
+
 origins = [
     "http://localhost:3000",
     "http://localhost:8080",
@@ -42,6 +54,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    gqles.database.SessionMiddleware,
+    session=example.database.ScopedSession,
+    read_session=example.database.ReadSession,
+)
+
 app.add_middleware(
     starlette_context.middleware.ContextMiddleware, plugins=(
         example.context.RequestHashPlugin(),
@@ -54,7 +72,7 @@ app.add_middleware(
 @app.on_event("startup")
 async def setup_application():
     await gqles.application.start_system_runner(
-        example.application.SystemRunner(),
+        example.application.make_system_runner(),
     )
 
 
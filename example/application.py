@@ -1,19 +1,27 @@
-from eventsourcing.application.sqlalchemy import SQLAlchemyApplication
+import os
+
 from eventsourcing.system.runner import SingleThreadedRunner
 
+import gqles.application
+import gqles.infrastructure
+
 import example.database
 
 import example.domain
 import example.policies
 
 
-class Application(SQLAlchemyApplication):
-    def __init__(self, session=None, **kwargs):
+class Application(gqles.infrastructure.SQLAlchemyApplication):
+    def __init__(self, session=None, read_session=None, **kwargs):
         # Sometimes session is passed as None explicitly,
         # we want to provide a default in that case.
         # TODO: When and why is it passed None? And why default?
+        # The default read session reads the default database only.
+        if session is None and read_session is None:
+            read_session = example.database.ReadSession
         super().__init__(
             session=session or example.database.ScopedSession,
+            read_session=read_session,
             **kwargs,
         )
 
@@ -25,3 +33,24 @@ class SystemRunner(SingleThreadedRunner):
             infrastructure_class=Application,
             setup_tables=True,
         )
+
+
+RUNNER_MODE = os.environ.get(
+    "RUNNER_MODE", gqles.application.SINGLE_THREADED,
+)
+
+
+def make_system_runner(mode=None):
+    """
+    Construct a runner for the example system, by default in the mode
+    set by the RUNNER_MODE environment variable.
+    """
+    mode = mode or RUNNER_MODE
+    if mode == gqles.application.SINGLE_THREADED:
+        return SystemRunner()
+    return gqles.application.make_system_runner(
+        example.policies.system,
+        mode=mode,
+        infrastructure_class=Application,
+        setup_tables=True,
+    )
@@ -1,18 +1,23 @@
-import starlette_context
-
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 
+import gqles.database
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///:memory:'
 
+# By default, the database is a temporary SQLite file, removed at exit,
+# so that commands written from worker threads and the backstage reads
+# have connections of their own, see gqles.database.create_engine.
+# Set DATABASE_URL, and the pool with DATABASE_POOL_SIZE,
+# DATABASE_MAX_OVERFLOW and DATABASE_POOL_RECYCLE. The backstage reads
+# from DATABASE_READ_URL, or else from the same database, through
+# DATABASE_READ_POOL_SIZE connections at most.
+settings = gqles.database.DatabaseSettings()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args=dict(
-        check_same_thread=False,
-    ),
-)
+SQLALCHEMY_DATABASE_URL = settings.url
+
+engine = gqles.database.create_engine(settings)
+
+# None for in-memory databases, read through the engine writing them.
+read_engine = gqles.database.create_read_engine(settings)
 
 
 SessionLocal = sessionmaker(
@@ -22,14 +27,14 @@ SessionLocal = sessionmaker(
 )
 
 
-def get_current_scope():
-    try:
-        return starlette_context.context["__scope_uuid"]
-    except RuntimeError:
-        return None
-
-
+# Each request has a session of its own, removed by
+# gqles.database.SessionMiddleware, each runner thread its own.
 ScopedSession = scoped_session(
     SessionLocal,
-    scopefunc=get_current_scope,
+    scopefunc=gqles.database.get_current_scope,
+)
+
+ReadSession = (
+    gqles.database.make_read_session(read_engine)
+    if read_engine is not None else None
 )
@@ -7,6 +7,7 @@ from eventsourcing.exceptions import OperationalError, RecordConflictError
 
 from eventsourcing.system.definition import System
 
+import gqles.intake
 
 import example.domain
 
@@ -68,6 +69,9 @@ class Payments(ProcessApplication):
         )
 
 
+intake = gqles.intake.CommandIntake("commands")
+
+
 class Commands(CommandProcess):
 
     PossibleExceptions = (OperationalError, RecordConflictError)
@@ -89,6 +93,12 @@ class Commands(CommandProcess):
     # The following is not part of the policy!
     # it's the "user interface" entry point.
     # that's why it's different.
+    @staticmethod
+    def record_create_order():
+        cmd = example.domain.CreateOrder.create()
+        cmd.__save__()
+        return cmd.id
+
     @staticmethod
     @retry(
         PossibleExceptions,
@@ -96,9 +106,13 @@ class Commands(CommandProcess):
         wait=0.01,
     )
     def create_order():
-        cmd = example.domain.CreateOrder.create()
-        cmd.__save__()
-        return cmd.id
+        return Commands.record_create_order()
+
+    # The retry above sleeps, async code must not block the event loop.
+    # Orders submitted together are recorded in a single transaction.
+    @staticmethod
+    async def submit_create_order():
+        return await intake.submit(example.domain.CreateOrder.create)
 
     @applicationpolicy
     def policy(self, repository, event):
@@ -21,7 +21,7 @@ types = [
 @mutation.field("createOrder")
 async def resolve_create_order(obj, info, input):
     return dict(created=dict(
-        uuid=example.policies.Commands.create_order(),
+        uuid=await example.policies.Commands.submit_create_order(),
     ))
 
 
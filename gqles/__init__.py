@@ -1,8 +1,177 @@
+import json
+
 from ariadne.asgi import GraphQL
+from ariadne.exceptions import HttpBadRequestError, HttpError
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
 
+import gqles.cache
+import gqles.caching
+import gqles.dataloaders
+import gqles.execution
+import gqles.profiling
 import gqles.schema
+import gqles.validation
 
 
 class BackstageGraphQL(GraphQL):
-    def __init__(self, **kwargs):
+    def __init__(
+            self,
+            event_cache_max_bytes=None,
+            max_cost=gqles.validation.DEFAULT_MAX_COST,
+            max_depth=gqles.validation.DEFAULT_MAX_DEPTH,
+            max_documents=gqles.execution.DEFAULT_MAX_DOCUMENTS,
+            max_persisted_queries=gqles.execution.DEFAULT_MAX_PERSISTED_QUERIES,
+            serializer=gqles.execution.default_serializer,
+            max_cached_responses=None,
+            profiling=False,
+            **kwargs,
+    ):
+        if event_cache_max_bytes is not None:
+            gqles.cache.event_cache.resize(event_cache_max_bytes)
+        kwargs.setdefault("context_value", gqles.dataloaders.get_context)
+        # Queries are costed and rejected before they are executed.
+        kwargs.setdefault(
+            "validation_rules",
+            gqles.validation.get_validation_rules(max_cost, max_depth),
+        )
+        extensions = [gqles.validation.QueryCostExtension]
+        if profiling:
+            extensions.append(gqles.profiling.ProfilingExtension)
+        kwargs.setdefault("extensions", extensions)
         super().__init__(gqles.schema.schema, **kwargs)
+        self.document_cache = gqles.execution.DocumentCache(
+            self.schema, maxsize=max_documents,
+        )
+        self.persisted_queries = gqles.execution.PersistedQueries(
+            maxsize=max_persisted_queries,
+        )
+        self.serializer = serializer
+        # Immutable responses to GET requests can be kept server side too.
+        self.response_cache = None
+        if max_cached_responses:
+            self.response_cache = gqles.caching.ResponseCache(
+                maxsize=max_cached_responses,
+            )
+
+    async def execute(self, request, data, context_value=None, **kwargs):
+        if context_value is None:
+            context_value = await self.get_context_for_request(request)
+        extensions = await self.get_extensions_for_request(request, context_value)
+        middleware = await self.get_middleware_for_request(request, context_value)
+
+        return await gqles.execution.graphql(
+            self.schema,
+            data,
+            document_cache=self.document_cache,
+            persisted_queries=self.persisted_queries,
+            context_value=context_value,
+            root_value=self.root_value,
+            validation_rules=self.validation_rules,
+            debug=self.debug,
+            introspection=self.introspection,
+            logger=self.logger,
+            error_formatter=self.error_formatter,
+            extensions=extensions,
+            middleware=middleware,
+            **kwargs,
+        )
+
+    async def handle_http(self, scope, receive, send):
+        request = Request(scope=scope, receive=receive)
+        if request.method == "GET" and (
+                "query" in request.query_params
+                or "extensions" in request.query_params
+        ):
+            response = await self.graphql_http_get(request)
+            await response(scope, receive, send)
+        else:
+            await super().handle_http(scope, receive, send)
+
+    def extract_data_from_get_request(self, request):
+        data = {}
+        for name in ("query", "operationName"):
+            if name in request.query_params:
+                data[name] = request.query_params[name]
+        for name in ("variables", "extensions"):
+            if name in request.query_params:
+                try:
+                    data[name] = json.loads(request.query_params[name])
+                except ValueError:
+                    raise HttpBadRequestError(
+                        "The %s parameter is not valid JSON" % name,
+                    )
+        return data
+
+    async def graphql_http_get(self, request):
+        """
+        Answer GET requests, with HTTP caching of immutable responses.
+        """
+        try:
+            data = self.extract_data_from_get_request(request)
+        except HttpError as error:
+            return PlainTextResponse(error.message or error.status, status_code=400)
+
+        key = gqles.caching.ResponseCache.key(data)
+        cached = None
+        # Profiled requests are executed, to be profiled.
+        if self.response_cache and not gqles.profiling.is_profiling_requested(
+                request,
+        ):
+            cached = self.response_cache.get(key)
+
+        if not cached:
+            context_value = await self.get_context_for_request(request)
+            success, response = await self.execute(
+                request, data, context_value=context_value, query_only=True,
+            )
+            body = self.serializer(response)
+
+            policy = None
+            if isinstance(context_value, dict):
+                policy = context_value.get(gqles.caching.CONTEXT_KEY)
+            if not (success and policy and policy.is_cacheable(response)):
+                if gqles.execution.is_persisted_query_not_found(response):
+                    success = True
+                return Response(
+                    body,
+                    status_code=200 if success else 400,
+                    media_type="application/json",
+                    headers={
+                        "Cache-Control": gqles.caching.MOVING_CACHE_CONTROL,
+                    },
+                )
+
+            cached = (gqles.caching.make_etag(body), body)
+            if self.response_cache is not None:
+                self.response_cache.put(key, cached)
+
+        etag, body = cached
+        headers = {
+            "ETag": etag,
+            "Cache-Control": gqles.caching.IMMUTABLE_CACHE_CONTROL,
+        }
+        if gqles.caching.etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            body, media_type="application/json", headers=headers,
+        )
+
+    async def graphql_http_server(self, request):
+        try:
+            data = await self.extract_data_from_request(request)
+        except HttpError as error:
+            return PlainTextResponse(error.message or error.status, status_code=400)
+
+        success, response = await self.execute(request, data)
+
+        # Clients retry with the full query when the hash is unknown,
+        # that is not an error of the request.
+        if gqles.execution.is_persisted_query_not_found(response):
+            success = True
+
+        return Response(
+            self.serializer(response),
+            status_code=200 if success else 400,
+            media_type="application/json",
+        )
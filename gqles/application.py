@@ -1,6 +1,43 @@
+from eventsourcing.system.multiprocess import MultiprocessRunner
+from eventsourcing.system.runner import MultiThreadedRunner, SingleThreadedRunner
+
+
+# Runner modes, how the process applications of a system are run.
+SINGLE_THREADED = "single"  # One after the other, in the saving thread.
+THREADS = "threads"  # Each in its own thread, prompted through queues.
+PROCESSES = "processes"  # Each in its own operating system process.
+
+RUNNER_CLASSES = {
+    SINGLE_THREADED: SingleThreadedRunner,
+    THREADS: MultiThreadedRunner,
+    PROCESSES: MultiprocessRunner,
+}
+
 _system_runner = None
 
 
+def get_runner_class(mode):
+    try:
+        return RUNNER_CLASSES[mode]
+    except KeyError:
+        raise ValueError(
+            "Unknown runner mode %r, expected one of %s"
+            % (mode, ", ".join(RUNNER_CLASSES)),
+        )
+
+
+def make_system_runner(system, mode=SINGLE_THREADED, **kwargs):
+    """
+    Construct a runner for `system` in the given mode.
+
+    Whatever the mode, every application of the system is constructed
+    in the current process too, so that the backstage can read their
+    stores. With threads and processes, the database must be shared by
+    the workers: an in-memory SQLite database is not.
+    """
+    return get_runner_class(mode)(system=system, **kwargs)
+
+
 async def start_system_runner(system_runner):
     global _system_runner
     if _system_runner is not None:
@@ -0,0 +1,132 @@
+import collections
+import functools
+import threading
+
+import eventsourcing.utils.topic
+
+
+# Stored events never change, so decoded events can be shared freely
+# between requests. Entries keep the stored topic and state around so
+# they never have to be encoded again either.
+CachedEvent = collections.namedtuple("CachedEvent", ["event", "topic", "state"])
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Rough allowance for the decoded event object and the bookkeeping,
+# on top of the size of the stored state.
+ENTRY_OVERHEAD = 512
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_topic(topic):
+    return eventsourcing.utils.topic.resolve_topic(topic)
+
+
+def resolve_topic(topic):
+    """
+    Resolve a topic to a class, remembering the result.
+    """
+    substitutions = eventsourcing.utils.topic.substitutions
+    return _resolve_topic(substitutions.get(topic, topic))
+
+
+class EventCache:
+    """
+    Bounded LRU of decoded events.
+
+    Keys are (application name, originator ID, originator version), the
+    memory budget is an estimate based on the size of the stored state.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(entry):
+        return len(entry.topic) + len(entry.state) + ENTRY_OVERHEAD
+
+    def _evict(self):
+        while self._entries and self.size > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.size -= self._cost(entry)
+
+    def get(self, application, originator_id, originator_version):
+        """
+        Return the cached entry for an event, or None.
+
+        Only hits are counted here, a miss is counted when the event
+        ends up being decoded.
+        """
+        key = (application.name, originator_id, originator_version)
+        with self._lock:
+            try:
+                entry = self._entries[key]
+            except KeyError:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, application, entry):
+        key = (
+            application.name,
+            entry.event.originator_id,
+            entry.event.originator_version,
+        )
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self.size += self._cost(entry)
+                self._evict()
+        return entry
+
+    def decode(
+            self, application, originator_id, originator_version, topic, state,
+    ):
+        """
+        Return the cached entry for a stored event, decoding it if needed.
+        """
+        entry = self.get(application, originator_id, originator_version)
+        if entry is not None:
+            return entry
+        with self._lock:
+            self.misses += 1
+        event_mapper = application.event_store.event_mapper
+        event = event_mapper.event_from_topic_and_state(topic, state)
+        return self.put(application, CachedEvent(event, topic, state))
+
+    def decode_item(self, application, item):
+        """
+        Return the cached entry for a sequenced item.
+        """
+        return self.decode(application, *item)
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            size=self.size,
+            maxSize=self.max_bytes,
+        )
+
+
+event_cache = EventCache()
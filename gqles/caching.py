@@ -0,0 +1,94 @@
+import hashlib
+import json
+
+from gqles.execution import LRU
+
+
+DEFAULT_MAX_RESPONSES = 1024
+
+# Immutable responses never change, caches may keep them for a year.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MOVING_CACHE_CONTROL = "no-store"
+
+CONTEXT_KEY = "cachePolicy"
+
+
+class CachePolicy:
+    """
+    Whether the response to a request may be cached.
+
+    Only root fields whose resolvers declare their result immutable are
+    cacheable, and any field that reads the moving head of a log or of
+    an originator makes the whole response uncacheable.
+    """
+
+    def __init__(self):
+        self.immutable = set()
+        self.moving = False
+
+    def is_cacheable(self, response):
+        data = response.get("data")
+        return (
+            data is not None
+            and not response.get("errors")
+            and not self.moving
+            and set(data).issubset(self.immutable)
+        )
+
+
+def get_cache_policy(info):
+    return info.context.setdefault(CONTEXT_KEY, CachePolicy())
+
+
+def mark_immutable(info):
+    """
+    Declare the result of a root field immutable.
+    """
+    if info.path.prev is None:
+        get_cache_policy(info).immutable.add(info.path.key)
+
+
+def mark_moving(info):
+    """
+    Declare that a field reads something that may still change.
+    """
+    get_cache_policy(info).moving = True
+
+
+def make_etag(body):
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an If-None-Match header with an ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache(LRU):
+    """
+    Server side LRU of immutable responses, as (etag, body).
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAX_RESPONSES):
+        super().__init__(maxsize)
+
+    @staticmethod
+    def key(data):
+        return json.dumps([
+            data.get("query"),
+            data.get("variables"),
+            data.get("operationName"),
+            data.get("extensions"),
+        ], sort_keys=True)
@@ -0,0 +1,369 @@
+import datetime
+import decimal
+import functools
+import struct
+import sys
+import uuid
+
+import pydantic
+
+from eventsourcing.utils.transcoding import ObjectJSONDecoder, ObjectJSONEncoder
+
+
+# Encoded states start with a format byte, which JSON states, starting
+# with "{", never do: the states recorded as JSON stay readable.
+#
+#   1: a map of attribute names to tagged values.
+#
+# Integers and lengths are varints, UUIDs take 16 bytes and hashes are
+# stored as their bytes. Strings found in every event, like the names of
+# the attributes of eventsourcing, are stored as their index in STRINGS.
+# Values of types without a tag, or of subclasses of the tagged types,
+# are embedded as eventsourcing's JSON, so that they decode exactly as
+# they used to.
+FORMAT_V1 = 1
+
+_FORMATS = {FORMAT_V1}
+
+(
+    NONE, FALSE, TRUE, INT, FLOAT, STR, BYTES, UUID, DECIMAL, DATETIME,
+    DATE, LIST, TUPLE, DICT, JSON, KNOWN_STR, HEX,
+) = range(17)
+
+# Part of format 1, only ever append to it.
+STRINGS = (
+    "originator_id",
+    "originator_version",
+    "originator_topic",
+    "timestamp",
+    "__event_topic__",
+    "__event_hash__",
+    "__previous_hash__",
+    "__event_hash_method_name__",
+    "__hash_object_v2__",
+    "",
+)
+
+_STRING_INDEXES = {string: index for index, string in enumerate(STRINGS)}
+
+# Shorter hex strings are not worth the check.
+_MIN_HEX_LENGTH = 32
+
+_FLOAT = struct.Struct(">d")
+
+_json_encoder = ObjectJSONEncoder()
+_json_decoder = ObjectJSONDecoder()
+
+
+def is_encoded(state):
+    """
+    Whether a state was encoded by this module rather than as JSON.
+    """
+    return bool(state) and state[0] in _FORMATS
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _write_sized(out, tag, data):
+    out.append(tag)
+    _write_varint(out, len(data))
+    out += data
+
+
+def _encode_none(out, value):
+    out.append(NONE)
+
+
+def _encode_bool(out, value):
+    out.append(TRUE if value else FALSE)
+
+
+def _encode_int(out, value):
+    out.append(INT)
+    # Zigzag, so that small negative integers stay small.
+    _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _encode_float(out, value):
+    out.append(FLOAT)
+    out += _FLOAT.pack(value)
+
+
+def _get_hex_bytes(value):
+    if len(value) < _MIN_HEX_LENGTH or len(value) % 2:
+        return None
+    try:
+        data = bytes.fromhex(value)
+    except ValueError:
+        return None
+    # Upper case hex would not decode to the same string.
+    return data if data.hex() == value else None
+
+
+def _encode_str(out, value):
+    index = _STRING_INDEXES.get(value)
+    if index is not None:
+        out.append(KNOWN_STR)
+        out.append(index)
+        return
+    data = _get_hex_bytes(value)
+    if data is not None:
+        _write_sized(out, HEX, data)
+    else:
+        _write_sized(out, STR, value.encode("utf8"))
+
+
+def _encode_bytes(out, value):
+    _write_sized(out, BYTES, value)
+
+
+def _encode_uuid(out, value):
+    out.append(UUID)
+    out += value.bytes
+
+
+def _encode_decimal(out, value):
+    _write_sized(out, DECIMAL, str(value).encode("ascii"))
+
+
+def _encode_datetime(out, value):
+    _write_sized(out, DATETIME, value.isoformat().encode("ascii"))
+
+
+def _encode_date(out, value):
+    _write_sized(out, DATE, value.isoformat().encode("ascii"))
+
+
+def _encode_sequence(tag):
+    def encode(out, value):
+        out.append(tag)
+        _write_varint(out, len(value))
+        for item in value:
+            encode_value(out, item)
+    return encode
+
+
+def _encode_dict(out, value):
+    out.append(DICT)
+    _write_varint(out, len(value))
+    for key, item in value.items():
+        encode_value(out, key)
+        encode_value(out, item)
+
+
+def _encode_json(out, value):
+    _write_sized(out, JSON, _json_encoder.encode(value))
+
+
+# Exact types only, subclasses are embedded as JSON.
+_ENCODERS = {
+    type(None): _encode_none,
+    bool: _encode_bool,
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    uuid.UUID: _encode_uuid,
+    decimal.Decimal: _encode_decimal,
+    datetime.datetime: _encode_datetime,
+    datetime.date: _encode_date,
+    list: _encode_sequence(LIST),
+    tuple: _encode_sequence(TUPLE),
+    dict: _encode_dict,
+}
+
+
+def encode_value(out, value):
+    _ENCODERS.get(type(value), _encode_json)(out, value)
+
+
+def _field_encoder(expected, encode):
+    def encode_field(out, value):
+        if type(value) is expected:
+            encode(out, value)
+        else:
+            encode_value(out, value)
+    return encode_field
+
+
+def get_model_class(event_class):
+    """
+    Return the gqles.model.Model class an event class is nested in, or
+    None.
+    """
+    # Deferred, gqles.model does not need the codec.
+    import gqles.model
+
+    owner = sys.modules.get(event_class.__module__)
+    for name in event_class.__qualname__.split(".")[:-1]:
+        owner = getattr(owner, name, None)
+    if isinstance(owner, type) and issubclass(owner, gqles.model.Model):
+        return owner
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_encoders(event_class):
+    """
+    Encoders of the attributes of an event class, picked from the types
+    of the fields of its model.
+
+    Return:
+        {attribute name: encoder}, for the fields with a tagged type.
+    """
+    model_class = get_model_class(event_class)
+    if model_class is None:
+        return {}
+
+    encoders = {}
+    for name, field in model_class.__fields__.items():
+        if field.shape != pydantic.fields.SHAPE_SINGLETON:
+            continue
+        encode = _ENCODERS.get(field.type_)
+        if encode is not None:
+            encoders[name] = _field_encoder(field.type_, encode)
+    return encoders
+
+
+def encode(attrs, field_encoders=None):
+    """
+    Encode the attributes of an event.
+
+    Return:
+        The encoded state, in the latest format.
+    """
+    field_encoders = field_encoders or {}
+    out = bytearray((FORMAT_V1,))
+    _write_varint(out, len(attrs))
+    for key, value in attrs.items():
+        _encode_str(out, key)
+        field_encoders.get(key, encode_value)(out, value)
+    return bytes(out)
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _read_sized(data, pos):
+    size, pos = _read_varint(data, pos)
+    return data[pos:pos + size], pos + size
+
+
+def _decode_int(data, pos):
+    n, pos = _read_varint(data, pos)
+    return (n >> 1 if not n & 1 else -(n >> 1) - 1), pos
+
+
+def _decode_float(data, pos):
+    return _FLOAT.unpack_from(data, pos)[0], pos + _FLOAT.size
+
+
+def _decode_sized(convert):
+    def decode(data, pos):
+        value, pos = _read_sized(data, pos)
+        return convert(value), pos
+    return decode
+
+
+def _decode_str(data, pos):
+    size, pos = _read_varint(data, pos)
+    return data[pos:pos + size].decode("utf8"), pos + size
+
+
+def _decode_known_str(data, pos):
+    return STRINGS[data[pos]], pos + 1
+
+
+def _decode_uuid(data, pos):
+    return uuid.UUID(bytes=data[pos:pos + 16]), pos + 16
+
+
+def _decode_list(data, pos):
+    size, pos = _read_varint(data, pos)
+    items = []
+    for _ in range(size):
+        item, pos = decode_value(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _decode_tuple(data, pos):
+    items, pos = _decode_list(data, pos)
+    return tuple(items), pos
+
+
+def _decode_dict(data, pos):
+    size, pos = _read_varint(data, pos)
+    value = {}
+    for _ in range(size):
+        key, pos = decode_value(data, pos)
+        value[key], pos = decode_value(data, pos)
+    return value, pos
+
+
+def _constant(value):
+    def decode(data, pos):
+        return value, pos
+    return decode
+
+
+def _ascii(convert):
+    return lambda value: convert(value.decode("ascii"))
+
+
+_DECODERS = [
+    _constant(None),
+    _constant(False),
+    _constant(True),
+    _decode_int,
+    _decode_float,
+    _decode_str,
+    _decode_sized(bytes),
+    _decode_uuid,
+    _decode_sized(_ascii(decimal.Decimal)),
+    _decode_sized(_ascii(datetime.datetime.fromisoformat)),
+    _decode_sized(_ascii(datetime.date.fromisoformat)),
+    _decode_list,
+    _decode_tuple,
+    _decode_dict,
+    _decode_sized(lambda value: _json_decoder.decode(value.decode("utf8"))),
+    _decode_known_str,
+    _decode_sized(bytes.hex),
+]
+
+
+def decode_value(data, pos):
+    return _DECODERS[data[pos]](data, pos + 1)
+
+
+def decode(state):
+    """
+    Decode the attributes of an event encoded by `encode`.
+    """
+    state = bytes(state)
+    if not is_encoded(state):
+        raise ValueError("Unknown state format: %r" % state[:1])
+
+    decoders = _DECODERS
+    size, pos = _read_varint(state, 1)
+    attrs = {}
+    for _ in range(size):
+        key, pos = decoders[state[pos]](state, pos + 1)
+        attrs[key], pos = decoders[state[pos]](state, pos + 1)
+    return attrs
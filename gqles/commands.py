@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import random
+import threading
+
+from eventsourcing.exceptions import OperationalError, RecordConflictError
+
+
+DEFAULT_RETRY_ON = (OperationalError, RecordConflictError)
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_WAIT = 0.01
+DEFAULT_MAX_WAIT = 1.0
+# Commands are recorded one at a time by default, writers contend on
+# the notification log anyway.
+DEFAULT_MAX_WORKERS = 1
+
+
+def get_backoff(attempt, wait=DEFAULT_WAIT, max_wait=DEFAULT_MAX_WAIT):
+    """
+    Seconds to wait before retrying after the `attempt`th failure.
+
+    The wait doubles with every attempt, up to `max_wait`, and is
+    jittered so that contending writers do not retry in lock step.
+    """
+    return random.uniform(0, min(max_wait, wait * 2 ** (attempt - 1)))
+
+
+class CommandDispatcher:
+    """
+    Run blocking commands in worker threads, off the event loop.
+
+    Failed attempts are retried after an `asyncio.sleep`, so waiting for
+    a contended write does not block the loop either. The context of the
+    caller, like the request's scope, is copied to the worker.
+    """
+
+    def __init__(
+            self,
+            max_workers=DEFAULT_MAX_WORKERS,
+            retry_on=DEFAULT_RETRY_ON,
+            max_attempts=DEFAULT_MAX_ATTEMPTS,
+            wait=DEFAULT_WAIT,
+            max_wait=DEFAULT_MAX_WAIT,
+    ):
+        self.max_workers = max_workers
+        self.retry_on = retry_on
+        self.max_attempts = max_attempts
+        self.wait = wait
+        self.max_wait = max_wait
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="gqles-commands",
+                )
+            return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run `func` once in a worker thread.
+        """
+        context = contextvars.copy_context()
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor,
+            functools.partial(context.run, func, *args, **kwargs),
+        )
+
+    async def dispatch(
+            self, func, *args,
+            retry_on=None, max_attempts=None, wait=None, max_wait=None,
+            **kwargs,
+    ):
+        """
+        Run `func` in a worker thread, retrying on `retry_on` errors.
+
+        Return:
+            What `func` returns, the last error is raised when all
+            attempts failed.
+        """
+        retry_on = self.retry_on if retry_on is None else retry_on
+        max_attempts = max_attempts or self.max_attempts
+        wait = self.wait if wait is None else wait
+        max_wait = self.max_wait if max_wait is None else max_wait
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self.run(func, *args, **kwargs)
+            except retry_on:
+                if attempt >= max_attempts:
+                    raise
+            await asyncio.sleep(get_backoff(attempt, wait, max_wait))
+
+    def close(self):
+        """
+        Wait for running commands, the workers are started again when
+        a command is dispatched.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+command_dispatcher = CommandDispatcher()
+
+
+async def dispatch(func, *args, **kwargs):
+    """
+    Dispatch a command with the default dispatcher.
+    """
+    return await command_dispatcher.dispatch(func, *args, **kwargs)
@@ -0,0 +1,398 @@
+import argparse
+import collections
+import heapq
+import json
+import threading
+import time
+import zlib
+
+from sqlalchemy import (
+    DECIMAL, Column, Integer, LargeBinary, String, Text, func,
+)
+from sqlalchemy.orm import Session
+
+from eventsourcing.infrastructure.sqlalchemy.records import Base
+from eventsourcing.utils.times import decimaltimestamp
+from eventsourcing.utils.topic import resolve_topic
+
+
+# States compressed with a dictionary start with this byte, followed by
+# the dictionary ID as a varint and a raw deflate stream. It is neither
+# the first byte of a zlib stream, nor of a JSON or gqles.codec state.
+DICTIONARY_COMPRESSED = 0xDC
+ZLIB_HEADER = 0x78
+
+DEFAULT_LEVEL = 9
+# Deflate only looks 32 KiB back, and states are small.
+DEFAULT_DICTIONARY_SIZE = 16 * 1024
+DEFAULT_SEGMENT_LENGTH = 8
+DEFAULT_SAMPLE_SIZE = 1000
+# How often compressors look for retrained dictionaries, in seconds.
+DEFAULT_REFRESH_INTERVAL = 60
+# One sample in this many is held out of training to measure the ratio.
+HOLD_OUT = 5
+
+
+class CompressionDictionaryRecord(Base):
+    __tablename__ = "gqles_compression_dictionaries"
+
+    # Application ID.
+    application_name = Column(String(length=32), primary_key=True)
+
+    # Dictionary ID, stored with every state compressed with it.
+    dictionary_id = Column(Integer(), primary_key=True)
+
+    # Topic of the events compressed with the dictionary, or None for
+    # all the events of the application.
+    topic = Column(Text(), nullable=True)
+
+    data = Column(LargeBinary(), nullable=False)
+
+    # Timestamp of the training.
+    timestamp = Column(DECIMAL(24, 6, 6), nullable=False)
+
+
+def _write_varint(out, n):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def compress_with(dictionary_id, dictionary, data, level=DEFAULT_LEVEL):
+    compressor = zlib.compressobj(
+        level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary,
+    )
+    out = bytearray((DICTIONARY_COMPRESSED,))
+    _write_varint(out, dictionary_id)
+    out += compressor.compress(data)
+    out += compressor.flush()
+    return bytes(out)
+
+
+def get_dictionary_id(data):
+    """
+    Return the ID of the dictionary a state was compressed with, or
+    None.
+    """
+    if not data or data[0] != DICTIONARY_COMPRESSED:
+        return None
+    return _read_varint(data, 1)[0]
+
+
+def train_dictionary(
+        samples,
+        size=DEFAULT_DICTIONARY_SIZE,
+        segment_length=DEFAULT_SEGMENT_LENGTH,
+):
+    """
+    Build a compression dictionary out of samples of states.
+
+    Samples are picked greedily by how many of the segments shared
+    with other samples they bring, each segment counting once, until
+    the dictionary is full. The most useful samples end up last, where
+    deflate finds them with the shortest distances.
+    """
+    segments = [
+        {
+            sample[i:i + segment_length]
+            for i in range(len(sample) - segment_length + 1)
+        }
+        for sample in samples
+    ]
+    frequency = collections.Counter()
+    for sample_segments in segments:
+        frequency.update(sample_segments)
+
+    def score(index):
+        return sum(
+            frequency[segment] - 1 for segment in segments[index]
+            if segment not in covered
+        )
+
+    covered = set()
+    # Scores only decrease as segments get covered, so a stale score
+    # is an upper bound: only the top of the heap needs rescoring.
+    heap = [(-score(index), index) for index in range(len(samples))]
+    heapq.heapify(heap)
+    picked = []
+    total = 0
+    while heap and total < size:
+        stale, index = heapq.heappop(heap)
+        fresh = -score(index)
+        if fresh != stale:
+            heapq.heappush(heap, (fresh, index))
+            continue
+        if fresh == 0:
+            break
+        picked.append(samples[index])
+        covered.update(segments[index])
+        total += len(samples[index])
+
+    return b"".join(reversed(picked))[-size:]
+
+
+class DictionaryCompressor:
+    """
+    Compress states with the dictionaries trained for an application.
+
+    States of events of a topic use the latest dictionary trained for
+    the topic, or else the latest one trained for the application. The
+    dictionary ID is stored with each state, so states compressed with
+    older dictionaries stay readable. Without a dictionary states are
+    compressed with plain zlib, and states compressed with plain zlib,
+    or not compressed at all, are read as well.
+    """
+
+    def __init__(
+            self,
+            session,
+            application_name,
+            record_class=CompressionDictionaryRecord,
+            level=DEFAULT_LEVEL,
+            refresh_interval=DEFAULT_REFRESH_INTERVAL,
+    ):
+        self.session = session
+        self.application_name = application_name
+        self.record_class = record_class
+        self.level = level
+        self.refresh_interval = refresh_interval
+        self._dictionaries = {}
+        # {topic: dictionary ID}
+        self._latest = {}
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the dictionaries of the application.
+
+        Dictionaries are loaded when states are read by the backstage as
+        well as when they are written, through a session of their own,
+        closed once they are read: loading them neither leaves a
+        transaction open, nor ends the transaction of the caller.
+        """
+        record_class = self.record_class
+        session = Session(bind=self.session.get_bind())
+        try:
+            records = session.query(
+                record_class.dictionary_id,
+                record_class.topic,
+                record_class.data,
+            ).filter(
+                record_class.application_name == self.application_name,
+            ).order_by(record_class.dictionary_id).all()
+        finally:
+            session.close()
+        with self._lock:
+            for record in records:
+                self._dictionaries[record.dictionary_id] = record.data
+                self._latest[record.topic] = record.dictionary_id
+            self._loaded = time.monotonic()
+
+    def _refresh(self):
+        if (
+                self._loaded is None
+                or time.monotonic() - self._loaded > self.refresh_interval
+        ):
+            self.load()
+
+    def get_dictionary(self, dictionary_id):
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            self.load()
+            dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            raise ValueError(
+                "Unknown compression dictionary %d of %s"
+                % (dictionary_id, self.application_name),
+            )
+        return dictionary
+
+    def get_latest_dictionary_id(self, topic=None):
+        self._refresh()
+        latest = self._latest.get(topic)
+        if latest is None:
+            latest = self._latest.get(None)
+        return latest
+
+    def add_dictionary(self, data, topic=None):
+        """
+        Record a new dictionary, used for the states compressed from now
+        on.
+
+        Return:
+            The ID of the dictionary.
+        """
+        dictionary_id = (self.session.query(
+            func.max(self.record_class.dictionary_id),
+        ).filter(
+            self.record_class.application_name == self.application_name,
+        ).scalar() or 0) + 1
+        self.session.add(self.record_class(
+            application_name=self.application_name,
+            dictionary_id=dictionary_id,
+            topic=topic,
+            data=data,
+            timestamp=decimaltimestamp(),
+        ))
+        self.session.commit()
+        self.load()
+        return dictionary_id
+
+    def compress(self, data, topic=None):
+        dictionary_id = self.get_latest_dictionary_id(topic)
+        if dictionary_id is None:
+            return zlib.compress(data, self.level)
+        return compress_with(
+            dictionary_id, self._dictionaries[dictionary_id], data, self.level,
+        )
+
+    def decompress(self, data):
+        if not data:
+            return data
+        if data[0] == ZLIB_HEADER:
+            return zlib.decompress(data)
+        if data[0] != DICTIONARY_COMPRESSED:
+            return data
+
+        dictionary_id, pos = _read_varint(data, 1)
+        decompressor = zlib.decompressobj(
+            -zlib.MAX_WBITS, zdict=self.get_dictionary(dictionary_id),
+        )
+        return decompressor.decompress(data[pos:]) + decompressor.flush()
+
+
+def sample_states(application, sample_size=DEFAULT_SAMPLE_SIZE, topic=None):
+    """
+    The plain states of the last events of an application's
+    notification log, decrypted and decompressed.
+    """
+    # Deferred, gqles.notifications needs gqles.infrastructure.
+    import gqles.notifications
+
+    mapper = application.event_store.event_mapper
+    states = []
+    before = None
+    while len(states) < sample_size:
+        notifications = gqles.notifications.read_notifications(
+            application, before=before, limit=sample_size, reverse=True,
+        )
+        if not notifications:
+            break
+        for notification in notifications:
+            if topic is not None and notification["topic"] != topic:
+                continue
+            state = notification["state"]
+            if mapper.cipher:
+                state = mapper.cipher.decrypt(state)
+            if mapper.compressor:
+                state = mapper.compressor.decompress(state)
+            states.append(state)
+        before = notifications[-1]["id"] - 1
+    return states[:sample_size]
+
+
+def retrain(
+        application,
+        topic=None,
+        sample_size=DEFAULT_SAMPLE_SIZE,
+        dictionary_size=DEFAULT_DICTIONARY_SIZE,
+        segment_length=DEFAULT_SEGMENT_LENGTH,
+        dry_run=False,
+):
+    """
+    Train a dictionary on the last events of an application, and record
+    it unless `dry_run`.
+
+    The ratio is measured on samples held out of the training, against
+    plain zlib.
+
+    Return:
+        A report, as a dict.
+    """
+    states = sample_states(application, sample_size, topic)
+    training = [s for i, s in enumerate(states) if i % HOLD_OUT]
+    held_out = [s for i, s in enumerate(states) if not i % HOLD_OUT]
+    dictionary = train_dictionary(training, dictionary_size, segment_length)
+
+    raw = sum(len(state) for state in held_out)
+    zlib_size = sum(
+        len(zlib.compress(state, DEFAULT_LEVEL)) for state in held_out
+    )
+    compressed = sum(
+        len(compress_with(0, dictionary, state)) for state in held_out
+    )
+
+    dictionary_id = None
+    if not dry_run and dictionary:
+        compressor = application.event_store.event_mapper.compressor
+        if not isinstance(compressor, DictionaryCompressor):
+            compressor = DictionaryCompressor(
+                application.session, application.name,
+            )
+        dictionary_id = compressor.add_dictionary(dictionary, topic)
+
+    return dict(
+        applicationName=application.name,
+        topic=topic,
+        dictionaryId=dictionary_id,
+        dictionarySize=len(dictionary),
+        samples=len(states),
+        heldOut=len(held_out),
+        rawBytes=raw,
+        zlibBytes=zlib_size,
+        compressedBytes=compressed,
+        zlibRatio=raw / zlib_size if zlib_size else None,
+        ratio=raw / compressed if compressed else None,
+    )
+
+
+def main(argv=None):
+    """
+    Retrain the compression dictionary of an application from its
+    notification log, and report the ratio achieved.
+
+        python -m gqles.compression example.application#Application orders
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.strip())
+    parser.add_argument(
+        "application_class", help="Topic of the application class.",
+    )
+    parser.add_argument("name", help="Name of the application.")
+    parser.add_argument("--topic", help="Train for the events of a topic.")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLE_SIZE)
+    parser.add_argument("--size", type=int, default=DEFAULT_DICTIONARY_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Report the ratio without recording the dictionary.",
+    )
+    args = parser.parse_args(argv)
+
+    application = resolve_topic(args.application_class)(name=args.name)
+    try:
+        report = retrain(
+            application,
+            topic=args.topic,
+            sample_size=args.samples,
+            dictionary_size=args.size,
+            dry_run=args.dry_run,
+        )
+    finally:
+        application.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+from typing import Optional
+
+import pydantic
+
+import sqlalchemy
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+
+MEMORY_URL = "sqlite:///:memory:"
+
+_request_scope = contextvars.ContextVar("gqles_session_scope", default=None)
+
+
+class DatabaseSettings(pydantic.BaseSettings):
+    """
+    Engine settings, read from DATABASE_* environment variables, like
+    DATABASE_URL or DATABASE_POOL_SIZE.
+    """
+
+    # In-memory SQLite databases are private to a connection, engines
+    # use a temporary file of their own instead, see create_engine.
+    url: str = MEMORY_URL
+    # Pool of connections kept open, and connections opened on top of
+    # it under load. None keeps SQLAlchemy's defaults.
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    # Seconds to wait for a connection before giving up.
+    pool_timeout: Optional[float] = None
+    # Seconds after which connections are replaced, -1 for never. Set it
+    # below the idle timeout of the database server.
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    # Reads of the backstage go through an engine of their own, on a
+    # replica when there is one, or else on the same database. Its pool
+    # is all the connections reads can hold: they wait for one of them,
+    # they never take the connections of the writers.
+    read_url: Optional[str] = None
+    read_pool_size: int = 2
+    read_pool_timeout: float = 30
+    # SQLite files are written in WAL mode, so that reads do not block
+    # writes and writes do not block reads.
+    sqlite_wal: bool = True
+
+    class Config:
+        env_prefix = "DATABASE_"
+
+
+def is_memory(url):
+    return (
+        url.get_backend_name() == "sqlite"
+        and url.database in (None, "", ":memory:")
+    )
+
+
+def get_engine_options(settings):
+    """
+    Return:
+        The keyword arguments of sqlalchemy.create_engine for settings.
+    """
+    url = sqlalchemy.engine.url.make_url(settings.url)
+    options = dict(
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+    queue_options = {
+        key: value for key, value in dict(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+        ).items() if value is not None
+    }
+
+    if url.get_backend_name() == "sqlite":
+        # Commands are recorded in worker threads.
+        options["connect_args"] = dict(check_same_thread=False)
+        if queue_options:
+            # SQLite files are not pooled by default.
+            options["poolclass"] = QueuePool
+
+    options.update(queue_options)
+    return options
+
+
+def make_temporary_url():
+    """
+    Return:
+        The URL of a SQLite file in a directory of its own, removed when
+        the process exits.
+    """
+    directory = tempfile.mkdtemp(prefix="gqles-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return "sqlite:///%s" % os.path.join(directory, "gqles.db")
+
+
+def create_engine(settings=None):
+    """
+    Create the engine of the database described by settings, by default
+    from the environment.
+
+    Threads must not share a connection: one closing its session rolls
+    back the transaction of the others. In-memory SQLite databases are
+    only seen by the connection that created them, so engines get a
+    temporary file instead, which each thread connects to.
+    """
+    settings = settings or DatabaseSettings()
+    if is_memory(sqlalchemy.engine.url.make_url(settings.url)):
+        settings = settings.copy(update=dict(url=make_temporary_url()))
+    engine = sqlalchemy.create_engine(
+        settings.url, **get_engine_options(settings),
+    )
+    if settings.sqlite_wal and engine.url.get_backend_name() == "sqlite":
+        sqlalchemy.event.listen(engine, "connect", _set_wal)
+    # Connections must not be shared with the runner's processes.
+    os.register_at_fork(after_in_child=engine.dispose)
+    return engine
+
+
+def _set_wal(connection, record):
+    # The mode is persistent, but only a writer can set it.
+    connection.execute("PRAGMA journal_mode=WAL")
+
+
+def get_read_url(settings):
+    """
+    Return:
+        The URL of the database to read from, or None for in-memory
+        SQLite databases, which can only be read through the engine
+        writing them.
+    """
+    if settings.read_url is not None:
+        return settings.read_url
+    url = sqlalchemy.engine.url.make_url(settings.url)
+    if is_memory(url):
+        return None
+    if url.get_backend_name() == "sqlite":
+        return "sqlite:///file:%s?mode=ro&uri=true" % url.database
+    return settings.url
+
+
+def get_read_engine_options(settings):
+    """
+    Return:
+        The keyword arguments of sqlalchemy.create_engine for reads.
+    """
+    url = sqlalchemy.engine.url.make_url(get_read_url(settings))
+    options = dict(
+        poolclass=QueuePool,
+        pool_size=settings.read_pool_size,
+        # The budget is a hard one.
+        max_overflow=0,
+        pool_timeout=settings.read_pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = dict(check_same_thread=False)
+    return options
+
+
+def create_read_engine(settings=None):
+    """
+    Create the engine reads go through, see DatabaseSettings.read_url.
+
+    Return:
+        The engine, or None if reads must go through the engine writing
+        the database.
+    """
+    settings = settings or DatabaseSettings()
+    url = get_read_url(settings)
+    if url is None:
+        return None
+    engine = sqlalchemy.create_engine(
+        url, **get_read_engine_options(settings),
+    )
+    os.register_at_fork(after_in_child=engine.dispose)
+    return engine
+
+
+def _refuse_flush(session, flush_context, instances):
+    raise sqlalchemy.exc.InvalidRequestError(
+        "Read sessions can not write to the database",
+    )
+
+
+def make_read_session(engine):
+    """
+    Scoped session of a read engine, which refuses to write.
+    """
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sqlalchemy.event.listen(factory, "before_flush", _refuse_flush)
+    return scoped_session(factory, scopefunc=get_current_scope)
+
+
+def get_current_scope():
+    """
+    Scope function of scoped sessions.
+
+    Requests, and what they dispatch to worker threads, share the
+    session of their request scope. Elsewhere, like in the runner's
+    threads, each thread has its own session for as long as it runs.
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        return threading.get_ident()
+    return scope
+
+
+@contextlib.contextmanager
+def session_scope(*sessions):
+    """
+    Use sessions of their own within the block, removed at the end.
+    """
+    token = _request_scope.set(uuid.uuid4())
+    try:
+        yield
+    finally:
+        try:
+            for session in sessions:
+                session.remove()
+        finally:
+            _request_scope.reset(token)
+
+
+def get_scoped_sessions(application):
+    """
+    Return:
+        The scoped sessions an application reads and writes with, for
+        session_scope.
+    """
+    sessions = (
+        application.session, getattr(application, "read_session", None),
+    )
+    return [
+        session for session in sessions
+        if isinstance(session, scoped_session)
+    ]
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """
+    Run `func` in a worker thread of the loop's default executor, with
+    the session scope of the caller, like
+    starlette.concurrency.run_in_threadpool.
+
+    Cancelling the caller does not stop the thread: the caller waits
+    for `func` before the cancellation goes on, however many times it is
+    cancelled, so that the sessions of its scope are not removed, and
+    their connections closed, while `func` still uses them.
+    """
+    # A future rather than a task, which would be cancelled along with
+    # the other tasks of a loop that is closed.
+    context = contextvars.copy_context()
+    future = asyncio.get_event_loop().run_in_executor(
+        None, functools.partial(context.run, func, *args, **kwargs),
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait([future])
+            except asyncio.CancelledError:
+                pass
+        raise
+
+
+class SessionMiddleware:
+    """
+    ASGI middleware giving each request a scoped session of its own,
+    and removing it once the request is done.
+
+    Sessions must be scoped sessions using get_current_scope, the read
+    session is optional. Without removing them, the sessions of all
+    past requests would stay in their registry.
+    """
+
+    def __init__(self, app, session, read_session=None):
+        self.app = app
+        self.sessions = [session]
+        if read_session is not None:
+            self.sessions.append(read_session)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        with session_scope(*self.sessions):
+            await self.app(scope, receive, send)
@@ -0,0 +1,189 @@
+import sqlalchemy
+
+import aiodataloader
+
+from gqles.cache import event_cache
+from gqles.infrastructure import get_read_event_store
+
+
+class ApplicationLoader(aiodataloader.DataLoader):
+    """
+    Base for loaders that batch reads from a single application's store.
+    """
+
+    def __init__(self, application, **kwargs):
+        super().__init__(**kwargs)
+        self.application = application
+
+    @property
+    def record_manager(self):
+        return get_read_event_store(self.application).record_manager
+
+    def query(self, *criterion):
+        record_manager = self.record_manager
+        query = record_manager.orm_query()
+        query = record_manager.filter_for_application_name(query)
+        return query.filter(*criterion)
+
+    def column(self, name):
+        return getattr(
+            self.record_manager.record_class,
+            getattr(self.record_manager.field_names, name),
+        )
+
+    def entries_from_records(self, records):
+        return [
+            event_cache.decode_item(
+                self.application, self.record_manager.from_record(record),
+            )
+            for record in records
+        ]
+
+
+class MostRecentEventLoader(ApplicationLoader):
+    """
+    Load the most recent event of originators, keyed by originator ID.
+
+    Values are cached events, see gqles.cache.
+    """
+
+    async def batch_load_fn(self, originator_ids):
+        record_manager = self.record_manager
+        sequence_id = self.column("sequence_id")
+        position = self.column("position")
+
+        latest = record_manager.filter_for_application_name(
+            record_manager.session.query(
+                sequence_id.label("sequence_id"),
+                sqlalchemy.func.max(position).label("position"),
+            )
+        ).filter(
+            sequence_id.in_(set(originator_ids))
+        ).group_by(sequence_id).subquery()
+
+        try:
+            records = self.query(
+                sequence_id == latest.c.sequence_id,
+                position == latest.c.position,
+            ).all()
+        finally:
+            record_manager.session.close()
+
+        entries = {
+            entry.event.originator_id: entry
+            for entry in self.entries_from_records(records)
+        }
+        return [entries.get(originator_id) for originator_id in originator_ids]
+
+
+class EventLoader(ApplicationLoader):
+    """
+    Load stored events keyed by (originator ID, originator version).
+
+    Values are sequenced items, events are not decoded. Events that are
+    already in the cache are not queried for at all. With
+    `metadata_only` the state is not read, and is None.
+    """
+
+    def __init__(self, application, metadata_only=False, **kwargs):
+        super().__init__(application, **kwargs)
+        self.metadata_only = metadata_only
+
+    def query_items(self, criterion):
+        record_manager = self.record_manager
+        if not self.metadata_only:
+            return [
+                record_manager.from_record(record)
+                for record in self.query(criterion)
+            ]
+
+        field_names = record_manager.field_names
+        columns = [
+            self.column(name)
+            for name in ("sequence_id", "position", "topic")
+        ]
+        query = record_manager.filter_for_application_name(
+            record_manager.session.query(*columns)
+        )
+        return [
+            record_manager.sequenced_item_class(**{
+                field_names.sequence_id: sequence_id,
+                field_names.position: position,
+                field_names.topic: topic,
+                field_names.state: None,
+            })
+            for sequence_id, position, topic in query.filter(criterion)
+        ]
+
+    async def batch_load_fn(self, keys):
+        sequence_id = self.column("sequence_id")
+        position = self.column("position")
+        sequenced_item_class = self.record_manager.sequenced_item_class
+
+        items = {}
+        for key in set(keys):
+            entry = event_cache.get(self.application, *key)
+            if entry is not None:
+                items[key] = sequenced_item_class(
+                    *key, entry.topic, entry.state,
+                )
+
+        missing = set(keys) - set(items)
+        if missing:
+            try:
+                found = self.query_items(sqlalchemy.or_(*(
+                    sqlalchemy.and_(
+                        sequence_id == originator_id, position == version,
+                    )
+                    for originator_id, version in missing
+                )))
+            finally:
+                self.record_manager.session.close()
+
+            items.update(((item[0], item[1]), item) for item in found)
+
+        return [items.get(key) for key in keys]
+
+
+class Loaders:
+    """
+    Request scoped collection of loaders, one set per application.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+
+    def _get(self, loader_class, application, **kwargs):
+        key = (loader_class, application.name, *sorted(kwargs.items()))
+        if key not in self._loaders:
+            self._loaders[key] = loader_class(application, **kwargs)
+        return self._loaders[key]
+
+    def most_recent_event(self, application):
+        return self._get(MostRecentEventLoader, application)
+
+    def event(self, application, metadata_only=False):
+        return self._get(EventLoader, application, metadata_only=metadata_only)
+
+    def prime_events(self, application, items):
+        """
+        Make already loaded stored events available to later lookups.
+        """
+        loaders = [
+            self.event(application),
+            self.event(application, metadata_only=True),
+        ]
+        for item in items:
+            for loader in loaders:
+                loader.prime((item[0], item[1]), item)
+
+
+CONTEXT_KEY = "loaders"
+
+
+def get_context(request):
+    return {"request": request, CONTEXT_KEY: Loaders()}
+
+
+def get_loaders(info):
+    return info.context.setdefault(CONTEXT_KEY, Loaders())
@@ -0,0 +1,268 @@
+import collections
+import hashlib
+import inspect
+import json
+import threading
+
+from graphql import ExecutionContext, GraphQLError, execute, validate
+from graphql.language import OperationType
+from graphql.utilities import get_operation_ast
+from graphql.validation import specified_rules
+
+from ariadne.extensions import ExtensionManager
+from ariadne.format_error import format_error
+from ariadne.graphql import (
+    handle_graphql_errors,
+    handle_query_result,
+    parse_query,
+    validate_operation_name,
+    validate_query_body,
+    validate_variables,
+)
+from ariadne.validation.introspection_disabled import IntrospectionDisabledRule
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+DEFAULT_MAX_DOCUMENTS = 256
+DEFAULT_MAX_PERSISTED_QUERIES = 1024
+
+
+def dumps_stdlib(response):
+    return json.dumps(
+        response, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf8")
+
+
+def dumps_orjson(response):
+    return orjson.dumps(response)
+
+
+# Serializers take a response and return the bytes of its body.
+default_serializer = dumps_orjson if orjson is not None else dumps_stdlib
+
+
+class LRU:
+    """
+    Small thread safe LRU mapping.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DocumentCache(LRU):
+    """
+    LRU of parsed documents and the errors of their validation.
+
+    Only the rules of the spec are cached, they do not depend on
+    anything but the schema and the query. Rules that depend on the
+    request, like the cost rules, are run every time.
+    """
+
+    def __init__(self, schema, maxsize=DEFAULT_MAX_DOCUMENTS):
+        super().__init__(maxsize)
+        self.schema = schema
+
+    def get_document(self, query, introspection=True):
+        """
+        Return:
+            (document, validation errors)
+        """
+        key = (query, introspection)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        document = parse_query(query)
+        rules = specified_rules
+        if not introspection:
+            rules = [*rules, IntrospectionDisabledRule]
+        errors = validate(self.schema, document, rules=rules)
+        return self.put(key, (document, errors))
+
+
+class PersistedQueryNotFound(GraphQLError):
+    def __init__(self):
+        super().__init__(
+            "PersistedQueryNotFound",
+            extensions={"code": "PERSISTED_QUERY_NOT_FOUND"},
+        )
+
+
+def is_persisted_query_not_found(response):
+    return any(
+        (error.get("extensions") or {}).get("code")
+        == "PERSISTED_QUERY_NOT_FOUND"
+        for error in response.get("errors", ())
+    )
+
+
+def get_query_hash(query):
+    return hashlib.sha256(query.encode("utf8")).hexdigest()
+
+
+class PersistedQueries(LRU):
+    """
+    Queries registered with automatic persisted queries, by hash.
+
+    Clients send the sha256 of a query instead of the query itself, and
+    only send the query when the server does not know the hash yet.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAX_PERSISTED_QUERIES):
+        super().__init__(maxsize)
+
+    def resolve(self, data):
+        """
+        Return the query of a request, registering it if it is new.
+        """
+        query = data.get("query")
+        extensions = data.get("extensions") or {}
+        persisted_query = extensions.get("persistedQuery")
+        if not isinstance(persisted_query, dict):
+            return query
+
+        query_hash = persisted_query.get("sha256Hash")
+        if not isinstance(query_hash, str):
+            raise GraphQLError("The persisted query must have a sha256Hash.")
+
+        if query is None:
+            query = self.get(query_hash)
+            if query is None:
+                raise PersistedQueryNotFound()
+            return query
+
+        if get_query_hash(query) != query_hash:
+            raise GraphQLError("The persisted query does not match its hash.")
+        return self.put(query_hash, query)
+
+
+async def graphql(
+        schema, data, *,
+        document_cache,
+        persisted_queries=None,
+        context_value=None,
+        root_value=None,
+        debug=False,
+        introspection=True,
+        logger=None,
+        validation_rules=None,
+        error_formatter=format_error,
+        middleware=None,
+        extensions=None,
+        query_only=False,
+):
+    """
+    Execute a query like ariadne.graphql, with cached documents.
+
+    With `query_only`, other operations than queries are rejected.
+
+    Return:
+        (success, response)
+    """
+    extension_manager = ExtensionManager(extensions, context_value)
+
+    with extension_manager.request():
+        try:
+            if not isinstance(data, dict):
+                raise GraphQLError("Operation data should be a JSON object")
+            if persisted_queries is not None:
+                query = persisted_queries.resolve(data)
+            else:
+                query = data.get("query")
+            variables = data.get("variables")
+            validate_query_body(query)
+            validate_variables(variables)
+            validate_operation_name(data.get("operationName"))
+
+            document, errors = document_cache.get_document(query, introspection)
+            if not errors and query_only:
+                operation = get_operation_ast(
+                    document, data.get("operationName"),
+                )
+                if operation is None or (
+                        operation.operation is not OperationType.QUERY
+                ):
+                    raise GraphQLError("Only queries can be sent with GET.")
+            if not errors and validation_rules is not None:
+                if callable(validation_rules):
+                    validation_rules = validation_rules(
+                        context_value, document, data,
+                    )
+                errors = validate(schema, document, rules=validation_rules)
+            if errors:
+                return handle_graphql_errors(
+                    errors,
+                    logger=logger,
+                    error_formatter=error_formatter,
+                    debug=debug,
+                    extension_manager=extension_manager,
+                )
+
+            if callable(root_value):
+                root_value = root_value(context_value, document)
+                if inspect.isawaitable(root_value):
+                    root_value = await root_value
+
+            result = execute(
+                schema,
+                document,
+                root_value=root_value,
+                context_value=context_value,
+                variable_values=variables,
+                operation_name=data.get("operationName"),
+                execution_context_class=ExecutionContext,
+                middleware=extension_manager.as_middleware_manager(middleware),
+            )
+            if inspect.isawaitable(result):
+                result = await result
+        except GraphQLError as error:
+            return handle_graphql_errors(
+                [error],
+                logger=logger,
+                error_formatter=error_formatter,
+                debug=debug,
+                extension_manager=extension_manager,
+            )
+        else:
+            return handle_query_result(
+                result,
+                logger=logger,
+                error_formatter=error_formatter,
+                debug=debug,
+                extension_manager=extension_manager,
+            )
@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import json
+import zlib
+
+from starlette.responses import PlainTextResponse, Response
+
+from gqles.application import get_system_runner
+import gqles.database
+import gqles.infrastructure
+import gqles.notifications
+
+
+# Records are read this many at a time, a few megabytes at most.
+DEFAULT_CHUNK_SIZE = 5000
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# Gzip container, rather than zlib's.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def get_head(application):
+    """
+    Return the ID of the last notification of an application, or 0.
+    """
+    record_manager = gqles.infrastructure.get_read_event_store(
+        application,
+    ).record_manager
+    return record_manager.get_max_notification_id()
+
+
+async def read_chunks(
+        application, after=0, until=None, chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Read an application's notification log in chunks, with keyset reads
+    in a worker thread, so that the event loop is never blocked.
+
+    `after` and `until` are notification IDs, the first is exclusive and
+    the second inclusive.
+
+    Yield:
+        Lists of notifications, in log order.
+    """
+    while until is None or after < until:
+        # Notification IDs are one-based, positions are zero-based.
+        notifications = await gqles.database.run_in_threadpool(
+            gqles.notifications.read_notifications,
+            application,
+            after=after - 1,
+            before=until,
+            limit=chunk_size,
+        )
+        if not notifications:
+            return
+        yield notifications
+        if len(notifications) < chunk_size:
+            return
+        after = notifications[-1]["id"]
+
+
+def to_record(application, notification):
+    """
+    Export record of a notification, the state is encoded in base64 as
+    it is stored, like the state of notifications in the backstage.
+    """
+    record_manager = application.event_store.record_manager
+    field_names = record_manager.field_names
+    state = notification[field_names.state]
+    timestamp = notification.get("timestamp")
+    return dict(
+        id=notification["id"],
+        originatorId=str(notification[field_names.sequence_id]),
+        originatorVersion=notification[field_names.position],
+        topic=notification[field_names.topic],
+        state=base64.b64encode(state).decode("ascii") if state else None,
+        causalDependencies=notification.get("causal_dependencies"),
+        # Decimals, kept exact.
+        timestamp=str(timestamp) if timestamp is not None else None,
+    )
+
+
+async def generate_ndjson(
+        application, after=0, until=None, chunk_size=DEFAULT_CHUNK_SIZE,
+        compress=False,
+):
+    """
+    Export an application's notification log as newline-delimited JSON,
+    gzipped with `compress`.
+
+    Only a chunk of records is ever held in memory. Every record has
+    the ID of its notification, exports resume after the last one.
+
+    Yield:
+        Bytes.
+    """
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if compress else None
+    async for notifications in read_chunks(
+            application, after, until, chunk_size,
+    ):
+        data = "".join(
+            json.dumps(to_record(application, notification)) + "\n"
+            for notification in notifications
+        ).encode("utf8")
+        if compressor is not None:
+            # Flushed, so that clients get whole records of each chunk.
+            data = (
+                compressor.compress(data)
+                + compressor.flush(zlib.Z_SYNC_FLUSH)
+            )
+        yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+class ExportResponse(Response):
+    """
+    Response streaming the chunks of an async generator of bytes, until
+    it is exhausted or the client disconnects.
+
+    Starlette's StreamingResponse waits on bare coroutines, which
+    asyncio no longer accepts, the ASGI messages are sent here instead.
+    """
+
+    def __init__(self, chunks, headers=None, media_type=None):
+        self.chunks = chunks
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await send(dict(
+                type="http.response.start",
+                status=self.status_code,
+                headers=self.raw_headers,
+            ))
+            async for chunk in self.chunks:
+                if disconnected.done():
+                    # Nobody to send the rest to.
+                    return
+                await send(dict(
+                    type="http.response.body", body=chunk, more_body=True,
+                ))
+            await send(dict(
+                type="http.response.body", body=b"", more_body=False,
+            ))
+        finally:
+            disconnected.cancel()
+            await self.chunks.aclose()
+
+
+def accepts_gzip(request):
+    encodings = request.headers.get("accept-encoding", "")
+    return any(
+        encoding.split(";")[0].strip() == "gzip"
+        for encoding in encodings.split(",")
+    )
+
+
+async def export_endpoint(request):
+    """
+    Starlette endpoint streaming the notification log of an application
+    as newline-delimited JSON:
+
+        /backstage/export/{application}?after=&until=
+
+    `after` and `until` are notification IDs, the export is of the
+    notifications after `after` (or from the beginning), until `until`
+    included (or the head of the log when the export starts, sent in
+    the X-Export-Until header). To resume an export, pass the ID of the
+    last record exported as `after`. Responses are gzipped for clients
+    accepting it.
+    """
+    system_runner = await get_system_runner()
+    application = system_runner.processes.get(
+        request.path_params["application"],
+    )
+    if application is None:
+        return PlainTextResponse("Unknown application", status_code=404)
+
+    try:
+        after = int(request.query_params.get("after") or 0)
+        until = request.query_params.get("until")
+        until = int(until) if until else None
+    except ValueError:
+        return PlainTextResponse(
+            "after and until must be notification IDs", status_code=400,
+        )
+
+    # Notifications written during the export are left for the next one.
+    if until is None:
+        until = await gqles.database.run_in_threadpool(
+            get_head, application,
+        )
+
+    compress = accepts_gzip(request)
+    headers = {"X-Export-Until": str(until)}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return ExportResponse(
+        generate_ndjson(application, after, until, compress=compress),
+        media_type=NDJSON_CONTENT_TYPE,
+        headers=headers,
+    )
@@ -0,0 +1,577 @@
+import copy
+import logging
+import time
+
+from sqlalchemy import (
+    DECIMAL, BigInteger, Column, Index, Integer, String, Text, and_, func,
+)
+from sqlalchemy_utils.types.uuid import UUIDType
+
+import eventsourcing.application.sqlalchemy
+import eventsourcing.infrastructure.eventsourcedrepository
+import eventsourcing.infrastructure.eventstore
+import eventsourcing.infrastructure.sequenceditemmapper
+from eventsourcing.application.notificationlog import (
+    RecordManagerNotificationLog,
+)
+from eventsourcing.exceptions import ConcurrencyError, RecordConflictError
+from eventsourcing.infrastructure.sqlalchemy.records import Base
+from eventsourcing.utils.topic import get_topic
+
+import gqles.cache
+import gqles.codec
+import gqles.compression
+import gqles.metrics
+import gqles.model
+import gqles.snapshots
+
+
+logger = logging.getLogger(__name__)
+
+
+class OriginatorRecord(Base):
+    __tablename__ = "gqles_originators"
+
+    # Application ID.
+    application_name = Column(String(length=32), primary_key=True)
+
+    # Originator ID (e.g. an entity or aggregate ID).
+    originator_id = Column(UUIDType(), primary_key=True)
+
+    # Topic of the originator (e.g. path to aggregate class).
+    topic = Column(Text(), nullable=False)
+
+    # Version of the most recent event of the originator.
+    originator_version = Column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=False,
+    )
+
+    # Timestamp of the most recent event of the originator.
+    timestamp = Column(DECIMAL(24, 6, 6), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "gqles_originators_topic_index",
+            "topic",
+            "timestamp",
+        ),
+        Index(
+            "gqles_originators_originator_id_index",
+            "originator_id",
+        ),
+    )
+
+
+class EventTimestampRecord(Base):
+    __tablename__ = "gqles_event_timestamps"
+
+    # Application ID.
+    application_name = Column(String(length=32), primary_key=True)
+
+    # Originator ID (e.g. an entity or aggregate ID).
+    originator_id = Column(UUIDType(), primary_key=True)
+
+    # Version of the event.
+    originator_version = Column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True,
+    )
+
+    # Timestamp of the event.
+    timestamp = Column(DECIMAL(24, 6, 6), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "gqles_event_timestamps_index",
+            "application_name",
+            "timestamp",
+        ),
+    )
+
+
+def get_originator_topic(event):
+    """
+    Topic of the aggregate a domain event belongs to.
+
+    Created events know it, for the others we rely on the event class
+    being defined on the aggregate class (see @subclassevents).
+    """
+    try:
+        return event.__dict__["originator_topic"]
+    except KeyError:
+        pass
+    module, _, qualname = get_topic(type(event)).partition("#")
+    return "%s#%s" % (module, qualname.rpartition(".")[0] or qualname)
+
+
+class OriginatorCatalog:
+    """
+    Index of the originators of an application.
+
+    The catalog is kept up to date in the same transaction as the
+    events, so it can be trusted to locate an originator without
+    probing the event stores.
+    """
+
+    def __init__(self, record_manager, record_class=OriginatorRecord):
+        self.record_manager = record_manager
+        self.record_class = record_class
+
+    @property
+    def application_name(self):
+        return self.record_manager.application_name
+
+    @property
+    def session(self):
+        return self.record_manager.session
+
+    def records_for(self, events):
+        """
+        Catalog records to save along with the given events.
+        """
+
+        latest = {}
+        for event in events:
+            version = getattr(event, "originator_version", None)
+            if version is None:
+                continue
+            current = latest.get(event.originator_id)
+            if current is None or version > current.originator_version:
+                latest[event.originator_id] = event
+
+        if not latest:
+            return []
+
+        # One query for the whole batch.
+        existing = {
+            record.originator_id: record
+            for record in self.query(
+                self.record_class.application_name == self.application_name,
+                self.record_class.originator_id.in_(list(latest)),
+            )
+        }
+
+        records = []
+        for originator_id, event in latest.items():
+            record = existing.get(originator_id)
+            if record is None:
+                record = self.record_class(
+                    application_name=self.application_name,
+                    originator_id=originator_id,
+                    topic=get_originator_topic(event),
+                )
+            elif record.originator_version >= event.originator_version:
+                # Rebuilding from older events, see gqles.rebuild.
+                continue
+            record.originator_version = event.originator_version
+            record.timestamp = event.timestamp
+            records.append(record)
+
+        return records
+
+    def query(self, *criterion):
+        return self.session.query(self.record_class).filter(*criterion)
+
+
+class EventTimestampIndex:
+    """
+    Index of the timestamps of an application's events.
+
+    Stored events only have their timestamp in their (possibly
+    encrypted) state, the index lets notifications be looked up by
+    time without decoding anything. Like the originator catalog, it is
+    kept up to date in the same transaction as the events.
+    """
+
+    def __init__(self, record_manager, record_class=EventTimestampRecord):
+        self.record_manager = record_manager
+        self.record_class = record_class
+
+    @property
+    def application_name(self):
+        return self.record_manager.application_name
+
+    def records_for(self, events):
+        """
+        Index records to save along with the given events.
+        """
+
+        return [
+            self.record_class(
+                application_name=self.application_name,
+                originator_id=event.originator_id,
+                originator_version=event.originator_version,
+                timestamp=event.timestamp,
+            )
+            for event in events
+            if getattr(event, "originator_version", None) is not None
+            and getattr(event, "timestamp", None) is not None
+        ]
+
+    def version_at(self, originator_id, timestamp):
+        """
+        Return the last version of an originator recorded at or before
+        `timestamp`, or None.
+        """
+
+        return self.record_manager.session.query(
+            func.max(self.record_class.originator_version),
+        ).filter(
+            self.record_class.application_name == self.application_name,
+            self.record_class.originator_id == originator_id,
+            self.record_class.timestamp <= timestamp,
+        ).scalar()
+
+    def join_condition(self):
+        """
+        Condition to join the index to the application's stored events.
+        """
+
+        record_manager = self.record_manager
+        record_class = record_manager.record_class
+        field_names = record_manager.field_names
+
+        return and_(
+            self.record_class.application_name == self.application_name,
+            self.record_class.originator_id == getattr(
+                record_class, field_names.sequence_id,
+            ),
+            self.record_class.originator_version == getattr(
+                record_class, field_names.position,
+            ),
+        )
+
+
+class EventStore(eventsourcing.infrastructure.eventstore.EventStore):
+    """
+    Event store that keeps an originator catalog and an event timestamp
+    index up to date.
+    """
+
+    catalog = None
+    timestamps = None
+
+    def index_records_for(self, events):
+        """
+        Catalog and index records to save along with the given events.
+        """
+
+        return [
+            *(self.catalog.records_for(events) if self.catalog else []),
+            *(self.timestamps.records_for(events) if self.timestamps else []),
+        ]
+
+    def store_events(self, events):
+        if self.catalog is None and self.timestamps is None:
+            return super().store_events(events)
+
+        events = list(events)
+        record_manager = self.record_manager
+        records = record_manager.to_records(self.items_from_events(events))
+        try:
+            record_manager.write_records(
+                records,
+                orm_objs_pending_save=self.index_records_for(events),
+            )
+        except RecordConflictError as e:
+            raise ConcurrencyError(e)
+
+
+class SequencedItemMapper(
+        eventsourcing.infrastructure.sequenceditemmapper.SequencedItemMapper,
+):
+    """
+    Sequenced item mapper that remembers how topics resolve.
+
+    States encoded with gqles.codec are read as well as JSON ones.
+    """
+
+    def get_event_class_and_attrs(self, topic, state):
+        domain_event_class = gqles.cache.resolve_topic(topic)
+
+        if self.cipher:
+            state = self.cipher.decrypt(state)
+
+        if self.compressor:
+            state = self.compressor.decompress(state)
+
+        if gqles.codec.is_encoded(state):
+            return domain_event_class, gqles.codec.decode(state)
+        return domain_event_class, self.json_loads(state.decode("utf8"))
+
+    def get_item_topic_and_state(self, domain_event_class, event_attrs):
+        topic = get_topic(domain_event_class)
+
+        statebytes = self.encode_state(domain_event_class, event_attrs)
+
+        # Compressing encrypted states would not gain anything, they are
+        # compressed first.
+        if isinstance(
+                self.compressor, gqles.compression.DictionaryCompressor,
+        ):
+            statebytes = self.compressor.compress(statebytes, topic=topic)
+        elif self.compressor:
+            statebytes = self.compressor.compress(statebytes)
+
+        if self.cipher:
+            statebytes = self.cipher.encrypt(statebytes)
+
+        return topic, statebytes
+
+    def encode_state(self, domain_event_class, event_attrs):
+        return self.json_dumps(event_attrs)
+
+
+class BinarySequencedItemMapper(SequencedItemMapper):
+    """
+    Sequenced item mapper that encodes states with gqles.codec.
+
+    Use it as the sequenced_item_mapper_class of an application. The
+    states recorded as JSON before stay readable.
+    """
+
+    def encode_state(self, domain_event_class, event_attrs):
+        return gqles.codec.encode(
+            event_attrs, gqles.codec.get_field_encoders(domain_event_class),
+        )
+
+
+class EventSourcedRepository(
+        eventsourcing.infrastructure.eventsourcedrepository
+        .EventSourcedRepository,
+):
+    """
+    Repository that replays recorded events without validating the
+    models they construct again.
+    """
+
+    def project_events(self, initial_state, domain_events):
+        with gqles.model.trusted():
+            return super().project_events(initial_state, domain_events)
+
+
+class SQLAlchemyApplication(
+        eventsourcing.application.sqlalchemy.SQLAlchemyApplication,
+):
+    """
+    SQLAlchemy application with the infrastructure gqles relies on.
+    """
+
+    event_store_class = EventStore
+    repository_class = EventSourcedRepository
+    sequenced_item_mapper_class = SequencedItemMapper
+    originator_record_class = OriginatorRecord
+    event_timestamp_record_class = EventTimestampRecord
+    # When to snapshot aggregates, like gqles.snapshots.EveryNEvents(100).
+    # Process applications can set it too, they are mixed in.
+    snapshotting = None
+    # Compress states with the dictionaries trained for the application
+    # by gqles.compression.retrain, instead of plain zlib.
+    compression_dictionaries = False
+    compression_dictionary_record_class = (
+        gqles.compression.CompressionDictionaryRecord
+    )
+
+    def __init__(self, snapshotting=None, read_session=None, **kwargs):
+        self.metrics = gqles.metrics.ProcessMetrics()
+        if snapshotting is not None:
+            self.snapshotting = snapshotting
+        self.snapshot_store = None
+        self.snapshot_strategy = None
+        # Session of a read engine, see gqles.database.create_read_engine.
+        # The backstage reads through it, not to contend with the
+        # writes of the policies.
+        self.read_session = read_session
+        self.read_event_store = None
+        self.read_notification_log = None
+        self.read_snapshot_strategy = None
+        super().__init__(**kwargs)
+
+    def construct_event_store(self):
+        if self.compression_dictionaries:
+            self.compressor = gqles.compression.DictionaryCompressor(
+                self.session,
+                self.name,
+                record_class=self.compression_dictionary_record_class,
+            )
+        super().construct_event_store()
+        self.event_store.catalog = OriginatorCatalog(
+            self.event_store.record_manager,
+            record_class=self.originator_record_class,
+        )
+        self.event_store.timestamps = EventTimestampIndex(
+            self.event_store.record_manager,
+            record_class=self.event_timestamp_record_class,
+        )
+        if self.snapshotting is not None:
+            self.snapshot_store = (
+                eventsourcing.infrastructure.eventstore.EventStore(
+                    record_manager=(
+                        self.infrastructure_factory
+                        .construct_snapshot_record_manager()
+                    ),
+                    event_mapper=self.event_store.event_mapper,
+                )
+            )
+        if self.read_session is not None:
+            self.read_event_store = self.construct_read_event_store()
+
+    def construct_read_event_store(self):
+        """
+        Event store reading the application's records through the read
+        session, with its own catalog and timestamp index.
+        """
+        record_manager = copy.copy(self.event_store.record_manager)
+        record_manager.session = self.read_session
+        read_event_store = self.event_store_class(
+            record_manager=record_manager,
+            event_mapper=self.event_store.event_mapper,
+        )
+        read_event_store.catalog = OriginatorCatalog(
+            record_manager, record_class=self.originator_record_class,
+        )
+        read_event_store.timestamps = EventTimestampIndex(
+            record_manager, record_class=self.event_timestamp_record_class,
+        )
+        return read_event_store
+
+    def construct_notification_log(self):
+        super().construct_notification_log()
+        if self.read_event_store is not None:
+            self.read_notification_log = RecordManagerNotificationLog(
+                self.read_event_store.record_manager,
+                section_size=self.notification_log_section_size,
+            )
+
+    def change_pipeline(self, pipeline_id):
+        super().change_pipeline(pipeline_id)
+        if self.read_event_store is not None:
+            self.read_event_store.record_manager.pipeline_id = pipeline_id
+
+    def construct_repository(self, **kwargs):
+        # The repository starts from the last snapshot when loading.
+        if self.snapshot_store is not None:
+            self.snapshot_strategy = gqles.snapshots.SnapshotStrategy(
+                snapshot_store=self.snapshot_store,
+            )
+            kwargs.setdefault("snapshot_strategy", self.snapshot_strategy)
+            if self.read_session is not None:
+                self.read_snapshot_strategy = (
+                    self.construct_read_snapshot_strategy()
+                )
+        super().construct_repository(**kwargs)
+
+    def construct_read_snapshot_strategy(self):
+        """
+        Snapshot strategy finding snapshots through the read session.
+        """
+        record_manager = copy.copy(self.snapshot_store.record_manager)
+        record_manager.session = self.read_session
+        return gqles.snapshots.SnapshotStrategy(
+            snapshot_store=eventsourcing.infrastructure.eventstore.EventStore(
+                record_manager=record_manager,
+                event_mapper=self.snapshot_store.event_mapper,
+            ),
+        )
+
+    def setup_table(self):
+        super().setup_table()
+        if self._datastore is not None:
+            self.datastore.setup_table(self.originator_record_class)
+            self.datastore.setup_table(self.event_timestamp_record_class)
+            if self.snapshot_store is not None:
+                self.datastore.setup_table(
+                    self.snapshot_store.record_manager.record_class,
+                )
+            if self.compression_dictionaries:
+                self.datastore.setup_table(
+                    self.compression_dictionary_record_class,
+                )
+
+    def record_process_event(self, process_event):
+        process_event.orm_objs_pending_save = [
+            *process_event.orm_objs_pending_save,
+            *self.event_store.index_records_for(process_event.domain_events),
+        ]
+        records = super().record_process_event(process_event)
+        self.take_snapshots_of(process_event.domain_events)
+        return records
+
+    def take_snapshots_of(self, events):
+        """
+        Snapshot the aggregates of recorded events, as `snapshotting`
+        decides.
+        """
+
+        if self.snapshotting is None:
+            return
+        for event in events:
+            if getattr(event, "originator_version", None) is None:
+                continue
+            try:
+                if self.snapshotting.should_snapshot(self, event):
+                    self.repository.take_snapshot(
+                        event.originator_id, lte=event.originator_version,
+                    )
+            except Exception:
+                # The events are recorded, snapshots are only an
+                # optimisation.
+                logger.exception(
+                    "Snapshotting %s at version %d failed",
+                    event.originator_id, event.originator_version,
+                )
+
+    def call_policy(self, domain_event):
+        started = time.perf_counter()
+        result = super().call_policy(domain_event)
+        self.metrics.record_policy(
+            get_topic(type(domain_event)), time.perf_counter() - started,
+        )
+        return result
+
+
+def get_read_event_store(application):
+    """
+    Return the event store to read an application from, the one of its
+    read session if it has one.
+    """
+    return (
+        getattr(application, "read_event_store", None)
+        or application.event_store
+    )
+
+
+def get_read_notification_log(application):
+    """
+    Return the notification log to read an application from.
+    """
+    return (
+        getattr(application, "read_notification_log", None)
+        or application.notification_log
+    )
+
+
+def get_read_snapshot_strategy(application):
+    """
+    Return the snapshot strategy to find the snapshots of an application
+    with, if it takes snapshots.
+    """
+    return (
+        getattr(application, "read_snapshot_strategy", None)
+        or getattr(application, "snapshot_strategy", None)
+    )
+
+
+def get_catalog(application):
+    """
+    Return the originator catalog to read an application from, if it
+    has one.
+    """
+    return getattr(get_read_event_store(application), "catalog", None)
+
+
+def get_timestamp_index(application):
+    """
+    Return the event timestamp index to read an application from, if it
+    has one.
+    """
+    return getattr(get_read_event_store(application), "timestamps", None)
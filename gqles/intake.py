@@ -0,0 +1,173 @@
+import asyncio
+import logging
+
+from eventsourcing.application.simple import ProcessEvent
+
+from gqles.application import get_system_runner
+import gqles.commands
+import gqles.database
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.005
+DEFAULT_MAX_BATCH_SIZE = 100
+
+
+class CommandIntake:
+    """
+    Record the commands submitted within a short window together.
+
+    Commands are functions that create an aggregate without saving it,
+    like `CreateOrder.create`. The pending events of all the commands of
+    a batch are written in a single transaction, so they get contiguous
+    notification IDs and pay for a single commit, and a single prompt is
+    published for them.
+
+    A command that fails to create its aggregate is rejected alone. When
+    the write of a batch fails even after retrying, its commands are
+    written one by one, so that only the offending ones are rejected.
+    """
+
+    def __init__(
+            self,
+            application_name,
+            window=DEFAULT_WINDOW,
+            max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+            dispatcher=None,
+    ):
+        self.application_name = application_name
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.dispatcher = dispatcher or gqles.commands.command_dispatcher
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, command, *args, **kwargs):
+        """
+        Submit a command to the next batch.
+
+        Return:
+            The ID of the aggregate created by the command, once it is
+            recorded.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append((command, args, kwargs, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(
+                self.window, self._flush,
+            )
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self.flush(batch))
+
+    async def flush(self, batch):
+        try:
+            application = (await get_system_runner()).processes[
+                self.application_name
+            ]
+        except Exception as error:
+            for *_, future in batch:
+                _reject(future, error)
+            return
+
+        # The batch is flushed in the context of the submitter that
+        # started it, whose request may be done, and its session removed,
+        # before the other commands are written: it has its own.
+        with gqles.database.session_scope(
+                *gqles.database.get_scoped_sessions(application),
+        ):
+            await self._write_batch(application, batch)
+
+    async def _write_batch(self, application, batch):
+        try:
+            created = await self.dispatcher.run(self._create, batch)
+        except Exception as error:
+            for *_, future in batch:
+                _reject(future, error)
+            return
+
+        accepted = []
+        for (*_, future), (aggregate_id, events, error) in zip(batch, created):
+            if error is not None:
+                _reject(future, error)
+            else:
+                accepted.append((aggregate_id, events, future))
+        if not accepted:
+            return
+
+        try:
+            await self._write(application, accepted)
+        except Exception as error:
+            if len(accepted) == 1:
+                _reject(accepted[0][-1], error)
+                return
+            logger.warning(
+                "Writing a batch of %d commands failed, writing them one "
+                "by one: %r", len(accepted), error,
+            )
+            await asyncio.gather(*(
+                self._write_alone(application, entry) for entry in accepted
+            ))
+
+    @staticmethod
+    def _create(batch):
+        """
+        Return:
+            [(aggregate ID, pending events, error), ...]
+        """
+        created = []
+        for command, args, kwargs, _ in batch:
+            try:
+                aggregate = command(*args, **kwargs)
+                events = aggregate.__batch_pending_events__()
+            except Exception as error:
+                created.append((None, None, error))
+            else:
+                created.append((aggregate.id, events, None))
+        return created
+
+    async def _write(self, application, accepted):
+        events = [event for _, events, _ in accepted for event in events]
+        await self.dispatcher.dispatch(self._record, application, events)
+        # The commands are recorded whatever happens downstream, errors
+        # of the followers are logged rather than reported to callers.
+        try:
+            await self.dispatcher.run(application.publish_prompt)
+        except Exception:
+            logger.exception(
+                "Prompting the followers of %s failed", application.name,
+            )
+        for aggregate_id, _, future in accepted:
+            _resolve(future, aggregate_id)
+
+    async def _write_alone(self, application, entry):
+        try:
+            await self._write(application, [entry])
+        except Exception as error:
+            _reject(entry[-1], error)
+
+    @staticmethod
+    def _record(application, events):
+        # Process events are changed by the application, retries need
+        # a new one.
+        application.record_process_event(ProcessEvent(domain_events=events))
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _reject(future, error):
+    if not future.done():
+        future.set_exception(error)
@@ -0,0 +1,234 @@
+import collections
+import threading
+import time
+
+from starlette.responses import PlainTextResponse
+
+from gqles.application import get_system_runner
+
+
+# Throughput is averaged over this many seconds.
+DEFAULT_THROUGHPUT_WINDOW = 60
+
+# Starlette adds the charset.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class ProcessMetrics:
+    """
+    Events processed by a process application, and the time spent in
+    its policy per event class.
+
+    Processed events are counted in buckets of a second, so that the
+    memory used does not grow with the throughput.
+    """
+
+    def __init__(self, window=DEFAULT_THROUGHPUT_WINDOW):
+        self.window = window
+        self.processed = 0
+        # {event class: [count, seconds]}
+        self.policies = {}
+        self._buckets = collections.deque()
+        self._lock = threading.Lock()
+
+    def record_policy(self, event_class, seconds, now=None):
+        now = int(time.monotonic() if now is None else now)
+        with self._lock:
+            self.processed += 1
+            entry = self.policies.setdefault(event_class, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            if self._buckets and self._buckets[-1][0] == now:
+                self._buckets[-1][1] += 1
+            else:
+                self._buckets.append([now, 1])
+            self._prune(now)
+
+    def _prune(self, now):
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def get_throughput(self, now=None):
+        """
+        Return:
+            Events processed per second, over the last window.
+        """
+        now = int(time.monotonic() if now is None else now)
+        with self._lock:
+            self._prune(now)
+            return sum(count for _, count in self._buckets) / self.window
+
+    def get_policies(self):
+        """
+        Return:
+            [(event class, count, seconds), ...]
+        """
+        with self._lock:
+            return [
+                (event_class, count, seconds)
+                for event_class, (count, seconds) in sorted(self.policies.items())
+            ]
+
+
+def get_metrics(application):
+    """
+    Return the metrics of an application, if it records them.
+    """
+    return getattr(application, "metrics", None)
+
+
+def get_lag(application, processes):
+    """
+    How far an application is behind the notification logs it follows.
+
+    Return:
+        [(upstream name, tracked position, upstream head), ...]
+    """
+    # Deferred, gqles.infrastructure needs gqles.metrics.
+    import gqles.infrastructure
+
+    lag = []
+    for upstream_name in getattr(application, "readers", ()):
+        upstream = processes[upstream_name]
+        # Read like the head, so that both are as recent.
+        position = gqles.infrastructure.get_read_event_store(
+            application,
+        ).record_manager.get_max_tracking_record_id(upstream_name) or 0
+        head = gqles.infrastructure.get_read_event_store(
+            upstream,
+        ).record_manager.get_max_notification_id()
+        lag.append((upstream_name, position, head))
+    return lag
+
+
+def get_lag_data(application, processes):
+    return [
+        dict(
+            upstreamName=upstream_name,
+            position=position,
+            head=head,
+            lag=max(0, head - position),
+        )
+        for upstream_name, position, head in get_lag(application, processes)
+    ]
+
+
+def get_throughput_data(application):
+    metrics = get_metrics(application)
+    if metrics is None:
+        return dict(
+            eventsPerSecond=0.0,
+            processed=0,
+            window=DEFAULT_THROUGHPUT_WINDOW,
+            policies=[],
+        )
+    return dict(
+        eventsPerSecond=metrics.get_throughput(),
+        processed=metrics.processed,
+        window=metrics.window,
+        policies=[
+            dict(
+                eventClass=event_class,
+                count=count,
+                totalSeconds=seconds,
+                meanSeconds=seconds / count,
+            )
+            for event_class, count, seconds in metrics.get_policies()
+        ],
+    )
+
+
+METRIC_FAMILIES = [
+    ("gqles_process_position", "gauge",
+     "Last notification of the upstream processed by the application."),
+    ("gqles_upstream_head", "gauge",
+     "Last notification in the notification log of the upstream."),
+    ("gqles_process_lag", "gauge",
+     "Notifications of the upstream not processed yet."),
+    ("gqles_processed_events_total", "counter",
+     "Events processed by the application."),
+    ("gqles_process_throughput", "gauge",
+     "Events processed per second by the application."),
+    ("gqles_policy_seconds", "summary",
+     "Time spent in the policy of the application, per event class."),
+]
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _sample(name, value, **labels):
+    labels = ",".join(
+        '%s="%s"' % (key, _escape(label)) for key, label in labels.items()
+    )
+    return "%s{%s} %s" % (name, labels, repr(float(value)))
+
+
+def render_prometheus(processes):
+    """
+    Render the metrics of all applications in the Prometheus text
+    exposition format.
+    """
+    families = collections.OrderedDict(
+        (name, (kind, help, [])) for name, kind, help in METRIC_FAMILIES
+    )
+
+    def add(name, *lines):
+        families[name][2].extend(lines)
+
+    for application_name, application in processes.items():
+        for upstream_name, position, head in get_lag(application, processes):
+            labels = dict(application=application_name, upstream=upstream_name)
+            add("gqles_process_position", _sample(
+                "gqles_process_position", position, **labels,
+            ))
+            add("gqles_upstream_head", _sample(
+                "gqles_upstream_head", head, **labels,
+            ))
+            add("gqles_process_lag", _sample(
+                "gqles_process_lag", max(0, head - position), **labels,
+            ))
+
+        metrics = get_metrics(application)
+        if metrics is None:
+            continue
+        add("gqles_processed_events_total", _sample(
+            "gqles_processed_events_total", metrics.processed,
+            application=application_name,
+        ))
+        add("gqles_process_throughput", _sample(
+            "gqles_process_throughput", metrics.get_throughput(),
+            application=application_name,
+        ))
+        for event_class, count, seconds in metrics.get_policies():
+            labels = dict(application=application_name, event_class=event_class)
+            add(
+                "gqles_policy_seconds",
+                _sample("gqles_policy_seconds_count", count, **labels),
+                _sample("gqles_policy_seconds_sum", seconds, **labels),
+            )
+
+    lines = []
+    for name, (kind, help, samples) in families.items():
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+async def prometheus_endpoint(request):
+    """
+    Starlette endpoint serving the metrics of the system runner to
+    Prometheus.
+    """
+    system_runner = await get_system_runner()
+    return PlainTextResponse(
+        render_prometheus(system_runner.processes),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
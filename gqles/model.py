@@ -1,3 +1,5 @@
+import contextlib
+import contextvars
 from dataclasses import dataclass
 
 import pydantic
@@ -8,32 +10,89 @@ from eventsourcing.domain.model.entity import MetaDomainEntity
 # FIXME: Before this goes into production it should be proven
 # compatible with the whole eventsourcing library.
 
+_trusted = contextvars.ContextVar("gqles_model_trusted", default=False)
+
+
+@contextlib.contextmanager
+def trusted():
+    """
+    Construct models without validating their fields, within the block.
+
+    For values that were validated before, like the ones of recorded
+    events: replaying them does not need to validate them again.
+    """
+    token = _trusted.set(True)
+    try:
+        yield
+    finally:
+        _trusted.reset(token)
+
+
+def is_trusted():
+    return _trusted.get()
+
+
 class ModelMetaclassWithMetaDomainEntity(
         pydantic.main.ModelMetaclass, MetaDomainEntity,
 ):
-    pass
+
+    def __init__(cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Attributes are routed on every write, and on every replayed
+        # event, so the routing table is built once per class.
+        # __fields__ holds the inherited fields too.
+        cls.__model_fields__ = frozenset(cls.__fields__)
+        # Where eventsourcing's attributes go: what comes after pydantic
+        # in the MRO of the class.
+        cls.__entity_init__ = super(pydantic.BaseModel, cls).__init__
+        cls.__entity_setattr__ = super(pydantic.BaseModel, cls).__setattr__
+
 
 class Model(pydantic.BaseModel, metaclass=ModelMetaclassWithMetaDomainEntity):
 
-    def __is_annotated(self, name):
-        try:
-            return name in self.__annotations__
-        except AttributeError:
-            return False
+    @classmethod
+    def __create__(cls, **kwargs):
+        # Created events hold the validated values rather than the
+        # given ones, so that replaying them can trust them.
+        values, fields_set, error = pydantic.validate_model(cls, kwargs)
+        if error is not None:
+            raise error
+        with trusted():
+            return super().__create__(**{
+                **kwargs, **{k: values[k] for k in fields_set},
+            })
 
     def __init__(self, **kwargs):
-        # Fun fact: pydantic.BaseModel doesn't call super().__init__.
-        # Let's abuse that so we can filter out used kwargs.
-        pydantic.BaseModel.__init__(self, **kwargs)
+        if _trusted.get():
+            self.__set_trusted_fields(kwargs)
+        else:
+            # Fun fact: pydantic.BaseModel doesn't call super().__init__.
+            # Let's abuse that so we can filter out used kwargs.
+            pydantic.BaseModel.__init__(self, **kwargs)
         # Now we call super, starting after BaseModel.
-        super(pydantic.BaseModel, self).__init__(**{
-            k: v for k, v in kwargs.items() if not self.__is_annotated(k)
+        fields = self.__model_fields__
+        self.__entity_init__(**{
+            k: v for k, v in kwargs.items() if k not in fields
         })
 
+    def __set_trusted_fields(self, kwargs):
+        # What pydantic.BaseModel.construct does, keeping the order of
+        # the fields.
+        values = {}
+        for name, field in self.__fields__.items():
+            if name in kwargs:
+                values[name] = kwargs[name]
+            elif not field.required:
+                values[name] = field.get_default()
+        object.__setattr__(self, "__dict__", values)
+        object.__setattr__(
+            self, "__fields_set__", kwargs.keys() & self.__model_fields__,
+        )
+        self._init_private_attributes()
+
     def __setattr__(self, attr, value):
         # Since eventsourcing doesn't use pedantic we need to bypass
         # pydantic.BaseModel for attributes that aren't managed by it.
-        return (
-            super(Model, self) if self.__is_annotated(attr)
-            else super(pydantic.BaseModel, self)
-        ).__setattr__(attr, value)
+        if attr in self.__model_fields__:
+            return pydantic.BaseModel.__setattr__(self, attr, value)
+        return self.__entity_setattr__(attr, value)
@@ -0,0 +1,271 @@
+import collections
+import heapq
+
+from gqles.cache import event_cache
+from gqles.infrastructure import get_read_event_store, get_timestamp_index
+
+
+def read_notifications(
+        application, after=None, before=None, limit=None,
+        reverse=False, with_state=True, since=None, until=None,
+):
+    """
+    Keyset read of an application's notification log.
+
+    One range query on notification IDs, `after` and `before` are
+    zero-based positions that are both exclusive. Without `with_state`
+    the state column is not even selected, notifications have a state
+    of None.
+
+    When the application has an event timestamp index, notifications
+    also get the "timestamp" of their event, and can be restricted to
+    events from `since` (inclusive) until `until` (exclusive). Without
+    an index, the time window is left to the caller.
+
+    Return:
+        Notifications in log order, or reversed with `reverse`.
+    """
+    record_manager = get_read_event_store(application).record_manager
+    record_class = record_manager.record_class
+    notification_id = getattr(record_class, record_manager.notification_id_name)
+
+    field_names = [
+        field_name for field_name in record_manager.field_names
+        if with_state or field_name != record_manager.field_names.state
+    ]
+    if hasattr(record_class, "causal_dependencies"):
+        field_names.append("causal_dependencies")
+
+    try:
+        query = record_manager.session.query(
+            notification_id,
+            *(getattr(record_class, field_name) for field_name in field_names),
+        )
+        query = record_manager.filter_for_application_name(query)
+        query = record_manager.filter_for_pipeline_id(query)
+        timestamps = get_timestamp_index(application)
+        if timestamps is not None:
+            timestamp = timestamps.record_class.timestamp
+            query = query.add_columns(timestamp)
+            if since is None and until is None:
+                query = query.outerjoin(
+                    timestamps.record_class, timestamps.join_condition(),
+                )
+            else:
+                query = query.join(
+                    timestamps.record_class, timestamps.join_condition(),
+                )
+            if since is not None:
+                query = query.filter(timestamp >= since)
+            if until is not None:
+                query = query.filter(timestamp < until)
+        # Notification IDs are one-based, positions are zero-based.
+        if after is not None:
+            query = query.filter(notification_id > after + 1)
+        if before is not None:
+            query = query.filter(notification_id < before + 1)
+        query = query.order_by(
+            notification_id.desc() if reverse else notification_id.asc(),
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+    finally:
+        record_manager.session.close()
+
+    notifications = []
+    for row in rows:
+        notification = {"id": row[0], record_manager.field_names.state: None}
+        notification.update(zip(field_names, row[1:]))
+        if timestamps is not None:
+            notification["timestamp"] = row[-1]
+        notifications.append(notification)
+    return notifications
+
+
+class NotificationStream:
+    """
+    Lazily read part of an application's notification log.
+
+    Notifications are fetched with keyset reads, in chunks that grow
+    geometrically, and are only decoded when the event at the head of
+    the stream is asked for. Without `with_state` only metadata is read,
+    and nothing can be decoded. The stream starts after `after` (or
+    before `before` when reversed) and ends at the other bound, both
+    are exclusive zero-based positions, and None means unbounded.
+
+    Notifications can be restricted to events from `since` until
+    `until`, see read_notifications. Applications without an event
+    timestamp index have their events decoded to be filtered instead.
+    """
+
+    def __init__(
+            self, application, after=None, before=None,
+            reverse=False, chunk_size=20, with_state=True,
+            since=None, until=None,
+    ):
+        self.application = application
+        self.reverse = reverse
+        self.chunk_size = max(1, chunk_size)
+        self.since = since
+        self.until = until
+        self._indexed = get_timestamp_index(application) is not None
+        self.with_state = with_state or not (
+            self._indexed or (since is None and until is None)
+        )
+        self._after = after
+        self._before = before
+        self._exhausted = False
+        self._buffer = collections.deque()
+        self._head_event = None
+        self.head = None
+        self.advance()
+
+    def __bool__(self):
+        return self.head is not None
+
+    def _fill(self):
+        if self._exhausted:
+            return False
+
+        notifications = read_notifications(
+            self.application,
+            after=self._after,
+            before=self._before,
+            limit=self.chunk_size,
+            reverse=self.reverse,
+            with_state=self.with_state,
+            since=self.since,
+            until=self.until,
+        )
+        self._exhausted = len(notifications) < self.chunk_size
+        if not notifications:
+            return False
+
+        # Notification IDs are one-based, positions are zero-based.
+        if self.reverse:
+            self._before = notifications[-1]["id"] - 1
+        else:
+            self._after = notifications[-1]["id"] - 1
+        self.chunk_size *= 2
+
+        self._buffer.extend(
+            (notification["id"] - 1, notification)
+            for notification in notifications
+            if self._indexed or self._in_window(notification)
+        )
+        return True
+
+    def _in_window(self, notification):
+        if self.since is None and self.until is None:
+            return True
+        timestamp = event_cache.decode(
+            self.application,
+            notification["originator_id"],
+            notification["originator_version"],
+            notification["topic"],
+            notification["state"],
+        ).event.timestamp
+        return (
+            (self.since is None or timestamp >= self.since)
+            and (self.until is None or timestamp < self.until)
+        )
+
+    def _read_state(self, notification):
+        # Read without state, yet to be decoded for its timestamp: the
+        # event is missing from the timestamp index, see gqles.rebuild.
+        record_manager = get_read_event_store(self.application).record_manager
+        item = record_manager.get_item(
+            notification["originator_id"], notification["originator_version"],
+        )
+        return getattr(item, record_manager.field_names.state)
+
+    def head_event(self):
+        """
+        Decode the event of the notification at the head of the stream.
+        """
+        if self._head_event is None:
+            _, notification = self.head
+            state = notification["state"]
+            if state is None:
+                state = self._read_state(notification)
+            self._head_event = event_cache.decode(
+                self.application,
+                notification["originator_id"],
+                notification["originator_version"],
+                notification["topic"],
+                state,
+            ).event
+        return self._head_event
+
+    def head_timestamp(self):
+        """
+        Timestamp of the event at the head of the stream.
+
+        Indexed timestamps are used when there are, otherwise the event
+        is decoded.
+        """
+        _, notification = self.head
+        timestamp = notification.get("timestamp")
+        if timestamp is None:
+            timestamp = self.head_event().timestamp
+        return timestamp
+
+    def advance(self):
+        """
+        Make the next notification the new head.
+
+        Return:
+            The previous head, (position, notification, event) or None.
+            The event is None unless it was decoded while at the head.
+        """
+        previous = self.head and (*self.head, self._head_event)
+        self._head_event = None
+
+        while not self._buffer:
+            if not self._fill():
+                self.head = None
+                return previous
+
+        self.head = self._buffer.popleft()
+        return previous
+
+
+def merge_notifications(streams, limit, reverse=False):
+    """
+    K-way merge of notification streams ordered by event timestamp.
+
+    Only the head of each stream is kept on the heap, so at most
+    `limit + len(streams)` notifications are ever decoded. A single
+    stream is already in order, and is passed through without decoding
+    anything. When timestamps are equal the earliest stream wins. A
+    `limit` of None merges the streams until they are exhausted.
+
+    Yield:
+        (stream, position, notification, event)
+    """
+
+    ordered = len(streams) < 2
+
+    def entry(index, stream):
+        if ordered:
+            return (0, index)
+        timestamp = stream.head_timestamp()
+        return (-timestamp if reverse else timestamp, index)
+
+    heap = [entry(index, stream) for index, stream in enumerate(streams) if stream]
+    heapq.heapify(heap)
+
+    while heap and (limit is None or limit > 0):
+        _, index = heap[0]
+        stream = streams[index]
+        position, notification, event = stream.advance()
+
+        if stream:
+            heapq.heapreplace(heap, entry(index, stream))
+        else:
+            heapq.heappop(heap)
+
+        if limit is not None:
+            limit -= 1
+        yield stream, position, notification, event
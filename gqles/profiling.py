@@ -0,0 +1,218 @@
+import contextvars
+import inspect
+import re
+import threading
+import time
+
+import sqlalchemy
+
+import ariadne.types
+
+import gqles.caching
+
+
+# Requests with this header set get a profile in their extensions.
+PROFILE_HEADER = "x-backstage-profile"
+
+# Statements of the same shape issued more often than this in a single
+# request are reported as N+1 patterns.
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+_current_profile = contextvars.ContextVar("gqles_profile", default=None)
+_listening = False
+_listening_lock = threading.Lock()
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAMETER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def get_statement_shape(statement):
+    """
+    Normalise a statement, so that the statements issued for different
+    IDs, or for different numbers of IDs, compare equal.
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _PARAMETER_LISTS.sub("(?)", statement)
+
+
+def is_profiling_requested(request, header=PROFILE_HEADER):
+    if request is None:
+        return False
+    value = request.headers.get(header)
+    return value is not None and value.lower() not in ("", "0", "false", "no")
+
+
+def format_path(path):
+    """
+    The path of a field, with the indexes of lists left out so that
+    the fields of all items are reported together.
+    """
+    keys = []
+    while path is not None:
+        keys.append("*" if isinstance(path.key, int) else path.key)
+        path = path.prev
+    return ".".join(reversed(keys))
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+class Profile:
+    """
+    Wall time per resolver path and SQL statements of a request.
+    """
+
+    def __init__(self, n_plus_one_threshold=DEFAULT_N_PLUS_ONE_THRESHOLD):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.started = time.perf_counter()
+        # {key: [count, seconds]}
+        self.resolvers = {}
+        self.statements = {}
+
+    def add_resolver(self, path, seconds):
+        entry = self.resolvers.setdefault(path, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def add_statement(self, statement, seconds):
+        entry = self.statements.setdefault(
+            get_statement_shape(statement), [0, 0.0],
+        )
+        entry[0] += 1
+        entry[1] += seconds
+
+    def get_n_plus_one(self):
+        return [
+            dict(statement=statement, count=count)
+            for statement, (count, _) in self.statements.items()
+            if count > self.n_plus_one_threshold
+        ]
+
+    def report(self):
+        resolvers = sorted(
+            self.resolvers.items(), key=lambda item: item[1][1], reverse=True,
+        )
+        statements = sorted(
+            self.statements.items(), key=lambda item: item[1][1], reverse=True,
+        )
+        return dict(
+            duration=_milliseconds(time.perf_counter() - self.started),
+            resolvers=[
+                dict(path=path, count=count, duration=_milliseconds(seconds))
+                for path, (count, seconds) in resolvers
+            ],
+            sql=dict(
+                count=sum(count for count, _ in self.statements.values()),
+                duration=_milliseconds(sum(
+                    seconds for _, seconds in self.statements.values()
+                )),
+                statements=[
+                    dict(
+                        statement=statement,
+                        count=count,
+                        duration=_milliseconds(seconds),
+                    )
+                    for statement, (count, seconds) in statements
+                ],
+                nPlusOne=self.get_n_plus_one(),
+            ),
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, *args):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("gqles_profile_started", []).append(
+            time.perf_counter(),
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, *args):
+    profile = _current_profile.get()
+    started = conn.info.get("gqles_profile_started")
+    if profile is not None and started:
+        profile.add_statement(statement, time.perf_counter() - started.pop())
+
+
+def listen():
+    """
+    Account the statements of all engines to the profile of the
+    current request, if there is one.
+
+    The profile is kept in a context variable, statements issued by
+    other requests or by the runner's threads are not accounted.
+    """
+    global _listening
+    with _listening_lock:
+        if _listening:
+            return
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, "before_cursor_execute",
+            _before_cursor_execute,
+        )
+        sqlalchemy.event.listen(
+            sqlalchemy.engine.Engine, "after_cursor_execute",
+            _after_cursor_execute,
+        )
+        _listening = True
+
+
+class ProfilingExtension(ariadne.types.Extension):
+    """
+    Report resolver timings and SQL statements in the extensions of
+    responses to requests with the profiling header set.
+
+    Works with any context holding the request as "request", like
+    ariadne's default context. Use functools.partial to change the
+    header or the N+1 threshold.
+    """
+
+    def __init__(
+            self,
+            header=PROFILE_HEADER,
+            n_plus_one_threshold=DEFAULT_N_PLUS_ONE_THRESHOLD,
+    ):
+        self.header = header
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.profile = None
+        self._token = None
+
+    def request_started(self, context):
+        request = context.get("request") if isinstance(context, dict) else None
+        if not is_profiling_requested(request, self.header):
+            return
+        listen()
+        self.profile = Profile(self.n_plus_one_threshold)
+        self._token = _current_profile.set(self.profile)
+        # Profiles are specific to a request, never cache them.
+        context.setdefault(
+            gqles.caching.CONTEXT_KEY, gqles.caching.CachePolicy(),
+        ).moving = True
+
+    def request_finished(self, context):
+        if self._token is not None:
+            _current_profile.reset(self._token)
+            self._token = None
+
+    async def resolve(self, next_, parent, info, **kwargs):
+        if self.profile is None or info.field_name.startswith("__"):
+            result = next_(parent, info, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        started = time.perf_counter()
+        try:
+            result = next_(parent, info, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            self.profile.add_resolver(
+                format_path(info.path), time.perf_counter() - started,
+            )
+
+    def format(self, context):
+        if self.profile is not None:
+            return {"profile": self.profile.report()}
+        return None
@@ -0,0 +1,151 @@
+import argparse
+import json
+
+from eventsourcing.utils.topic import resolve_topic
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def iter_event_chunks(application, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read an application's notification log through its own session, the
+    one it writes with.
+
+    Yield:
+        Lists of decoded events, in log order.
+    """
+    mapper = application.event_store.event_mapper
+    notification_log = application.notification_log
+    head = notification_log.get_next_position()
+    position = 0
+    while position < head:
+        # Positions are zero-based, the stop is exclusive.
+        notifications = notification_log.get_items(
+            position, position + chunk_size,
+        )
+        position += chunk_size
+        if notifications:
+            yield [
+                mapper.event_from_topic_and_state(
+                    notification["topic"], notification["state"],
+                )
+                for notification in notifications
+            ]
+
+
+def rebuild_catalog(application, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Catalog the originators of the events recorded before the
+    application had an originator catalog.
+
+    Originators already catalogued at a later version are left as they
+    are, so the catalog can be rebuilt while the application runs.
+
+    Return:
+        The number of originators catalogued or brought up to date.
+    """
+    # Not the one reads go through, see get_catalog.
+    catalog = getattr(application.event_store, "catalog", None)
+    if catalog is None:
+        return 0
+
+    session = catalog.session
+    originator_ids = set()
+    try:
+        for events in iter_event_chunks(application, chunk_size):
+            records = catalog.records_for(events)
+            session.add_all(records)
+            session.commit()
+            originator_ids.update(
+                record.originator_id for record in records
+            )
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return len(originator_ids)
+
+
+def rebuild_timestamps(application, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Index the timestamps of the events recorded before the application
+    had an event timestamp index.
+
+    Return:
+        The number of events indexed.
+    """
+    index = getattr(application.event_store, "timestamps", None)
+    if index is None:
+        return 0
+
+    record_class = index.record_class
+    session = application.event_store.record_manager.session
+    indexed = 0
+    try:
+        for events in iter_event_chunks(application, chunk_size):
+            records = index.records_for(events)
+            existing = set(session.query(
+                record_class.originator_id, record_class.originator_version,
+            ).filter(
+                record_class.application_name == index.application_name,
+                record_class.originator_id.in_({
+                    record.originator_id for record in records
+                }),
+            ))
+            records = [
+                record for record in records
+                if (record.originator_id, record.originator_version)
+                not in existing
+            ]
+            session.add_all(records)
+            session.commit()
+            indexed += len(records)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return indexed
+
+
+def rebuild(application, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the indexes of an application.
+
+    Return:
+        A report, as a dict.
+    """
+    return dict(
+        applicationName=application.name,
+        catalogRecords=rebuild_catalog(application, chunk_size),
+        indexedTimestamps=rebuild_timestamps(application, chunk_size),
+    )
+
+
+def main(argv=None):
+    """
+    Fill the indexes gqles keeps along with the events of an
+    application, for the events recorded before they existed.
+
+        python -m gqles.rebuild example.application#Application orders
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.strip())
+    parser.add_argument(
+        "application_class", help="Topic of the application class.",
+    )
+    parser.add_argument("name", help="Name of the application.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    application = resolve_topic(args.application_class)(name=args.name)
+    try:
+        report = rebuild(application, chunk_size=args.chunk_size)
+    finally:
+        application.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
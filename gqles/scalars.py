@@ -1,3 +1,4 @@
+import datetime
 import uuid
 
 import ariadne
@@ -15,6 +16,21 @@ def serialize_datetime(value):
     return value.isoformat()
 
 
+@datetime_scalar.value_parser
+def parse_datetime_value(value):
+    if value:
+        # fromisoformat does not know about the "Z" suffix.
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value
+
+
+@datetime_scalar.literal_parser
+def parse_datetime_literal(ast):
+    return parse_datetime_value(str(ast.value))
+
+
 @uuid_scalar.serializer
 def serialize_uuid(value):
     return str(value)
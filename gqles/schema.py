@@ -1,24 +1,34 @@
+import asyncio
 import base64
 import datetime
 import decimal
 import functools
+import itertools
 import json
 import uuid
 
 import ariadne
 
-import eventsourcing.utils.topic
-import eventsourcing.application.notificationlog
-
 import sqlalchemy
 
 from gqles.application import get_system_runner
+import gqles.caching
+import gqles.database
+from gqles.cache import event_cache
+from gqles.dataloaders import get_loaders
+import gqles.infrastructure
+import gqles.metrics
+import gqles.notifications
+import gqles.selections
+import gqles.snapshots
+import gqles.tailing
 import gqles.scalars
 
 
 state_insight = ariadne.InterfaceType("StateInsight")
 
 query = ariadne.ObjectType("Query")
+subscription = ariadne.SubscriptionType()
 application = ariadne.ObjectType("Application")
 originator = ariadne.ObjectType("Originator")
 insight = ariadne.ObjectType("Insight")
@@ -27,6 +37,7 @@ event = ariadne.ObjectType("Event")
 types = [
     *gqles.scalars.types,
     query,
+    subscription,
     application,
     originator,
     event,
@@ -36,6 +47,10 @@ types = [
 
 BASE64_CURSORS = True
 
+# Subscribers behind the tailers are caught up on this many
+# notifications at a time.
+CATCH_UP_CHUNK_SIZE = 100
+
 
 def to_base64(f):
     @functools.wraps(f)
@@ -64,51 +79,119 @@ async def resolve_applications(obj, info):
 
 
 def paginate_notifications(
-        notificationlog, last, first=None, before=None, after=None,
+        applications, last, first=None, before=None, after=None,
+        with_state=True, since=None, until=None,
 ):
     """
-    Paginate through a notification log.
+    Paginate through the notification logs of applications.
+
+    Logs are read with keyset queries and merged by event timestamp,
+    `before` and `after` map application names to positions. A single
+    log is read with one query, the extra row tells if there is more.
+    Only events from `since` until `until` are paginated through, when
+    they are given.
 
     Return:
-        ([[position, notification], ...], has_prev, has_next)
+        ([[application, position, notification, event], ...],
+         has_prev, has_next)
+    """
+
+    before = before or {}
+    after = after or {}
+
+    reverse, limit = (True, last) if first is None else (False, first)
+
+    # Each stream is only read as far as the merge needs it, start with
+    # a fair share of the page and let the streams grow from there.
+    chunk_size = -(-limit // max(1, len(applications))) + 1
+
+    streams = [
+        gqles.notifications.NotificationStream(
+            application,
+            after=after.get(application.name),
+            before=before.get(application.name),
+            reverse=reverse, chunk_size=chunk_size, with_state=with_state,
+            since=since, until=until,
+        )
+        for application in applications
+    ]
+
+    items = [
+        (stream.application, position, notification, event)
+        for stream, position, notification, event in (
+            gqles.notifications.merge_notifications(
+                streams, limit, reverse=reverse,
+            )
+        )
+    ]
+
+    # There is something at the positions of the cursors themselves.
+    has_before = any(position is not None for position in after.values())
+    has_after = any(position is not None for position in before.values())
+
+    if reverse:
+        return items[::-1], has_before or any(streams), has_after
+
+    return items, has_before, has_after or any(streams)
+
+
+def is_page_below_head(applications, first, before, has_next, until=None):
+    """
+    Whether a page of notifications can no longer change.
+
+    New notifications are only ever added at the heads of the logs,
+    pages that end before them stay the same. Paging forwards, the extra
+    row read past the end of the page is proof of that, for a single
+    log: the events of several logs are merged on their timestamps, and
+    runners with threads commit them out of timestamp order, so merged
+    pages also have to be bounded by a `to` time. Paging backwards,
+    every log has to be bounded by a `before` cursor.
     """
 
-    reader = eventsourcing.application.notificationlog.NotificationLogReader(
-        notificationlog,
-        use_direct_query_if_available=True,
+    if first is not None:
+        return has_next and (len(applications) == 1 or until is not None)
+    return all(
+        before.get(application.name) is not None
+        for application in applications
     )
 
-    next_position = notificationlog.get_next_position()
 
-    if before is not None:
-        position = max(0, before - last)
-        advance_by = min(last, before)
-    elif after is not None:
-        position = after + 1
-        advance_by = first if first is not None else last
-    elif first is not None:
-        position = 0
-        advance_by = first
+def mark_notifications_page(
+        info, applications, first, before, has_next, until=None,
+):
+    if is_page_below_head(applications, first, before, has_next, until):
+        gqles.caching.mark_immutable(info)
     else:
-        position = max(0, next_position - last)
-        advance_by = last
+        gqles.caching.mark_moving(info)
 
-    reader.seek(position)
-    notifications = reader.list_notifications(advance_by=advance_by)
 
-    has_prev = position > 0
-    has_next = position + advance_by < next_position
+def get_notification_data(application, notification, event=None):
 
-    return [(
-        position + offset, notification
-    ) for offset, notification in enumerate(notifications)], has_prev, has_next
+    return dict(
+        notificationId=notification["id"],
+        originatorId=notification["originator_id"],
+        originatorVersion=notification["originator_version"],
+        topic=notification["topic"],
+        causalDependencies=notification["causal_dependencies"],
+        # Careful with the lambda scoping! We need to make a copy
+        # of the current notification in the lambda's scope.
+        state=lambda _, n=notification: encode_state(n["state"]),
+        event=get_event_data(
+            application,
+            notification["originator_id"],
+            notification["originator_version"],
+            notification["topic"],
+            notification["state"],
+            event=event,
+        ),
+    )
 
 
 @query.field("notifications")
 async def resolve_notifications(
         obj, info,
         last, first=None, before=None, after=None,
-        applicationNames=None,
+        applicationNames=None, **kwargs
 ):
 
     @from_base64
@@ -122,81 +205,64 @@ async def resolve_notifications(
     before_data = from_cursor(before) or {}
     after_data = from_cursor(after) or {}
 
-    has_previous_page = False
-    has_next_page = False
-
-    streams = []
-
-    cursor_data = {}
-
     system_runner = await get_system_runner()
-    for application in system_runner.processes.values():
-        name = application.name
-        if applicationNames is not None and name not in applicationNames:
-            continue
-
-        cursor_data[name] = after_data.get(name, before_data.get(name))
+    applications = [
+        application for application in system_runner.processes.values()
+        if applicationNames is None or application.name in applicationNames
+    ]
 
-        items, hasprev, hasnext = paginate_notifications(
-            application.notification_log,
-            last=last, first=first,
-            before=before_data.get(name), after=after_data.get(name),
+    # Merging applications is done on event timestamps, which are read
+    # from the timestamp index, or else known once the events are
+    # decoded.
+    selection = gqles.selections.get_selection(info)
+    is_merged_unindexed = len(applications) > 1 and any(
+        gqles.infrastructure.get_timestamp_index(application) is None
+        for application in applications
+    )
+    with_state = is_merged_unindexed or gqles.selections.METADATA < (
+        gqles.selections.get_notification_tier(
+            selection.get("edges", {}).get("node", {}),
         )
+    )
 
-        has_previous_page = has_previous_page or hasprev
-        has_next_page = has_next_page or hasnext
-
-        streams.append([(
-            application,
-            position,
-            notification,
-            application.event_store.event_mapper.event_from_topic_and_state(
-                notification["topic"], notification["state"],
-            ),
-        ) for position, notification in items])
+    until = datetime_to_timestamp(kwargs.get("to"))
+    items, has_previous_page, has_next_page = paginate_notifications(
+        applications,
+        last=last, first=first,
+        before=before_data, after=after_data,
+        with_state=with_state,
+        since=datetime_to_timestamp(kwargs.get("from")),
+        until=until,
+    )
 
-    edges = []
-    function, idx, limit = (
-        (max, -1, last) if first is None else
-        (min, 0, first)
+    mark_notifications_page(
+        info, applications, first, before_data, has_next_page, until,
     )
 
-    while any(streams) and len(edges) < limit:
+    cursor_data = {
+        application.name: after_data.get(
+            application.name, before_data.get(application.name),
+        )
+        for application in applications
+    }
 
-        application, position, notification, event = function(
-            filter(None, streams),
-            key=lambda s: s[idx][3].timestamp,
-        ).pop(idx)
+    if first is None:
+        # Cursors are built walking the merge, from the end of the page.
+        items = items[::-1]
 
+    edges = []
+
+    for application, position, notification, event in items:
         cursor_data[application.name] = position
 
         edges.append(dict(
             cursor=to_cursor(cursor_data),
             application=application,
-            node=dict(
-                notificationId=notification["id"],
-                originatorId=notification["originator_id"],
-                originatorVersion=notification["originator_version"],
-                topic=notification["topic"],
-                causalDependencies=notification["causal_dependencies"],
-                # Careful with the lambda scoping! We need to make a copy
-                # of the current notification in the lambda's scope.
-                state=lambda _, n=notification: base64.b64encode(
-                    n["state"]).decode("utf8"),
-                event=get_event_data(
-                    application,
-                    event,
-                    notification["topic"],
-                    notification["state"]
-                ),
-            ),
+            node=get_notification_data(application, notification, event),
         ))
 
-    if idx == -1:
+    if first is None:
         edges = edges[::-1]
-        has_previous_page = has_previous_page or any(streams)
-    else:
-        has_next_page = has_next_page or any(streams)
 
     return dict(
         pageInfo=dict(
@@ -209,6 +275,83 @@ async def resolve_notifications(
     )
 
 
+@subscription.source("notifications")
+async def generate_notifications(
+        obj, info, applicationNames=None, after=None,
+):
+
+    @from_base64
+    def from_cursor(cursor):
+        return json.loads(cursor) if cursor is not None else None
+
+    @to_base64
+    def to_cursor(data):
+        return json.dumps(data) if data is not None else None
+
+    after_data = from_cursor(after) or {}
+
+    system_runner = await get_system_runner()
+    applications = [
+        application for application in system_runner.processes.values()
+        if applicationNames is None or application.name in applicationNames
+    ]
+
+    queue = asyncio.Queue()
+    tailers = []
+    streams = []
+    cursor_data = {}
+
+    def edge(application, position, notification, event=None):
+        cursor_data[application.name] = position
+        return dict(
+            cursor=to_cursor(cursor_data),
+            application=application,
+            node=get_notification_data(application, notification, event),
+        )
+
+    try:
+        for application in applications:
+            name = application.name
+            cursor_data[name] = after_data.get(name)
+
+            tailer = gqles.tailing.get_tailer(application)
+            position = tailer.subscribe(queue)
+            tailers.append(tailer)
+
+            # Whatever this subscriber is behind the shared tailer has
+            # to be caught up on from the log directly. Like for the
+            # notifications query, an application missing from the
+            # cursor is read from its beginning.
+            if after is not None:
+                streams.append(gqles.notifications.NotificationStream(
+                    application, after=after_data.get(name), before=position,
+                ))
+
+        # Read in a worker thread, like the tailers read, so that a
+        # subscriber catching up does not block the event loop.
+        merged = gqles.notifications.merge_notifications(streams, None)
+        while streams:
+            chunk = await gqles.database.run_in_threadpool(
+                list, itertools.islice(merged, CATCH_UP_CHUNK_SIZE),
+            )
+            for stream, position, notification, event in chunk:
+                yield edge(stream.application, position, notification, event)
+            if len(chunk) < CATCH_UP_CHUNK_SIZE:
+                break
+
+        while True:
+            yield edge(*await queue.get())
+
+    finally:
+        for tailer in tailers:
+            tailer.unsubscribe(queue)
+
+
+@subscription.field("notifications")
+def resolve_subscription_notifications(edge, info, **kwargs):
+    return edge
+
+
 @query.field("event")
 async def resolve_query_event(
         obj, info, applicationName, originatorId, originatorVersion,
@@ -219,49 +362,151 @@ async def resolve_query_event(
     except KeyError:
         return None
 
-    print((originatorId, type(originatorId)))
-    event = application.event_store.get_event(originatorId, originatorVersion)
+    item = await load_event(info, application, originatorId, originatorVersion)
 
-    return get_event_data(
-        application,
-        event,
-        *application.event_store.event_mapper.get_item_topic_and_state(
-            event.__class__, event.__dict__,
-        ),
-    )
+    if item is None:
+        # It may still be written.
+        gqles.caching.mark_moving(info)
+        return None
 
+    # Stored events never change.
+    gqles.caching.mark_immutable(info)
 
-def get_originator_data(application, originator_id):
+    return get_event_data(application, *item)
 
-    event = application.event_store.get_most_recent_event(
-        originator_id=originator_id,
-    )
 
-    if event is None:
+def get_originator_data(application, entry):
+
+    if entry is None:
         return None
 
+    event = entry.event
+
     return dict(
         application=application,
+        applicationName=application.name,
         originatorId=event.originator_id,
-        last=lambda _, e=event: get_event_data(
+        topic=gqles.infrastructure.get_originator_topic(event),
+        version=event.originator_version,
+        timestamp=timestamp_to_datetime(event.timestamp),
+        last=lambda _, e=entry: get_event_data(
             application,
-            e,
-            *application.event_store.event_mapper.get_item_topic_and_state(
-                e.__class__, e.__dict__,
-            ),
+            e.event.originator_id,
+            e.event.originator_version,
+            e.topic,
+            e.state,
+            event=e.event,
         ),
     )
 
 
+def load_event(info, application, originator_id, version):
+    """
+    Load a stored event, reading only as much as the selection needs.
+    """
+
+    tier = gqles.selections.get_event_tier(gqles.selections.get_selection(info))
+
+    return get_loaders(info).event(
+        application, metadata_only=tier == gqles.selections.METADATA,
+    ).load((originator_id, version))
+
+
+async def load_event_data(info, application, originator_id, version):
+
+    item = await load_event(info, application, originator_id, version)
+
+    if item is None:
+        return None
+
+    return get_event_data(application, *item)
+
+
+def get_originator_data_from_record(application, record):
+
+    return dict(
+        application=application,
+        applicationName=application.name,
+        originatorId=record.originator_id,
+        topic=record.topic,
+        version=record.originator_version,
+        timestamp=timestamp_to_datetime(record.timestamp),
+        # The catalog knows where the last event is, but we only
+        # load it if it is actually requested.
+        last=lambda info, r=record: load_event_data(
+            info, application, r.originator_id, r.originator_version,
+        ),
+    )
+
+
+def get_catalogs(applications):
+    """
+    Return the catalog to query and the catalogued applications by name.
+
+    All applications of a system share their database, so one catalog
+    is enough to query all of them at once.
+    """
+
+    catalogued = {
+        application.name: application for application in applications
+        if gqles.infrastructure.get_catalog(application) is not None
+    }
+
+    if not catalogued:
+        return None, catalogued
+
+    catalog = gqles.infrastructure.get_catalog(
+        next(iter(catalogued.values())),
+    )
+
+    return catalog, catalogued
+
 
 @query.field("insights")
 async def resolve_query_insights(obj, info, uuids):
     system_runner = await get_system_runner()
+    loaders = get_loaders(info)
+
+    applications = list(system_runner.processes.values())
+    catalog, catalogued = get_catalogs(applications)
+
+    # A single indexed read locates everything that is catalogued.
+    located = {}
+    if catalog is not None:
+        record_class = catalog.record_class
+        try:
+            for record in catalog.query(
+                    record_class.originator_id.in_(set(uuids)),
+                    record_class.application_name.in_(list(catalogued)),
+            ):
+                located[record.application_name, record.originator_id] = record
+        finally:
+            catalog.session.close()
+
+    async def candidates(application):
+        if application.name in catalogued:
+            return [
+                get_originator_data_from_record(application, record)
+                if record is not None else None
+                for record in (
+                    located.get((application.name, candidate))
+                    for candidate in uuids
+                )
+            ]
+        # Otherwise batch a lookup in the application's event store.
+        return [
+            get_originator_data(application, entry)
+            for entry in await loaders.most_recent_event(
+                application).load_many(uuids)
+        ]
+
+    results = await asyncio.gather(*(
+        candidates(application) for application in applications
+    ))
 
-    # TODO: This is very naive, how do we batch this?
-    def resolve_insight(candidate):
-        for application in system_runner.processes.values():
-            originator = get_originator_data(application, candidate)
+    def resolve_insight(index):
+        for application, originators in zip(applications, results):
+            originator = originators[index]
             if not originator:
                 continue
             return dict(
@@ -269,7 +514,144 @@ async def resolve_query_insights(obj, info, uuids):
                 originator=originator,
             )
 
-    return [resolve_insight(candidate) for candidate in uuids]
+    return [resolve_insight(index) for index in range(len(uuids))]
+
+
+def paginate_originators(
+        catalog, criterion, last, first=None, before=None, after=None,
+):
+    """
+    Paginate through an originator catalog.
+
+    Records are ordered by the timestamp of their last event, the
+    cursors are (timestamp, application name, originator ID) keys.
+
+    Return:
+        ([[key, record], ...], has_prev, has_next)
+    """
+
+    record_class = catalog.record_class
+    columns = (
+        record_class.timestamp,
+        record_class.application_name,
+        record_class.originator_id,
+    )
+
+    def key(record):
+        return (
+            record.timestamp, record.application_name, record.originator_id,
+        )
+
+    def beyond(cursor, is_ascending):
+        # Row value comparison, spelled out for portability.
+        clauses = []
+        for index, column in enumerate(columns):
+            clauses.append(sqlalchemy.and_(*(
+                c == v for c, v in zip(columns[:index], cursor[:index])
+            ), (
+                column > cursor[index] if is_ascending
+                else column < cursor[index]
+            )))
+        return sqlalchemy.or_(*clauses)
+
+    is_ascending = first is not None or after is not None
+    limit = first if first is not None else last
+
+    query = catalog.query(*criterion)
+    if after is not None:
+        query = query.filter(beyond(after, True))
+    if before is not None:
+        query = query.filter(beyond(before, False))
+
+    order = sqlalchemy.asc if is_ascending else sqlalchemy.desc
+    query = query.order_by(*(order(column) for column in columns))
+
+    try:
+        records = query.limit(limit + 1).all()
+    finally:
+        catalog.session.close()
+
+    has_more = len(records) > limit
+    records = records[:limit]
+    if not is_ascending:
+        records = list(reversed(records))
+
+    return (
+        [(key(record), record) for record in records],
+        (after is not None) or (not is_ascending and has_more),
+        (before is not None) or (is_ascending and has_more),
+    )
+
+
+@query.field("originators")
+async def resolve_query_originators(
+        obj, info, last, first=None, before=None, after=None,
+        topic=None, applicationName=None,
+):
+
+    @from_base64
+    def from_cursor(cursor):
+        if cursor is None:
+            return None
+        timestamp, application_name, originator_id = json.loads(cursor)
+        return (
+            decimal.Decimal(timestamp),
+            application_name,
+            uuid.UUID(originator_id),
+        )
+
+    @to_base64
+    def to_cursor(key):
+        timestamp, application_name, originator_id = key
+        return json.dumps([
+            str(timestamp), application_name, str(originator_id),
+        ])
+
+    system_runner = await get_system_runner()
+    catalog, catalogued = get_catalogs(system_runner.processes.values())
+
+    if applicationName is not None:
+        catalogued = {
+            name: application for name, application in catalogued.items()
+            if name == applicationName
+        }
+
+    if catalog is None or not catalogued:
+        items, has_prev, has_next = [], False, False
+    else:
+        record_class = catalog.record_class
+        criterion = [record_class.application_name.in_(list(catalogued))]
+        if topic is not None:
+            criterion.append(record_class.topic == topic)
+
+        items, has_prev, has_next = paginate_originators(
+            catalog, criterion,
+            last=last, first=first,
+            before=from_cursor(before), after=from_cursor(after),
+        )
+
+    edges = [dict(
+        cursor=to_cursor(key),
+        application=catalogued[record.application_name],
+        node=get_originator_data_from_record(
+            catalogued[record.application_name], record,
+        ),
+    ) for key, record in items]
+
+    return dict(
+        pageInfo=dict(
+            hasPreviousPage=has_prev,
+            hasNextPage=has_next,
+            startCursor=edges[0]["cursor"] if edges else None,
+            endCursor=edges[-1]["cursor"] if edges else None,
+        ),
+        edges=edges,
+    )
+
+
+@query.field("eventCache")
+def resolve_query_event_cache(obj, info):
+    return event_cache.stats()
 
 
 @application.field("id")
@@ -277,9 +659,22 @@ async def resolve_applications_id(obj, info):
     return obj.name
 
 
+@application.field("lag")
+async def resolve_applications_lag(obj, info):
+    gqles.caching.mark_moving(info)
+    system_runner = await get_system_runner()
+    return gqles.metrics.get_lag_data(obj, system_runner.processes)
+
+
+@application.field("throughput")
+def resolve_applications_throughput(obj, info):
+    gqles.caching.mark_moving(info)
+    return gqles.metrics.get_throughput_data(obj)
+
+
 @application.field("notifications")
 async def resolve_applications_notifications(
-        obj, info, last, first=None, before=None, after=None,
+        obj, info, last, first=None, before=None, after=None, **kwargs
 ):
 
     @from_base64
@@ -290,37 +685,30 @@ async def resolve_applications_notifications(
     def to_cursor(position):
         return str(position) if position is not None else None
 
+    selection = gqles.selections.get_selection(info)
+    tier = gqles.selections.get_notification_tier(
+        selection.get("edges", {}).get("node", {}),
+    )
+
+    before_data = {obj.name: from_cursor(before)}
+
     items, has_prev, has_next = paginate_notifications(
-        obj.notification_log,
+        [obj],
         last=last, first=first,
-        before=from_cursor(before), after=from_cursor(after)
+        before=before_data,
+        after={obj.name: from_cursor(after)},
+        with_state=tier > gqles.selections.METADATA,
+        since=datetime_to_timestamp(kwargs.get("from")),
+        until=datetime_to_timestamp(kwargs.get("to")),
     )
 
+    mark_notifications_page(info, [obj], first, before_data, has_next)
+
     edges = [dict(
         cursor=to_cursor(position),
         application=obj,
-        node=dict(
-            notificationId=notification["id"],
-            originatorId=notification["originator_id"],
-            originatorVersion=notification["originator_version"],
-            topic=notification["topic"],
-            # Careful with the lambda scoping! We need to make a copy
-            # of the current notification in the lambda's scope.
-                state=lambda _, n=notification: base64.b64encode(
-                    n["state"]).decode("utf8"),
-            causalDependencies=notification["causal_dependencies"],
-            # Careful with the lambda scoping! We need to make a copy
-            # of the current notification in the lambda's scope.
-                event=lambda _, n=notification: get_event_data(
-                    obj,
-                    obj.event_store.event_mapper.event_from_topic_and_state(
-                        n["topic"], n["state"],
-                    ),
-                    n["topic"],
-                    n["state"]
-                ),
-        ),
-    ) for position, notification in items]
+        node=get_notification_data(obj, notification, event),
+    ) for _, position, notification, event in items]
 
     return dict(
         pageInfo=dict(
@@ -334,34 +722,39 @@ async def resolve_applications_notifications(
 
 
 def paginate_events(
-        eventstore, originatorId, last, first=None, before=None, after=None,
+        application, originatorId, last, first=None, before=None, after=None,
 ):
     """
-    Paginate through an event store.
+    Paginate through an application's event store.
 
     Return:
-        ([[position, notification], ...], has_prev, has_next)
+        ([[position, stored event], ...], has_prev, has_next)
     """
 
     is_ascending = after is not None
     limit = first if first is not None else last
 
-    events = list(eventstore.iter_events(
-        originator_id=originatorId,
+    record_manager = gqles.infrastructure.get_read_event_store(
+        application,
+    ).record_manager
+    items = list(record_manager.get_items(
+        sequence_id=originatorId,
         gt=after,
         lt=before,
         limit=limit+1,
-        is_ascending=is_ascending,
+        query_ascending=is_ascending,
+        results_ascending=is_ascending,
     ))
 
-    has_more = len(events) > limit
-    events = events[:limit]
+    has_more = len(items) > limit
+    items = items[:limit]
     if not is_ascending:
-        events = list(reversed(events))
+        items = list(reversed(items))
 
+    # Items are (originator ID, originator version, topic, state).
     return (
-        [(event.originator_version, event) for event in events],
-        (after is not None) or (events and events[0].originator_version > 0),
+        [(item[1], item) for item in items],
+        (after is not None) or (bool(items) and items[0][1] > 0),
         (before is not None) or has_more,
     )
 
@@ -370,7 +763,13 @@ def paginate_events(
 async def resolve_applications_events(
         obj, info, originatorId,
 ):
-    return get_originator_data(obj, originatorId)
+    # The originator's last event moves.
+    gqles.caching.mark_moving(info)
+
+    return get_originator_data(
+        obj,
+        await get_loaders(info).most_recent_event(obj).load(originatorId),
+    )
 
 
 @originator.field("events")
@@ -390,24 +789,23 @@ async def resolve_applications_events(
         return str(position) if position is not None else None
 
     events, has_prev, has_next = paginate_events(
-        application.event_store, originatorId,
+        application, originatorId,
         last=last, first=first,
         before=from_cursor(before),
         after=from_cursor(after),
     )
 
+    if before is None:
+        gqles.caching.mark_moving(info)
+
+    get_loaders(info).prime_events(application, (e for _, e in events))
+
     edges = [dict(
         cursor=to_cursor(originator_version),
         # Careful with the lambda scoping! We need to make a copy
         # of the current notification in the lambda's scope.
-        node=lambda _, e=event: get_event_data(
-            application,
-            e,
-            *application.event_store.event_mapper.get_item_topic_and_state(
-                e.__class__, e.__dict__,
-            ),
-        ),
-    ) for (originator_version, event) in events]
+        node=lambda _, e=item: get_event_data(application, *e),
+    ) for (originator_version, item) in events]
 
     return dict(
         edges=edges,
@@ -420,22 +818,62 @@ async def resolve_applications_events(
     )
 
 
-def get_event_data(application, event, topic, state):
+def get_event_data(
+        application, originator_id, originator_version, topic, state,
+        event=None,
+):
+    """
+    Event data of a stored event.
+
+    The domain event is only decoded, once, for the fields that need it.
+    """
+
+    def get_event():
+        if event is not None:
+            return event
+        return event_cache.decode(
+            application, originator_id, originator_version, topic, state,
+        ).event
 
     return dict(
         application=application,
-        event=event,
+        get_event=get_event,
         topic=topic,
         # Careful with the lambda scoping! We need to make a copy
         # of the current notification in the lambda's scope.
         # In this case it's not needed, but keep it in case this
         # gets copy/pasted somewhere else.
-        state=lambda _, s=state: base64.b64encode(s).decode("utf8"),
-        originatorId=event.originator_id,
-        originatorVersion=event.originator_version,
-        timestamp=datetime.datetime.fromtimestamp(
-            event.timestamp, datetime.timezone.utc,
-        ),
+        state=lambda _, s=state: encode_state(s),
+        originatorId=originator_id,
+        originatorVersion=originator_version,
+        timestamp=lambda _: timestamp_to_datetime(get_event().timestamp),
+    )
+
+
+def encode_state(state):
+    return base64.b64encode(state).decode("utf8") if state is not None else None
+
+
+def timestamp_to_datetime(timestamp):
+    # Timestamps are decimals, which fromtimestamp would truncate.
+    return datetime.datetime.fromtimestamp(
+        float(timestamp), datetime.timezone.utc,
+    )
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def datetime_to_timestamp(value):
+    # The inverse of timestamp_to_datetime, without going through floats.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - EPOCH
+    return (
+        decimal.Decimal(delta.days * 86400 + delta.seconds)
+        + decimal.Decimal(delta.microseconds).scaleb(-6)
     )
 
 
@@ -458,7 +896,7 @@ async def _resolve_event_events(
         return str(position) if position is not None else None
 
     events, has_prev, has_next = paginate_events(
-        application.event_store,
+        application,
         originatorId,
         first=first,
         last=last,
@@ -466,17 +904,18 @@ async def _resolve_event_events(
         after=after,
     )
 
+    # Only events before a version can not change anymore.
+    if before is None:
+        gqles.caching.mark_moving(info)
+
+    get_loaders(info).prime_events(application, (e for _, e in events))
+
     edges = [dict(
         cursor=to_cursor(originator_version),
         # Careful with the lambda scoping! We need to make a copy
         # of the current notification in the lambda's scope.
-        node=lambda _, e=event: get_event_data(
-            application, e,
-            *application.event_store.event_mapper.get_item_topic_and_state(
-                e.__class__, e.__dict__,
-            ),
-        ),
-    ) for (originator_version, event) in events]
+        node=lambda _, e=item: get_event_data(application, *e),
+    ) for (originator_version, item) in events]
 
     return dict(
         edges=edges,
@@ -544,34 +983,69 @@ def resolve_state_insight_type(obj, *_):
     return None
 
 
-@event.field("stateInsight")
-async def resolve_event_id(obj, info):
+# Attributes holding decimal timestamps, of events and of aggregates.
+TIMESTAMP_KEYS = {"timestamp", "___created_on__", "___last_modified__"}
 
-    def decode(key, value):
+# Attributes of aggregates that are not part of their state.
+HIDDEN_AGGREGATE_KEYS = {"__pending_events__"}
 
-        if isinstance(value, uuid.UUID):
-            return dict(key=key, text=str(value), uuid=value)
-        if isinstance(value, datetime.datetime):
-            return dict(key=key, text=str(value), datetime=value)
-        if key == "timestamp" and isinstance(value, decimal.Decimal):
-            dt = datetime.datetime.fromtimestamp(
-                value, datetime.timezone.utc,
-            )
-            return dict(key=key, text=str(dt), datetime=dt)
 
-        try:
-            return dict(key=key, text=str(value), json=json.dumps(value))
-        except TypeError:
-            pass
+def get_state_insight(key, value):
 
-        return dict(key=key, text=str(value))
+    if isinstance(value, uuid.UUID):
+        return dict(key=key, text=str(value), uuid=value)
+    if isinstance(value, datetime.datetime):
+        return dict(key=key, text=str(value), datetime=value)
+    if key in TIMESTAMP_KEYS and isinstance(value, decimal.Decimal):
+        dt = timestamp_to_datetime(value)
+        return dict(key=key, text=str(dt), datetime=dt)
+    if isinstance(value, decimal.Decimal):
+        return dict(key=key, text=str(value), json=json.dumps(str(value)))
 
+    try:
+        return dict(key=key, text=str(value), json=json.dumps(value))
+    except TypeError:
+        pass
 
+    return dict(key=key, text=str(value))
+
+
+@event.field("stateInsight")
+async def resolve_event_id(obj, info):
     return [
-        decode(key, value)
-        for key, value in obj["event"].__dict__.items()
+        get_state_insight(key, value)
+        for key, value in obj["get_event"]().__dict__.items()
     ]
 
 
+@originator.field("stateAt")
+def resolve_originator_state_at(obj, info, version=None, timestamp=None):
+
+    # Later events can be recorded before the time.
+    if version is None:
+        gqles.caching.mark_moving(info)
+
+    aggregate, snapshot_version, replayed = gqles.snapshots.get_state_at(
+        obj["application"],
+        obj["originatorId"],
+        version=version,
+        timestamp=datetime_to_timestamp(timestamp),
+    )
+    if aggregate is None:
+        return None
+
+    return dict(
+        originatorVersion=aggregate.__version__,
+        timestamp=timestamp_to_datetime(aggregate.__last_modified__),
+        snapshotVersion=snapshot_version,
+        replayedEvents=replayed,
+        stateInsight=[
+            get_state_insight(key, value)
+            for key, value in aggregate.__dict__.items()
+            if key not in HIDDEN_AGGREGATE_KEYS
+        ],
+    )
+
+
 type_defs = ariadne.load_schema_from_path("gqles/")
 schema = ariadne.make_executable_schema(type_defs, *types)
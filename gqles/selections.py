@@ -0,0 +1,64 @@
+from graphql.language import FieldNode, FragmentSpreadNode
+
+
+# How much of a stored event a selection needs, in increasing cost.
+METADATA = 0  # IDs, versions and topics, no state is read.
+STORED = 1  # The stored state, as it is in the database.
+DECODED = 2  # The domain event, state is decrypted and decoded.
+
+# Event fields that can only be resolved from the domain event.
+DECODED_EVENT_FIELDS = {"timestamp", "stateInsight"}
+
+
+def get_selection(info):
+    """
+    Fields selected below the field being resolved.
+
+    Fragments are merged in and directives are ignored, so this may
+    report more than is actually resolved, never less.
+
+    Return:
+        {field name: {field name: {...}, ...}, ...}
+    """
+    selection = {}
+    for field_node in info.field_nodes:
+        _collect(info, field_node.selection_set, selection)
+    return selection
+
+
+def _collect(info, selection_set, selection):
+    if selection_set is None:
+        return
+    for node in selection_set.selections:
+        if isinstance(node, FieldNode):
+            _collect(
+                info,
+                node.selection_set,
+                selection.setdefault(node.name.value, {}),
+            )
+        elif isinstance(node, FragmentSpreadNode):
+            _collect(info, info.fragments[node.name.value].selection_set, selection)
+        else:
+            _collect(info, node.selection_set, selection)
+
+
+def get_event_tier(selection):
+    """
+    How much of a stored event is needed to resolve an Event selection.
+    """
+    if DECODED_EVENT_FIELDS.intersection(selection):
+        return DECODED
+    if "state" in selection:
+        return STORED
+    return METADATA
+
+
+def get_notification_tier(selection):
+    """
+    How much of a stored event is needed to resolve a Notification
+    selection.
+    """
+    tier = STORED if "state" in selection else METADATA
+    if "event" in selection:
+        tier = max(tier, get_event_tier(selection["event"]))
+    return tier
@@ -0,0 +1,171 @@
+import copy
+
+import pydantic
+
+from sqlalchemy import func
+
+from eventsourcing.domain.model.snapshot import Snapshot
+from eventsourcing.infrastructure.snapshotting import EventSourcedSnapshotStrategy
+from eventsourcing.utils.topic import get_topic, resolve_topic
+
+
+class ModelSnapshot(Snapshot):
+    """
+    Snapshot that can restore gqles.model.Model aggregates.
+
+    Pydantic keeps which fields are set outside of the instance's
+    __dict__, the plain snapshots of eventsourcing lose it.
+    """
+
+    def __mutate__(self, obj):
+        if self.state is None:
+            return None
+        entity_class = resolve_topic(self.topic)
+        if not issubclass(entity_class, pydantic.BaseModel):
+            return super().__mutate__(obj)
+        entity = entity_class.__new__(entity_class)
+        entity.__setstate__(copy.deepcopy(self.state))
+        return entity
+
+
+def get_snapshot_state(entity):
+    """
+    Return a copy of the state of an entity, for a snapshot.
+    """
+    if isinstance(entity, pydantic.BaseModel):
+        return copy.deepcopy(entity.__getstate__())
+    return copy.deepcopy(entity.__dict__)
+
+
+class SnapshotStrategy(EventSourcedSnapshotStrategy):
+    """
+    Snapshot strategy that takes ModelSnapshot snapshots.
+    """
+
+    def take_snapshot(self, entity_id, entity, last_event_version):
+        snapshot = ModelSnapshot(
+            originator_id=entity_id,
+            originator_version=last_event_version,
+            topic=get_topic(entity.__class__),
+            state=None if entity is None else get_snapshot_state(entity),
+        )
+        self.snapshot_store.store_events([snapshot])
+        return snapshot
+
+
+class EveryNEvents:
+    """
+    Snapshot aggregates every `period` events.
+    """
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError("The period must be at least one event.")
+        self.period = period
+
+    def should_snapshot(self, application, event):
+        return (event.originator_version + 1) % self.period == 0
+
+
+class SizeThreshold:
+    """
+    Snapshot aggregates once the events stored since their last
+    snapshot weigh `max_bytes` or more.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def get_last_snapshot_version(self, application, originator_id):
+        record_manager = application.snapshot_store.record_manager
+        records = record_manager.get_records(
+            originator_id, limit=1, query_ascending=False,
+        )
+        if not records:
+            return None
+        return getattr(records[0], record_manager.field_names.position)
+
+    def get_size_since(self, application, originator_id, version):
+        # Read from the writer, like the version of the last snapshot:
+        # a replica behind it would undercount, and skip snapshots.
+        record_manager = application.event_store.record_manager
+        record_class = record_manager.record_class
+        field_names = record_manager.field_names
+
+        query = record_manager.session.query(
+            func.sum(func.length(getattr(record_class, field_names.state))),
+        )
+        query = record_manager.filter_for_application_name(query).filter(
+            getattr(record_class, field_names.sequence_id) == originator_id,
+        )
+        if version is not None:
+            query = query.filter(
+                getattr(record_class, field_names.position) > version,
+            )
+        return query.scalar() or 0
+
+    def should_snapshot(self, application, event):
+        version = self.get_last_snapshot_version(
+            application, event.originator_id,
+        )
+        return self.get_size_since(
+            application, event.originator_id, version,
+        ) >= self.max_bytes
+
+
+def get_version_at(application, originator_id, timestamp):
+    """
+    Return the last version of an originator at `timestamp`, or None if
+    it did not exist yet.
+    """
+    # Deferred, gqles.infrastructure needs gqles.snapshots.
+    import gqles.infrastructure
+
+    index = gqles.infrastructure.get_timestamp_index(application)
+    if index is not None:
+        return index.version_at(originator_id, timestamp)
+
+    event_store = gqles.infrastructure.get_read_event_store(application)
+    version = None
+    for event in event_store.iter_events(originator_id):
+        if event.timestamp > timestamp:
+            break
+        version = event.originator_version
+    return version
+
+
+def get_state_at(application, originator_id, version=None, timestamp=None):
+    """
+    Rebuild an aggregate as it was at a version, or at a time, starting
+    from the nearest snapshot before it.
+
+    Return:
+        (aggregate, snapshot version or None, number of replayed events),
+        the aggregate is None if it did not exist yet.
+    """
+    # Deferred, gqles.infrastructure needs gqles.snapshots.
+    import gqles.infrastructure
+
+    if timestamp is not None:
+        at_timestamp = get_version_at(application, originator_id, timestamp)
+        if at_timestamp is None:
+            return None, None, 0
+        version = at_timestamp if version is None else min(version, at_timestamp)
+
+    snapshot = None
+    strategy = gqles.infrastructure.get_read_snapshot_strategy(application)
+    if strategy is not None:
+        snapshot = strategy.get_snapshot(originator_id, lte=version)
+
+    initial_state = None
+    snapshot_version = None
+    if snapshot is not None:
+        initial_state = snapshot.__mutate__(None)
+        snapshot_version = snapshot.originator_version
+
+    event_store = gqles.infrastructure.get_read_event_store(application)
+    events = list(event_store.iter_events(
+        originator_id, gt=snapshot_version, lte=version,
+    ))
+    aggregate = application.repository.project_events(initial_state, events)
+    return aggregate, snapshot_version, len(events)
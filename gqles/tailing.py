@@ -0,0 +1,126 @@
+import asyncio
+
+from eventsourcing.application.simple import is_prompt_to_pull
+from eventsourcing.domain.model.events import subscribe, unsubscribe
+
+from gqles.database import (
+    get_scoped_sessions, run_in_threadpool, session_scope,
+)
+from gqles.infrastructure import get_read_notification_log
+
+
+class NotificationTailer:
+    """
+    Follow the head of an application's notification log.
+
+    One tailer is shared by every subscriber of an application, new
+    notifications are read once and then put on each subscriber's
+    queue. Prompts published by the application wake the tailer up
+    early, otherwise it polls every `interval` seconds.
+    """
+
+    def __init__(self, application, interval=1.0, chunk_size=100):
+        self.application = application
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.position = None
+        self.subscribers = set()
+        self._task = None
+        self._wakeup = None
+        self._loop = None
+
+    def _on_prompt(self, prompt):
+        # Prompts are published from whatever thread did the writing,
+        # which must not fail once the loop of the tailer is closed.
+        if (
+                prompt.process_name == self.application.name
+                and not self._loop.is_closed()
+        ):
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # Closed in the meantime.
+                pass
+
+    def _read_notifications(self):
+        notification_log = get_read_notification_log(self.application)
+        return notification_log.get_items(
+            self.position, self.position + self.chunk_size,
+        )
+
+    async def read(self):
+        """
+        Read new notifications in a worker thread, and fan them out to
+        the subscribers.
+
+        Return:
+            The number of notifications that were read.
+        """
+        notifications = await run_in_threadpool(self._read_notifications)
+        for notification in notifications:
+            # Notification IDs are one-based, positions are zero-based.
+            self.position = notification["id"]
+            for queue in self.subscribers:
+                queue.put_nowait((
+                    self.application, notification["id"] - 1, notification,
+                ))
+        return len(notifications)
+
+    async def run(self):
+        # The task is started by the first subscriber, whose sessions are
+        # removed once its request is done, the tailer has its own.
+        with session_scope(*get_scoped_sessions(self.application)):
+            try:
+                while self.subscribers:
+                    if await self.read() >= self.chunk_size:
+                        continue
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), self.interval,
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                unsubscribe(self._on_prompt, predicate=is_prompt_to_pull)
+                self._task = None
+                if _tailers.get(self.application) is self:
+                    del _tailers[self.application]
+
+    def subscribe(self, queue):
+        """
+        Start putting new notifications on the given queue.
+
+        Return:
+            The position from which the queue will be fed.
+        """
+        if self._task is None:
+            self._loop = asyncio.get_event_loop()
+            self._wakeup = asyncio.Event()
+            notification_log = get_read_notification_log(self.application)
+            self.position = notification_log.get_next_position()
+            subscribe(self._on_prompt, predicate=is_prompt_to_pull)
+            self._task = asyncio.ensure_future(self.run())
+        self.subscribers.add(queue)
+        return self.position
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._wakeup is not None:
+            self._wakeup.set()
+
+
+_tailers = {}
+
+
+def get_tailer(application):
+    """
+    Return the shared tailer of an application.
+
+    Tailers only live as long as they have subscribers.
+    """
+    try:
+        return _tailers[application]
+    except KeyError:
+        tailer = _tailers[application] = NotificationTailer(application)
+        return tailer
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+import ariadne
+import sqlalchemy
+
+import gqles.application
+import gqles.schema
+
+import example.application
+import example.database
+
+
+@pytest.fixture
+async def system_runner():
+    runner = await gqles.application.start_system_runner(
+        example.application.SystemRunner(),
+    )
+    yield runner
+    await gqles.application.close_system_runner()
+
+
+@pytest.fixture
+def backstage():
+
+    async def execute(query, **variables):
+        success, result = await ariadne.graphql(
+            gqles.schema.schema,
+            dict(query=query, variables=variables),
+            context_value={},
+        )
+        assert success and "errors" not in result, result
+        return result["data"]
+
+    return execute
+
+
+@pytest.fixture
+def statements():
+    issued = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            issued.append(statement)
+
+    sqlalchemy.event.listen(
+        example.database.engine, "before_cursor_execute", count,
+    )
+    yield issued
+    sqlalchemy.event.remove(
+        example.database.engine, "before_cursor_execute", count,
+    )
+
+
+class ASGIResponse:
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+async def call_asgi(app, method="GET", path="/", json_body=None, headers=()):
+    """
+    Make a single HTTP request to an ASGI app, within the running loop.
+    """
+    path, _, query_string = path.partition("?")
+    body = b""
+    headers = [(k.lower().encode(), v.encode()) for k, v in headers]
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        headers.append((b"content-type", b"application/json"))
+
+    scope = dict(
+        type="http", http_version="1.1", method=method, scheme="http",
+        path=path, raw_path=path.encode(), query_string=query_string.encode(),
+        root_path="", headers=headers, client=("test", 0),
+        server=("test", 80),
+    )
+    messages = [dict(type="http.request", body=body, more_body=False)]
+    sent = []
+    done = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like servers, only disconnect once the response is sent, which
+        # streaming responses listen for.
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and not message.get(
+                "more_body", False,
+        ):
+            done.set()
+
+    await app(scope, receive, send)
+
+    start = sent[0]
+    return ASGIResponse(
+        start["status"],
+        {k.decode(): v.decode() for k, v in start["headers"]},
+        b"".join(message.get("body", b"") for message in sent[1:]),
+    )
+
+
+@pytest.fixture
+def asgi():
+    return call_asgi
@@ -0,0 +1,72 @@
+import pytest
+
+import gqles.application
+import gqles.cache
+
+import example.policies
+
+
+EVENT = """
+query ($id: UUID!) {
+  event(
+    applicationName: "commands", originatorId: $id, originatorVersion: 0,
+  ) { originatorVersion topic timestamp }
+}
+"""
+
+
+@pytest.fixture
+def event_cache():
+    event_cache = gqles.cache.event_cache
+    max_bytes = event_cache.max_bytes
+    event_cache.clear()
+    yield event_cache
+    event_cache.resize(max_bytes)
+    event_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_hit_the_cache(
+        system_runner, backstage, event_cache, statements,
+):
+    command_id = example.policies.Commands.create_order()
+
+    first = await backstage(EVENT, id=str(command_id))
+    before = (await backstage("{ eventCache { hits misses } }"))["eventCache"]
+    statements.clear()
+    second = await backstage(EVENT, id=str(command_id))
+
+    assert first == second
+    assert statements == []
+    assert event_cache.hits > before["hits"]
+    assert event_cache.misses == before["misses"]
+
+
+@pytest.mark.asyncio
+async def test_cache_respects_memory_budget(system_runner, event_cache):
+    command_ids = [example.policies.Commands.create_order() for _ in range(3)]
+    system_runner = await gqles.application.get_system_runner()
+    application = system_runner.processes["commands"]
+
+    event_cache.resize(gqles.cache.ENTRY_OVERHEAD * 3)
+    for command_id in command_ids:
+        for item in application.event_store.record_manager.get_items(
+                command_id,
+        ):
+            event_cache.decode_item(application, item)
+
+    stats = event_cache.stats()
+    assert 0 < stats["entries"] < 3 * len(command_ids)
+    assert stats["size"] <= stats["maxSize"]
+
+    # The most recently decoded event is still around, the first is not.
+    assert event_cache.get(application, command_ids[-1], 2) is not None
+    assert event_cache.get(application, command_ids[0], 0) is None
+
+
+def test_topic_resolution_is_remembered():
+    topic = "example.domain#Order"
+    gqles.cache._resolve_topic.cache_clear()
+
+    assert gqles.cache.resolve_topic(topic) is gqles.cache.resolve_topic(topic)
+    assert gqles.cache._resolve_topic.cache_info().hits == 1
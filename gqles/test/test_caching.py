@@ -0,0 +1,135 @@
+import datetime
+import json
+import urllib.parse
+import uuid
+
+import pytest
+
+import gqles
+import gqles.caching
+import gqles.execution
+
+import example.policies
+
+
+EVENT = """
+query ($id: UUID!) {
+  event(applicationName: "commands", originatorId: $id, originatorVersion: 0) {
+    originatorVersion
+    previousEvents { edges { cursor } }
+  }
+}
+"""
+
+NOTIFICATIONS = """
+query (
+  $first: Int, $last: Int, $applicationNames: [String!], $to: Datetime,
+) {
+  notifications(
+    first: $first, last: $last, applicationNames: $applicationNames, to: $to,
+  ) { edges { cursor } }
+}
+"""
+
+
+@pytest.fixture
+def get(asgi):
+
+    def get(app, query, variables, headers=()):
+        query_hash = gqles.execution.get_query_hash(query)
+        params = dict(
+            query=query,
+            variables=json.dumps(variables),
+            extensions=json.dumps(
+                dict(persistedQuery=dict(version=1, sha256Hash=query_hash)),
+            ),
+        )
+        return asgi(
+            app, "GET", "/?" + urllib.parse.urlencode(params), headers=headers,
+        )
+
+    return get
+
+
+@pytest.mark.asyncio
+async def test_immutable_responses_have_etags(system_runner, get):
+    app = gqles.BackstageGraphQL()
+    variables = dict(id=str(example.policies.Commands.create_order()))
+
+    response = await get(app, EVENT, variables)
+    assert response.status_code == 200
+    assert response.json()["data"]["event"]["originatorVersion"] == 0
+    assert response.headers["cache-control"] == (
+        gqles.caching.IMMUTABLE_CACHE_CONTROL
+    )
+    etag = response.headers["etag"]
+
+    response = await get(
+        app, EVENT, variables, headers=[("If-None-Match", etag)],
+    )
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_responses_with_the_head_are_not_cached(system_runner, get):
+    app = gqles.BackstageGraphQL()
+    for _ in range(2):
+        example.policies.Commands.create_order()
+
+    response = await get(app, NOTIFICATIONS, dict(last=2))
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+
+    # The first page of a log is followed by more notifications, so it
+    # is fixed.
+    response = await get(
+        app, NOTIFICATIONS, dict(first=2, applicationNames=["commands"]),
+    )
+    assert response.headers["cache-control"] == (
+        gqles.caching.IMMUTABLE_CACHE_CONTROL
+    )
+
+    # Events of other logs may still be committed within a merged page,
+    # unless it ends at a time.
+    response = await get(app, NOTIFICATIONS, dict(first=2))
+    assert response.headers["cache-control"] == "no-store"
+    to = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    response = await get(app, NOTIFICATIONS, dict(first=2, to=to))
+    assert response.headers["cache-control"] == (
+        gqles.caching.IMMUTABLE_CACHE_CONTROL
+    )
+
+    # A missing event may still appear.
+    response = await get(app, EVENT, dict(id=str(uuid.uuid4())))
+    assert response.json()["data"]["event"] is None
+    assert response.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.asyncio
+async def test_server_side_response_cache(system_runner, get, statements):
+    app = gqles.BackstageGraphQL(max_cached_responses=10)
+    variables = dict(id=str(example.policies.Commands.create_order()))
+
+    first = await get(app, EVENT, variables)
+    statements.clear()
+    second = await get(app, EVENT, variables)
+
+    assert second.body == first.body
+    assert second.headers["etag"] == first.headers["etag"]
+    assert statements == []
+    assert app.response_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_get_without_query_renders_playground(system_runner, asgi):
+    response = await asgi(gqles.BackstageGraphQL(), "GET", "/")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+
+    response = await asgi(
+        gqles.BackstageGraphQL(), "GET", "/?query={}&variables=nope",
+    )
+    assert response.status_code == 400
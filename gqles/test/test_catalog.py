@@ -0,0 +1,180 @@
+import json
+import uuid
+
+import pytest
+
+from eventsourcing.application.simple import ProcessEvent
+
+import gqles.rebuild
+
+import example.application
+import example.domain
+import example.policies
+
+
+ORIGINATORS = """
+query (
+  $topic: String, $applicationName: String,
+  $first: Int, $after: String, $last: Int, $before: String,
+) {
+  originators(
+    topic: $topic, applicationName: $applicationName,
+    first: $first, after: $after, last: $last, before: $before,
+  ) {
+    pageInfo { hasPreviousPage hasNextPage startCursor endCursor }
+    edges {
+      cursor
+      node { originatorId applicationName topic version last { topic } }
+    }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_originators_are_catalogued_by_topic(system_runner, backstage):
+    command_ids = [example.policies.Commands.create_order() for _ in range(3)]
+
+    data = await backstage(
+        ORIGINATORS, topic="example.domain#CreateOrder", first=10000,
+    )
+    nodes = {
+        edge["node"]["originatorId"]: edge["node"]
+        for edge in data["originators"]["edges"]
+    }
+    for command_id in command_ids:
+        node = nodes[str(command_id)]
+        assert node["applicationName"] == "commands"
+        assert node["version"] == 2
+        assert node["last"]["topic"] == "example.domain#CreateOrder.Done"
+
+    orders = await backstage(
+        ORIGINATORS, topic="example.domain#Order", applicationName="orders",
+        first=10000,
+    )
+    assert len(orders["originators"]["edges"]) >= 3
+    assert {
+        edge["node"]["version"] for edge in orders["originators"]["edges"]
+    } == {2}
+
+
+@pytest.mark.asyncio
+async def test_originators_pagination(system_runner, backstage):
+    for _ in range(3):
+        example.policies.Commands.create_order()
+
+    everything = [
+        edge["node"]["originatorId"] for edge in (await backstage(
+            ORIGINATORS, first=10000,
+        ))["originators"]["edges"]
+    ]
+
+    forwards = []
+    page = dict(pageInfo=dict(hasNextPage=True, endCursor=None))
+    while page["pageInfo"]["hasNextPage"]:
+        page = (await backstage(
+            ORIGINATORS, first=4, after=page["pageInfo"]["endCursor"],
+        ))["originators"]
+        forwards.extend(edge["node"]["originatorId"] for edge in page["edges"])
+
+    backwards = []
+    page = dict(pageInfo=dict(hasPreviousPage=True, startCursor=None))
+    while page["pageInfo"]["hasPreviousPage"]:
+        page = (await backstage(
+            ORIGINATORS, last=4, before=page["pageInfo"]["startCursor"],
+        ))["originators"]
+        backwards[:0] = [edge["node"]["originatorId"] for edge in page["edges"]]
+
+    assert forwards == backwards == everything
+
+
+@pytest.mark.asyncio
+async def test_originators_with_a_missing_last_event(system_runner, backstage):
+    command_id = example.policies.Commands.create_order()
+
+    # As if the catalog was ahead of the events that can be read.
+    catalog = system_runner.processes["commands"].event_store.catalog
+    catalog.query(
+        catalog.record_class.originator_id == command_id,
+    ).update(dict(originator_version=99), synchronize_session=False)
+    catalog.session.commit()
+
+    data = await backstage(
+        ORIGINATORS, topic="example.domain#CreateOrder", first=10000,
+    )
+    node, = [
+        edge["node"] for edge in data["originators"]["edges"]
+        if edge["node"]["originatorId"] == str(command_id)
+    ]
+    assert node["version"] == 99
+    assert node["last"] is None
+
+
+def make_orders(count):
+    orders = [
+        example.domain.Order.create(command_id=uuid.uuid4())
+        for _ in range(count)
+    ]
+    for order in orders:
+        order.set_is_reserved(uuid.uuid4())
+    return orders
+
+
+def record(application, aggregates):
+    application.record_process_event(ProcessEvent(domain_events=[
+        event for aggregate in aggregates
+        for event in aggregate.__batch_pending_events__()
+    ]))
+
+
+@pytest.fixture
+def orders():
+    application = example.application.Application(
+        name="catalog-%s" % uuid.uuid4().hex[:8], setup_table=True,
+    )
+    yield application
+    application.close()
+
+
+def test_catalog_is_read_once_per_batch(orders, statements):
+    record(orders, make_orders(20))
+    selects = [
+        statement for statement in statements
+        if "gqles_originators" in statement
+    ]
+    assert len(selects) == 1
+
+
+def test_catalog_rebuild(orders, capsys):
+    catalog = orders.event_store.catalog
+    created = make_orders(5)
+    record(orders, created)
+
+    # As if recorded before there was a catalog.
+    session = catalog.session
+    catalog.query(
+        catalog.record_class.application_name == orders.name,
+    ).delete(synchronize_session=False)
+    session.commit()
+
+    # Originators catalogued since are left as they are.
+    latest = created[0]
+    latest.set_is_paid(uuid.uuid4())
+    record(orders, [latest])
+
+    gqles.rebuild.main([
+        "example.application#Application", orders.name, "--chunk-size", "3",
+    ])
+    report = json.loads(capsys.readouterr().out)
+    assert report["catalogRecords"] == 4
+
+    versions = {
+        record.originator_id: record.originator_version
+        for record in catalog.query(
+            catalog.record_class.application_name == orders.name,
+        )
+    }
+    session.close()
+    assert versions == {
+        order.id: 2 if order is latest else 1 for order in created
+    }
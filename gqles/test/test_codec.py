@@ -0,0 +1,204 @@
+import datetime
+import decimal
+import uuid
+
+import pytest
+
+from typing import Optional
+
+from eventsourcing.application.simple import ProcessEvent
+from eventsourcing.domain.model.aggregate import AggregateRoot
+from eventsourcing.domain.model.decorators import subclassevents
+from eventsourcing.utils.transcoding import ObjectJSONDecoder, ObjectJSONEncoder
+
+import gqles.codec
+import gqles.infrastructure
+import gqles.schema
+from gqles.model import Model
+
+import example.application
+
+
+@subclassevents
+class Parcel(Model, AggregateRoot):
+
+    label: str
+    weight: Optional[int]
+    carrier_id: Optional[uuid.UUID]
+
+    class Weighed(AggregateRoot.Event):
+        def mutate(self, parcel: "Parcel"):
+            parcel.weight = self.weight
+
+    def weigh(self, weight):
+        self.__trigger_event__(Parcel.Weighed, weight=weight)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return type(other) is Point and other.__dict__ == self.__dict__
+
+
+class Labels(dict):
+    pass
+
+
+VALUES = dict(
+    none=None,
+    true=True,
+    false=False,
+    small=3,
+    negative=-300,
+    big=2 ** 80,
+    float=1.5,
+    text="héllo",
+    empty="",
+    known="originator_topic",
+    hash="0f" * 32,
+    upper_hash="0F" * 32,
+    odd_hash="0" * 33,
+    bytes=b"\x00\x01",
+    uuid=uuid.uuid4(),
+    decimal=decimal.Decimal("1792318076.237656"),
+    datetime=datetime.datetime(2020, 1, 2, 3, 4, 5, 6, datetime.timezone.utc),
+    naive=datetime.datetime(2020, 1, 2),
+    date=datetime.date(2020, 1, 2),
+    list=[1, "a", [None]],
+    tuple=(1, (2,)),
+    dict={"a": {"b": uuid.uuid4()}, 1: "one"},
+    set={1, 2},
+    object=Point(1, 2),
+    subclass=Labels(a="b"),
+)
+
+
+def test_values_round_trip():
+    state = gqles.codec.encode(VALUES)
+    assert gqles.codec.is_encoded(state)
+
+    decoded = gqles.codec.decode(state)
+    assert decoded == VALUES
+    for key, value in VALUES.items():
+        assert type(decoded[key]) is type(value), key
+
+
+def test_unknown_types_decode_like_json():
+    decoded = gqles.codec.decode(gqles.codec.encode(VALUES))
+    for key in ("set", "object", "subclass"):
+        expected = ObjectJSONDecoder().decode(
+            ObjectJSONEncoder().encode(VALUES[key]).decode("utf8"),
+        )
+        assert decoded[key] == expected
+        assert type(decoded[key]) is type(expected)
+
+
+def test_json_states_are_not_encoded():
+    assert not gqles.codec.is_encoded(b'{"a":1}')
+    assert not gqles.codec.is_encoded(b"")
+    with pytest.raises(ValueError):
+        gqles.codec.decode(b'{"a":1}')
+
+
+def test_field_encoders_follow_the_model():
+    encoders = gqles.codec.get_field_encoders(Parcel.Weighed)
+    assert set(encoders) == {"label", "weight", "carrier_id"}
+    assert gqles.codec.get_field_encoders(ProcessEvent) == {}
+
+    # Values that are not of the declared type are still encoded.
+    state = gqles.codec.encode(dict(weight="heavy", carrier_id=None), encoders)
+    assert gqles.codec.decode(state) == dict(weight="heavy", carrier_id=None)
+
+
+def record(application, aggregate):
+    application.record_process_event(ProcessEvent(
+        domain_events=aggregate.__batch_pending_events__(),
+    ))
+
+
+@pytest.fixture
+def parcels():
+    name = "parcels-%s" % uuid.uuid4().hex[:8]
+
+    class BinaryApplication(example.application.Application):
+        sequenced_item_mapper_class = (
+            gqles.infrastructure.BinarySequencedItemMapper
+        )
+
+    json_application = example.application.Application(
+        name=name, setup_table=True,
+    )
+    binary_application = BinaryApplication(name=name, setup_table=True)
+    yield json_application, binary_application
+    json_application.close()
+    binary_application.close()
+
+
+def test_binary_applications_read_json_states(parcels):
+    json_application, binary_application = parcels
+
+    parcel = Parcel.__create__(label="a")
+    parcel.weigh(3)
+    record(json_application, parcel)
+    parcel.weigh(4)
+    record(binary_application, parcel)
+
+    items = list(binary_application.event_store.record_manager.get_items(
+        parcel.id,
+    ))
+    assert [gqles.codec.is_encoded(item.state) for item in items] == [
+        False, False, True,
+    ]
+    assert len(items[2].state) < len(
+        json_application.event_store.event_mapper.item_from_event(
+            binary_application.event_store.event_mapper.event_from_item(
+                items[2],
+            ),
+        ).state,
+    )
+
+    # The hash chain holds across the formats.
+    loaded = binary_application.repository[parcel.id]
+    assert loaded.weight == 4
+    assert loaded.label == "a"
+    assert loaded.__version__ == 2
+
+
+INSIGHT = """
+query ($originatorId: UUID!) {
+  applications {
+    originator(originatorId: $originatorId) {
+      last { stateInsight { key text ... on StateInsightUUID { uuid } } }
+    }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_state_insight_of_binary_states(parcels, backstage, monkeypatch):
+    _, binary_application = parcels
+
+    async def get_system_runner():
+        return type("Runner", (), dict(
+            processes={binary_application.name: binary_application},
+        ))
+
+    monkeypatch.setattr(gqles.schema, "get_system_runner", get_system_runner)
+
+    parcel = Parcel.__create__(label="a", carrier_id=uuid.uuid4())
+    record(binary_application, parcel)
+
+    data = await backstage(INSIGHT, originatorId=str(parcel.id))
+    insight = {
+        item["key"]: item
+        for item in data["applications"][0]["originator"]["last"][
+            "stateInsight"
+        ]
+    }
+    assert insight["label"]["text"] == "a"
+    assert insight["carrier_id"]["uuid"] == str(parcel.carrier_id)
+    assert insight["originator_id"]["uuid"] == str(parcel.id)
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import ariadne
+import sqlalchemy
+import starlette.concurrency
+
+from eventsourcing.exceptions import RecordConflictError
+
+import gqles.commands
+import gqles.database
+
+import example.database
+import example.schema
+
+
+@pytest.mark.asyncio
+async def test_commands_are_retried_off_the_loop():
+    dispatcher = gqles.commands.CommandDispatcher(wait=0.001)
+    threads = []
+
+    def command():
+        threads.append(threading.get_ident())
+        if len(threads) < 3:
+            raise RecordConflictError()
+        return "done"
+
+    try:
+        assert await dispatcher.dispatch(command) == "done"
+    finally:
+        dispatcher.close()
+
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
+
+
+@pytest.mark.asyncio
+async def test_the_last_error_is_raised():
+    dispatcher = gqles.commands.CommandDispatcher(max_attempts=2, wait=0.001)
+    attempts = []
+
+    def command():
+        attempts.append(1)
+        raise RecordConflictError()
+
+    try:
+        with pytest.raises(RecordConflictError):
+            await dispatcher.dispatch(command)
+        # Other errors are not retried.
+        with pytest.raises(RecordConflictError):
+            await dispatcher.dispatch(command, retry_on=ValueError)
+    finally:
+        dispatcher.close()
+
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_contention_does_not_block_the_loop():
+    dispatcher = gqles.commands.CommandDispatcher(wait=0.05, max_wait=0.05)
+    attempts = []
+    ticks = []
+
+    def command():
+        attempts.append(1)
+        time.sleep(0.05)
+        if len(attempts) < 3:
+            raise RecordConflictError()
+
+    async def tick():
+        while len(attempts) < 3:
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    try:
+        await asyncio.gather(dispatcher.dispatch(command), tick())
+    finally:
+        dispatcher.close()
+
+    assert len(ticks) > 5
+
+
+@pytest.mark.asyncio
+async def test_readers_do_not_roll_back_dispatched_writes():
+    session = example.database.ScopedSession
+    engine = example.database.engine
+    engine.execute("CREATE TABLE dispatched (id INTEGER)")
+    dispatcher = gqles.commands.CommandDispatcher()
+    written = threading.Event()
+    read = threading.Event()
+
+    def count():
+        return session.execute(
+            sqlalchemy.text("SELECT count(*) FROM dispatched"),
+        ).scalar()
+
+    def command():
+        with gqles.database.session_scope(session):
+            session.execute(
+                sqlalchemy.text("INSERT INTO dispatched VALUES (1)"),
+            )
+            written.set()
+            read.wait(5)
+            session.commit()
+
+    try:
+        task = asyncio.ensure_future(dispatcher.dispatch(command))
+        await starlette.concurrency.run_in_threadpool(written.wait, 5)
+        # Requests read, then close their session, on the loop.
+        with gqles.database.session_scope(session):
+            assert count() == 0
+        read.set()
+        await task
+
+        with gqles.database.session_scope(session):
+            assert count() == 1
+    finally:
+        read.set()
+        dispatcher.close()
+        engine.execute("DROP TABLE dispatched")
+
+
+@pytest.mark.asyncio
+async def test_create_order_mutation(system_runner):
+    success, result = await ariadne.graphql(
+        example.schema.schema,
+        dict(query="mutation { createOrder(input: {}) { created { uuid } } }"),
+    )
+    assert success and "errors" not in result, result
+
+    command_id = result["data"]["createOrder"]["created"]["uuid"]
+    commands = system_runner.processes["commands"]
+    assert str(commands.repository[command_id].id) == command_id
@@ -0,0 +1,190 @@
+import json
+import uuid
+import zlib
+
+import pytest
+
+import sqlalchemy
+
+from eventsourcing.application.simple import ProcessEvent
+from eventsourcing.utils.random import encoded_random_bytes
+
+import gqles.compression
+import gqles.database
+
+import example.application
+import example.database
+import example.domain
+
+
+def make_states(count):
+    return [
+        json.dumps(dict(
+            originator_id=str(uuid.uuid4()),
+            originator_topic="example.domain#Order",
+            originator_version=i % 3,
+            reservation_id=str(uuid.uuid4()),
+            __event_topic__="example.domain#Order.Reserved",
+        )).encode()
+        for i in range(count)
+    ]
+
+
+def test_trained_dictionaries_beat_zlib():
+    states = make_states(200)
+    dictionary = gqles.compression.train_dictionary(states[:150], size=2048)
+    assert 0 < len(dictionary) <= 2048
+
+    zlib_size = sum(len(zlib.compress(state, 9)) for state in states[150:])
+    compressed = sum(
+        len(gqles.compression.compress_with(1, dictionary, state))
+        for state in states[150:]
+    )
+    assert compressed < zlib_size * 0.8
+
+
+def test_dictionaries_of_empty_samples_are_empty():
+    assert gqles.compression.train_dictionary([]) == b""
+
+
+@pytest.fixture
+def compressor():
+    session = example.database.ScopedSession
+    record_class = gqles.compression.CompressionDictionaryRecord
+    record_class.__table__.create(
+        bind=example.database.engine, checkfirst=True,
+    )
+    return gqles.compression.DictionaryCompressor(
+        session, "compression-%s" % uuid.uuid4().hex[:8],
+    )
+
+
+def test_compressor_reads_all_states(compressor):
+    state = make_states(1)[0]
+
+    # Without a dictionary, like zlib.
+    assert compressor.compress(state) == zlib.compress(state, 9)
+    assert compressor.decompress(zlib.compress(state)) == state
+    assert compressor.decompress(state) == state
+
+    first = compressor.add_dictionary(
+        gqles.compression.train_dictionary(make_states(50)),
+    )
+    compressed = compressor.compress(state)
+    assert gqles.compression.get_dictionary_id(compressed) == first
+    assert compressor.decompress(compressed) == state
+
+    topic = "example.domain#Order.Reserved"
+    second = compressor.add_dictionary(b"some other dictionary", topic=topic)
+    assert second == first + 1
+    assert gqles.compression.get_dictionary_id(
+        compressor.compress(state, topic=topic),
+    ) == second
+    assert gqles.compression.get_dictionary_id(
+        compressor.compress(state, topic="example.domain#Order.Paid"),
+    ) == first
+
+    # States compressed with older dictionaries stay readable, from
+    # other processes too.
+    other = gqles.compression.DictionaryCompressor(
+        compressor.session, compressor.application_name,
+    )
+    assert other.decompress(compressed) == state
+
+    with pytest.raises(ValueError):
+        other.decompress(gqles.compression.compress_with(99, b"x", state))
+
+
+def test_dictionaries_are_loaded_in_a_session_of_their_own(compressor):
+    state = make_states(1)[0]
+    compressor.add_dictionary(
+        gqles.compression.train_dictionary(make_states(50)),
+    )
+    compressed = compressor.compress(state)
+
+    events = []
+
+    def checkout(*args):
+        events.append("checkout")
+
+    def checkin(*args):
+        events.append("checkin")
+
+    engine = example.database.engine
+    sqlalchemy.event.listen(engine, "checkout", checkout)
+    sqlalchemy.event.listen(engine, "checkin", checkin)
+    try:
+        # Like the backstage, reading states of another process.
+        with gqles.database.session_scope(compressor.session):
+            other = gqles.compression.DictionaryCompressor(
+                compressor.session, compressor.application_name,
+            )
+            assert other.decompress(compressed) == state
+            # The connection is back in the pool before the request ends.
+            assert events == ["checkout", "checkin"]
+    finally:
+        sqlalchemy.event.remove(engine, "checkout", checkout)
+        sqlalchemy.event.remove(engine, "checkin", checkin)
+
+
+class CompressedApplication(example.application.Application):
+    compression_dictionaries = True
+
+
+def record_orders(application, count):
+    orders = [
+        example.domain.Order.create(command_id=uuid.uuid4())
+        for _ in range(count)
+    ]
+    for order in orders:
+        order.set_is_reserved(uuid.uuid4())
+    application.record_process_event(ProcessEvent(domain_events=[
+        event for order in orders for event in order.__batch_pending_events__()
+    ]))
+    return orders
+
+
+def test_applications_compress_then_encrypt():
+    application = CompressedApplication(
+        name="compressed-%s" % uuid.uuid4().hex[:8],
+        cipher_key=encoded_random_bytes(32),
+        setup_table=True,
+    )
+    try:
+        before = record_orders(application, 50)
+
+        report = gqles.compression.retrain(application, sample_size=100)
+        assert report["samples"] == 100
+        assert report["dictionaryId"] == 1
+        assert report["ratio"] > report["zlibRatio"]
+
+        after = record_orders(application, 5)
+        record_manager = application.event_store.record_manager
+        cipher = application.event_store.event_mapper.cipher
+        for order, dictionary_id in [(before[0], None), (after[0], 1)]:
+            for item in record_manager.get_items(order.id):
+                compressed = cipher.decrypt(item.state)
+                assert gqles.compression.get_dictionary_id(
+                    compressed,
+                ) == dictionary_id
+
+        for order in before + after:
+            assert application.repository[order.id].is_reserved
+    finally:
+        application.close()
+
+
+def test_retrain_tool(capsys):
+    name = "compressed-%s" % uuid.uuid4().hex[:8]
+    application = CompressedApplication(name=name, setup_table=True)
+    record_orders(application, 10)
+    application.close()
+
+    gqles.compression.main([
+        "gqles.test.test_compression#CompressedApplication", name,
+        "--samples", "10", "--dry-run",
+    ])
+    report = json.loads(capsys.readouterr().out)
+    assert report["applicationName"] == name
+    assert report["samples"] == 10
+    assert report["dictionaryId"] is None
@@ -0,0 +1,329 @@
+import asyncio
+import gc
+import threading
+import time
+import tracemalloc
+
+import uuid
+
+import pytest
+
+import sqlalchemy
+import starlette.applications
+import starlette.concurrency
+import starlette.responses
+import starlette.routing
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from eventsourcing.application.simple import ProcessEvent
+
+import gqles.database
+import gqles.metrics
+import gqles.schema
+import gqles.snapshots
+
+import example.application
+import example.domain
+
+
+def test_settings_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db/gqles")
+    monkeypatch.setenv("DATABASE_POOL_SIZE", "20")
+    monkeypatch.setenv("DATABASE_MAX_OVERFLOW", "5")
+    monkeypatch.setenv("DATABASE_POOL_RECYCLE", "1800")
+
+    settings = gqles.database.DatabaseSettings()
+    assert gqles.database.get_engine_options(settings) == dict(
+        pool_size=20,
+        max_overflow=5,
+        pool_recycle=1800,
+        pool_pre_ping=False,
+    )
+
+
+def test_sqlite_engines(tmp_path):
+    # In-memory databases are files of their own engine.
+    engine = gqles.database.create_engine(gqles.database.DatabaseSettings())
+    assert isinstance(engine.pool, NullPool)
+    assert engine.url.database.endswith("gqles.db")
+    other = gqles.database.create_engine(gqles.database.DatabaseSettings())
+    assert other.url.database != engine.url.database
+
+    url = "sqlite:///%s" % (tmp_path / "gqles.db")
+    engine = gqles.database.create_engine(
+        gqles.database.DatabaseSettings(url=url),
+    )
+    assert isinstance(engine.pool, NullPool)
+
+    engine = gqles.database.create_engine(
+        gqles.database.DatabaseSettings(url=url, pool_size=2, max_overflow=1),
+    )
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 2
+
+
+def test_threads_do_not_share_transactions():
+    session = make_session()
+    session.execute(sqlalchemy.text("CREATE TABLE things (id INTEGER)"))
+    session.commit()
+
+    def read():
+        count = session.execute(
+            sqlalchemy.text("SELECT count(*) FROM things"),
+        ).scalar()
+        session.close()
+        return count
+
+    session.execute(sqlalchemy.text("INSERT INTO things VALUES (1)"))
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(read()))
+    reader.start()
+    reader.join()
+    session.commit()
+
+    # The reader neither saw the write, nor rolled it back.
+    assert counts == [0]
+    assert read() == 1
+    session.remove()
+
+
+def make_session():
+    engine = gqles.database.create_engine(gqles.database.DatabaseSettings())
+    return scoped_session(
+        sessionmaker(bind=engine),
+        scopefunc=gqles.database.get_current_scope,
+    )
+
+
+def make_app(session, middleware=True):
+    seen = []
+
+    def query():
+        return session.execute(sqlalchemy.text("SELECT 1")).scalar()
+
+    async def endpoint(request):
+        # Work dispatched to worker threads shares the request's session.
+        seen.append((
+            session(), await starlette.concurrency.run_in_threadpool(session),
+        ))
+        await starlette.concurrency.run_in_threadpool(query)
+        return starlette.responses.PlainTextResponse("ok")
+
+    app = starlette.applications.Starlette(routes=[
+        starlette.routing.Route("/", endpoint),
+    ])
+    if middleware:
+        app.add_middleware(gqles.database.SessionMiddleware, session=session)
+    return app, seen
+
+
+@pytest.mark.asyncio
+async def test_requests_have_their_own_session(asgi):
+    session = make_session()
+    app, seen = make_app(session)
+
+    for _ in range(3):
+        assert (await asgi(app)).body == b"ok"
+
+    assert all(inline is threaded for inline, threaded in seen)
+    assert len({id(inline) for inline, _ in seen}) == 3
+    assert session.registry.registry == {}
+
+
+def test_threads_outside_requests_have_their_own_session():
+    session = make_session()
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(session()))
+    thread.start()
+    thread.join()
+
+    assert sessions[0] is not session()
+    with gqles.database.session_scope(session):
+        scoped = session()
+        assert scoped is not sessions[0]
+    assert session() is not scoped
+
+
+@pytest.mark.asyncio
+async def test_cancelled_callers_wait_for_their_thread():
+    started = threading.Event()
+    done = []
+
+    def read():
+        started.set()
+        time.sleep(0.1)
+        done.append(True)
+
+    task = asyncio.ensure_future(gqles.database.run_in_threadpool(read))
+    await asyncio.get_event_loop().run_in_executor(None, started.wait, 5)
+    # Like a loop cancelling all its tasks while it closes, again.
+    for _ in range(2):
+        task.cancel()
+        await asyncio.sleep(0)
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert done == [True]
+
+
+@pytest.mark.asyncio
+async def test_sessions_do_not_leak(asgi):
+    session = make_session()
+    app, seen = make_app(session, middleware=False)
+    for _ in range(50):
+        await asgi(app)
+    # Without the middleware, sessions outlive the requests.
+    assert len(session.registry.registry) > 1
+
+    session = make_session()
+    app, seen = make_app(session)
+
+    async def soak(number):
+        for _ in range(number):
+            await asgi(app)
+        seen.clear()
+        gc.collect()
+
+    await soak(200)
+    tracemalloc.start()
+    try:
+        await soak(200)
+        before = tracemalloc.take_snapshot()
+        await soak(1000)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    assert session.registry.registry == {}
+    growth = sum(
+        stat.size_diff for stat in after.compare_to(before, "filename")
+    )
+    # A session with its identity map and transaction takes several KiB,
+    # a leak would grow by megabytes.
+    assert growth < 256 * 1024, growth
+
+
+def test_read_engines(tmp_path):
+    settings = gqles.database.DatabaseSettings
+    assert gqles.database.create_read_engine(settings()) is None
+    assert gqles.database.get_read_url(
+        settings(url="postgresql://db/gqles"),
+    ) == "postgresql://db/gqles"
+    assert gqles.database.get_read_url(settings(
+        url="postgresql://db/gqles", read_url="postgresql://replica/gqles",
+    )) == "postgresql://replica/gqles"
+
+    url = "sqlite:///%s" % (tmp_path / "gqles.db")
+    engine = gqles.database.create_engine(settings(url=url))
+    read_engine = gqles.database.create_read_engine(
+        settings(url=url, read_pool_size=1, read_pool_timeout=0.1),
+    )
+    with engine.connect() as connection:
+        assert connection.execute("PRAGMA journal_mode").scalar() == "wal"
+        connection.execute("CREATE TABLE things (id INTEGER)")
+
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        read_engine.execute("INSERT INTO things VALUES (1)")
+
+    # Reads wait for the connections of their budget...
+    held = read_engine.connect()
+    try:
+        with pytest.raises(sqlalchemy.exc.TimeoutError):
+            read_engine.connect()
+        # ...writes do not.
+        engine.execute("INSERT INTO things VALUES (1)")
+    finally:
+        held.close()
+    assert read_engine.execute("SELECT count(*) FROM things").scalar() == 1
+
+    session = gqles.database.make_read_session(read_engine)
+    session.add(example.application.Application.stored_event_record_class())
+    with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+        session.flush()
+    session.remove()
+
+
+BACKSTAGE = """
+query ($originatorId: UUID!) {
+  notifications(first: 10) { edges { node { originatorId } } }
+  originators(first: 10) { edges { node { originatorId } } }
+  applications {
+    originator(originatorId: $originatorId) {
+      events(first: 10) { edges { node { originatorVersion } } }
+      stateAt(version: 1) { originatorVersion }
+    }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_backstage_reads_through_the_read_engine(
+        tmp_path, backstage, monkeypatch,
+):
+    settings = gqles.database.DatabaseSettings(
+        url="sqlite:///%s" % (tmp_path / "gqles.db"),
+    )
+    engine = gqles.database.create_engine(settings)
+    read_engine = gqles.database.create_read_engine(settings)
+    session = scoped_session(
+        sessionmaker(bind=engine),
+        scopefunc=gqles.database.get_current_scope,
+    )
+    read_session = gqles.database.make_read_session(read_engine)
+
+    application = example.application.Application(
+        name="orders", session=session, read_session=read_session,
+        snapshotting=gqles.snapshots.SizeThreshold(1), setup_table=True,
+    )
+    record_manager = application.event_store.record_manager
+    record_manager.tracking_record_class.__table__.create(bind=engine)
+    # Following itself, to have a lag.
+    application.readers = ["orders"]
+
+    async def get_system_runner():
+        return type("Runner", (), dict(processes={"orders": application}))
+
+    monkeypatch.setattr(gqles.schema, "get_system_runner", get_system_runner)
+
+    order = example.domain.Order.create(command_id=uuid.uuid4())
+    order.set_is_reserved(uuid.uuid4())
+    application.record_process_event(
+        ProcessEvent(domain_events=order.__batch_pending_events__()),
+    )
+
+    statements = {engine: [], read_engine: []}
+
+    def listen(target):
+        def count(conn, cursor, statement, *args):
+            statements[target].append(statement)
+        sqlalchemy.event.listen(target, "before_cursor_execute", count)
+
+    listen(engine)
+    listen(read_engine)
+
+    with gqles.database.session_scope(session, read_session):
+        data = await backstage(BACKSTAGE, originatorId=str(order.id))
+        lag = gqles.metrics.get_lag(application, {"orders": application})
+
+    assert len(data["notifications"]["edges"]) == 2
+    assert len(data["originators"]["edges"]) == 1
+    originator, = data["applications"]
+    assert len(originator["originator"]["events"]["edges"]) == 2
+    assert originator["originator"]["stateAt"]["originatorVersion"] == 1
+    assert lag == [("orders", 0, 2)]
+
+    assert statements[engine] == []
+    assert statements[read_engine]
+
+    # Snapshots are decided on the writer, whatever the lag of the reads.
+    statements[read_engine].clear()
+    with gqles.database.session_scope(session, read_session):
+        assert application.snapshotting.get_size_since(
+            application, order.id, None,
+        )
+    assert statements[engine]
+    assert statements[read_engine] == []
+    application.close()
@@ -0,0 +1,57 @@
+import uuid
+
+import pytest
+
+import example.policies
+
+
+INSIGHTS = """
+query ($uuids: [UUID!]!) {
+  insights(uuids: $uuids) {
+    applicationName
+    originator { originatorId last { originatorVersion } }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_insights_are_batched(
+        system_runner, backstage, statements,
+):
+    command_ids = [example.policies.Commands.create_order() for _ in range(5)]
+    unknown = uuid.uuid4()
+
+    statements.clear()
+    data = await backstage(
+        INSIGHTS, uuids=[str(u) for u in command_ids + [unknown]],
+    )
+
+    # One catalog read, and one batched load of the commands' events.
+    assert len(statements) == 2
+
+    *insights, missing = data["insights"]
+    assert missing is None
+    for command_id, insight in zip(command_ids, insights):
+        assert insight["applicationName"] == "commands"
+        assert insight["originator"]["originatorId"] == str(command_id)
+        # Created, order ID set, and done.
+        assert insight["originator"]["last"]["originatorVersion"] == 2
+
+
+@pytest.mark.asyncio
+async def test_query_event_uses_loader(system_runner, backstage):
+    command_id = example.policies.Commands.create_order()
+
+    data = await backstage("""
+    query ($id: UUID!) {
+      found: event(
+        applicationName: "commands", originatorId: $id, originatorVersion: 1,
+      ) { originatorVersion }
+      missing: event(
+        applicationName: "commands", originatorId: $id, originatorVersion: 9,
+      ) { originatorVersion }
+    }
+    """, id=str(command_id))
+
+    assert data == dict(found=dict(originatorVersion=1), missing=None)
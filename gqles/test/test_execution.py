@@ -0,0 +1,94 @@
+import pytest
+
+import gqles
+import gqles.execution
+
+import example.policies
+
+
+QUERY = "{ applications { name } }"
+
+
+@pytest.fixture
+def backstage_app(system_runner):
+    return gqles.BackstageGraphQL()
+
+
+@pytest.fixture
+def post(asgi):
+
+    def post(app, data):
+        return asgi(app, "POST", json_body=data)
+
+    return post
+
+
+def persisted(query_hash, query=None):
+    data = dict(
+        extensions=dict(persistedQuery=dict(version=1, sha256Hash=query_hash)),
+    )
+    if query is not None:
+        data["query"] = query
+    return data
+
+
+@pytest.mark.asyncio
+async def test_automatic_persisted_queries(backstage_app, post):
+    query_hash = gqles.execution.get_query_hash(QUERY)
+
+    # Unknown hashes ask the client to send the query along.
+    response = await post(backstage_app, persisted(query_hash))
+    assert response.status_code == 200
+    [error] = response.json()["errors"]
+    assert error["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    response = await post(backstage_app, persisted(query_hash, QUERY))
+    assert response.status_code == 200
+    names = response.json()["data"]["applications"]
+
+    response = await post(backstage_app, persisted(query_hash))
+    assert response.status_code == 200
+    assert response.json()["data"]["applications"] == names
+
+    response = await post(backstage_app, persisted("0" * 64, QUERY))
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_documents_are_parsed_and_validated_once(
+        backstage_app, post,
+):
+    backstage = backstage_app
+    command_id = example.policies.Commands.create_order()
+    query = """
+    query ($id: UUID!) {
+      event(applicationName: "commands", originatorId: $id, originatorVersion: 0) {
+        originatorVersion
+      }
+    }
+    """
+
+    for _ in range(3):
+        response = await post(
+            backstage, dict(query=query, variables=dict(id=str(command_id))),
+        )
+        assert response.json()["data"]["event"]["originatorVersion"] == 0
+
+    assert backstage.document_cache.misses == 1
+    assert backstage.document_cache.hits == 2
+
+    # Invalid documents are cached with their errors.
+    for _ in range(2):
+        response = await post(backstage, dict(query="{ nope }"))
+        assert response.status_code == 400
+    assert backstage.document_cache.misses == 2
+
+
+def test_serializers_agree():
+    response = dict(data=dict(text="é", number=1.5, items=[None, True]))
+    assert gqles.execution.dumps_stdlib(response) == (
+        '{"data":{"text":"é","number":1.5,"items":[null,true]}}'.encode("utf8")
+    )
+    assert gqles.execution.default_serializer(response) == (
+        gqles.execution.dumps_stdlib(response)
+    )
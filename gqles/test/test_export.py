@@ -0,0 +1,158 @@
+import asyncio
+import base64
+import gzip
+import json
+import uuid
+
+import pytest
+
+import starlette.applications
+import starlette.routing
+
+from eventsourcing.application.simple import ProcessEvent
+
+import gqles.export
+import gqles.schema
+
+import example.application
+import example.domain
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    application = example.application.Application(
+        name="export-%s" % uuid.uuid4().hex[:8], setup_table=True,
+    )
+
+    async def get_system_runner():
+        return type("Runner", (), dict(
+            processes={"orders": application},
+        ))
+
+    monkeypatch.setattr(gqles.export, "get_system_runner", get_system_runner)
+    yield application
+    application.close()
+
+
+def record_orders(application, count):
+    orders = [
+        example.domain.Order.create(command_id=uuid.uuid4())
+        for _ in range(count)
+    ]
+    application.record_process_event(ProcessEvent(domain_events=[
+        event for order in orders for event in order.__batch_pending_events__()
+    ]))
+    return orders
+
+
+@pytest.fixture
+def app():
+    return starlette.applications.Starlette(routes=[
+        starlette.routing.Route(
+            "/export/{application}", gqles.export.export_endpoint,
+        ),
+    ])
+
+
+def parse(body):
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_export_streams_records(orders, app, asgi):
+    created = record_orders(orders, 7)
+
+    response = await asgi(app, "GET", "/export/orders")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in response.headers
+
+    records = parse(response.body)
+    head = records[-1]["id"]
+    assert response.headers["x-export-until"] == str(head)
+    mine = [r for r in records if r["originatorId"] in {
+        str(order.id) for order in created
+    }]
+    assert len(mine) == 7
+    record = mine[0]
+    assert record["originatorVersion"] == 0
+    assert record["topic"] == "example.domain#Order.Created"
+    assert record["timestamp"]
+    event = orders.event_store.event_mapper.event_from_topic_and_state(
+        record["topic"], base64.b64decode(record["state"]),
+    )
+    assert str(event.originator_id) == record["originatorId"]
+
+    # Resuming after the last record exported.
+    more = record_orders(orders, 2)
+    response = await asgi(app, "GET", "/export/orders?after=%d" % head)
+    assert [r["originatorId"] for r in parse(response.body)] == [
+        str(order.id) for order in more
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_bounds_and_chunks(orders, app, asgi):
+    record_orders(orders, 10)
+    records = parse((await asgi(app, "GET", "/export/orders")).body)
+    ids = [r["id"] for r in records]
+
+    chunks = []
+    async for chunk in gqles.export.read_chunks(
+            orders, after=ids[1], until=ids[8], chunk_size=3,
+    ):
+        chunks.append([notification["id"] for notification in chunk])
+    assert chunks == [ids[2:5], ids[5:8], ids[8:9]]
+
+    response = await asgi(
+        app, "GET", "/export/orders?after=%d&until=%d" % (ids[1], ids[8]),
+    )
+    assert [r["id"] for r in parse(response.body)] == ids[2:9]
+
+
+@pytest.mark.asyncio
+async def test_export_gzip(orders, app, asgi):
+    record_orders(orders, 3)
+    plain = (await asgi(app, "GET", "/export/orders")).body
+
+    response = await asgi(
+        app, "GET", "/export/orders",
+        headers=[("Accept-Encoding", "deflate, gzip;q=0.9")],
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == plain
+
+
+@pytest.mark.asyncio
+async def test_export_errors(orders, app, asgi):
+    assert (await asgi(app, "GET", "/export/unknown")).status_code == 404
+    response = await asgi(app, "GET", "/export/orders?after=last")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_stops_when_clients_disconnect():
+    closed = []
+
+    async def chunks():
+        try:
+            for _ in range(1000):
+                await asyncio.sleep(0)
+                yield b"{}\n"
+        finally:
+            closed.append(True)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = gqles.export.ExportResponse(chunks())
+    await response(dict(type="http"), receive, send)
+
+    assert sent[0]["type"] == "http.response.start"
+    assert len(sent) < 10
+    assert closed == [True]
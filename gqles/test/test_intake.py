@@ -0,0 +1,127 @@
+import asyncio
+import uuid
+
+import pytest
+
+from eventsourcing.exceptions import RecordConflictError
+
+import gqles.commands
+import gqles.database
+import gqles.intake
+import gqles.notifications
+
+import example.database
+import example.domain
+import example.policies
+
+
+@pytest.fixture
+def intake():
+    dispatcher = gqles.commands.CommandDispatcher(max_attempts=2, wait=0.001)
+    yield gqles.intake.CommandIntake("commands", dispatcher=dispatcher)
+    dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_commands_are_recorded_together(system_runner, intake):
+    commands = system_runner.processes["commands"]
+
+    command_ids = await asyncio.gather(*(
+        intake.submit(example.domain.CreateOrder.create) for _ in range(5)
+    ))
+
+    notifications = {
+        notification["originator_id"]: notification["id"]
+        for notification in gqles.notifications.read_notifications(
+            commands, with_state=False,
+        )
+        if notification["topic"].endswith("CreateOrder.Created")
+    }
+    ids = sorted(notifications[command_id] for command_id in command_ids)
+    assert ids == list(range(ids[0], ids[0] + 5))
+    # The saga ran for every command.
+    for command_id in command_ids:
+        assert commands.repository[command_id].order_id
+
+
+@pytest.mark.asyncio
+async def test_commands_are_rejected_alone(system_runner, intake):
+
+    def fail():
+        raise ValueError("Invalid command")
+
+    results = await asyncio.gather(
+        intake.submit(example.domain.CreateOrder.create),
+        intake.submit(fail),
+        intake.submit(example.domain.CreateOrder.create),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], ValueError)
+    commands = system_runner.processes["commands"]
+    for command_id in (results[0], results[2]):
+        assert command_id in commands.repository
+
+
+@pytest.mark.asyncio
+async def test_batches_have_a_session_scope_of_their_own(
+        system_runner, intake,
+):
+    session = example.database.ScopedSession
+
+    def fail():
+        raise ValueError("Invalid command")
+
+    async def submit(command):
+        # Like requests, done once their command is.
+        with gqles.database.session_scope(session):
+            return await intake.submit(command)
+
+    results = await asyncio.gather(
+        submit(fail),
+        submit(example.domain.CreateOrder.create),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[0], ValueError)
+    assert results[1] in system_runner.processes["commands"].repository
+    assert not any(
+        isinstance(scope, uuid.UUID) for scope in session.registry.registry
+    )
+
+
+@pytest.mark.asyncio
+async def test_conflicting_commands_are_rejected_alone(system_runner, intake):
+    commands = system_runner.processes["commands"]
+    command_id = example.policies.Commands.create_order()
+
+    def change():
+        # Both changes are made to the same version of the command.
+        command = commands.repository[command_id]
+        command.order_id = command.order_id
+        return command
+
+    results = await asyncio.gather(
+        intake.submit(example.domain.CreateOrder.create),
+        intake.submit(change),
+        intake.submit(change),
+        return_exceptions=True,
+    )
+
+    assert results[0] in commands.repository
+    assert results[1] == command_id
+    assert isinstance(results[2], RecordConflictError)
+
+
+@pytest.mark.asyncio
+async def test_full_batches_do_not_wait(system_runner):
+    intake = gqles.intake.CommandIntake(
+        "commands", window=60, max_batch_size=2,
+    )
+
+    command_ids = await asyncio.wait_for(asyncio.gather(
+        intake.submit(example.domain.CreateOrder.create),
+        intake.submit(example.domain.CreateOrder.create),
+    ), timeout=5)
+
+    assert len(set(command_ids)) == 2
@@ -0,0 +1,79 @@
+import pytest
+
+import starlette.applications
+import starlette.routing
+
+import gqles.metrics
+
+import example.policies
+
+
+APPLICATIONS = """
+query {
+  applications {
+    name
+    lag { upstreamName position head lag }
+    throughput {
+      eventsPerSecond
+      processed
+      policies { eventClass count meanSeconds }
+    }
+  }
+}
+"""
+
+
+def test_throughput_is_averaged_over_the_window():
+    metrics = gqles.metrics.ProcessMetrics(window=10)
+    for now in (100, 100, 105):
+        metrics.record_policy("a", 0.5, now=now)
+
+    assert metrics.get_throughput(now=105) == 0.3
+    assert metrics.get_throughput(now=110) == 0.1
+    assert metrics.get_throughput(now=120) == 0.0
+    assert metrics.processed == 3
+    assert metrics.get_policies() == [("a", 3, 1.5)]
+
+
+@pytest.mark.asyncio
+async def test_applications_report_lag_and_throughput(system_runner, backstage):
+    example.policies.Commands.create_order()
+
+    data = await backstage(APPLICATIONS)
+    applications = {
+        application["name"]: application for application in data["applications"]
+    }
+
+    orders = applications["orders"]
+    upstreams = {lag["upstreamName"]: lag for lag in orders["lag"]}
+    assert set(upstreams) >= {"commands", "reservations", "payments"}
+    for lag in upstreams.values():
+        # The single threaded runner processes everything synchronously.
+        assert lag["position"] == lag["head"]
+        assert lag["lag"] == 0
+
+    throughput = orders["throughput"]
+    assert throughput["processed"] > 0
+    assert throughput["eventsPerSecond"] > 0
+    assert any(
+        policy["eventClass"].endswith("CreateOrder.Created")
+        for policy in throughput["policies"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_prometheus_endpoint(system_runner, asgi):
+    example.policies.Commands.create_order()
+
+    app = starlette.applications.Starlette(routes=[
+        starlette.routing.Route("/metrics", gqles.metrics.prometheus_endpoint),
+    ])
+
+    response = await asgi(app, "GET", "/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.body.decode()
+    assert "# TYPE gqles_process_lag gauge" in text
+    assert 'gqles_process_lag{application="orders",upstream="commands"} 0.0' in text
+    assert 'gqles_policy_seconds_count{application="orders"' in text
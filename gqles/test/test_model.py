@@ -0,0 +1,131 @@
+import uuid
+
+import pydantic
+import pytest
+
+from typing import Optional
+
+from eventsourcing.domain.model.aggregate import AggregateRoot
+from eventsourcing.domain.model.decorators import subclassevents
+
+import gqles.infrastructure
+import gqles.model
+from gqles.model import Model
+
+
+@subclassevents
+class Parent(Model, AggregateRoot):
+
+    name: str
+    parent_id: Optional[uuid.UUID]
+
+
+@subclassevents
+class Child(Parent):
+
+    age: int = 0
+
+
+@subclassevents
+class Bare(Parent):
+    pass
+
+
+def test_fields_are_routed_with_inherited_ones():
+    assert Child.__model_fields__ == {"name", "parent_id", "age"}
+    assert Bare.__model_fields__ == {"name", "parent_id"}
+
+
+def test_inherited_fields_are_managed_by_pydantic():
+    for entity_class in (Child, Bare):
+        entity = entity_class.__create__(name="a")
+        assert entity.parent_id is None
+        assert "parent_id" not in entity.__fields_set__
+
+        parent_id = uuid.uuid4()
+        entity.parent_id = parent_id
+        assert entity.parent_id == parent_id
+        assert "parent_id" in entity.__fields_set__
+
+        # Attributes of eventsourcing are not pydantic fields.
+        assert "_id" not in entity.__fields_set__
+        assert entity.__version__ == 0
+
+
+def test_events_replay_onto_models():
+    child = Child.__create__(name="a", age=3)
+    events = child.__batch_pending_events__()
+
+    replayed = None
+    for event in events:
+        replayed = event.__mutate__(replayed)
+
+    assert replayed.id == child.id
+    assert replayed.name == "a"
+    assert replayed.age == 3
+
+
+validations = []
+
+
+@subclassevents
+class Counted(Model, AggregateRoot):
+
+    name: str
+    parent_id: Optional[uuid.UUID]
+
+    @pydantic.validator("name")
+    def count_validations(cls, value):
+        validations.append(value)
+        return value
+
+
+def test_created_events_hold_validated_values():
+    parent_id = uuid.uuid4()
+    child = Child.__create__(name="a", parent_id=str(parent_id), age="3")
+    created, = child.__batch_pending_events__()
+
+    assert created.parent_id == parent_id
+    assert created.age == 3
+    assert child.parent_id == parent_id
+    assert child.__fields_set__ == {"name", "parent_id", "age"}
+
+
+def test_new_models_are_validated():
+    with pytest.raises(pydantic.ValidationError):
+        Child.__create__(name="a", age="old")
+
+    validations.clear()
+    Counted.__create__(name="a")
+    assert len(validations) == 1
+
+
+def test_trusted_replays_skip_validation():
+    counted = Counted.__create__(name="a")
+    events = counted.__batch_pending_events__()
+
+    validations.clear()
+    with gqles.model.trusted():
+        replayed = events[0].__mutate__(None)
+    assert len(validations) == 0
+    assert not gqles.model.is_trusted()
+
+    assert replayed.name == "a"
+    assert replayed.parent_id is None
+    assert replayed.__fields_set__ == {"name"}
+    assert list(replayed.__dict__)[:2] == ["name", "parent_id"]
+
+    # Fields set later are still tracked.
+    replayed.parent_id = uuid.uuid4()
+    assert replayed.__fields_set__ == {"name", "parent_id"}
+
+
+def test_repositories_replay_trusted():
+    counted = Counted.__create__(name="a")
+    events = counted.__batch_pending_events__()
+
+    validations.clear()
+    repository = gqles.infrastructure.EventSourcedRepository(event_store=None)
+    replayed = repository.project_events(None, events)
+    assert len(validations) == 0
+    assert replayed.id == counted.id
@@ -0,0 +1,285 @@
+import datetime
+import uuid
+
+import pytest
+
+from eventsourcing.application.simple import ProcessEvent
+
+import gqles.rebuild
+import gqles.schema
+
+import example.application
+import example.domain
+import example.policies
+
+
+NOTIFICATIONS = """
+query ($last: Int, $first: Int, $before: String, $after: String) {
+  notifications(last: $last, first: $first, before: $before, after: $after) {
+    pageInfo { hasPreviousPage hasNextPage startCursor endCursor }
+    edges {
+      cursor
+      application { name }
+      node { notificationId event { timestamp } }
+    }
+  }
+}
+"""
+
+
+def keys(page):
+    return [
+        (edge["application"]["name"], edge["node"]["notificationId"])
+        for edge in page["edges"]
+    ]
+
+
+async def read_all(backstage, **kwargs):
+    edges = []
+    page = (await backstage(NOTIFICATIONS, **kwargs))["notifications"]
+    edges.extend(keys(page))
+    while page["pageInfo"]["hasNextPage"]:
+        page = (await backstage(
+            NOTIFICATIONS, first=kwargs.get("first"),
+            after=page["pageInfo"]["endCursor"],
+        ))["notifications"]
+        edges.extend(keys(page))
+    return edges
+
+
+@pytest.mark.asyncio
+async def test_notifications_pages_are_merged_by_timestamp(
+        system_runner, backstage,
+):
+    for _ in range(5):
+        example.policies.Commands.create_order()
+
+    everything = (await backstage(NOTIFICATIONS, first=10000))["notifications"]
+    timestamps = [
+        edge["node"]["event"]["timestamp"] for edge in everything["edges"]
+    ]
+    assert timestamps == sorted(timestamps)
+    assert len(set(keys(everything))) == len(everything["edges"])
+
+    # Paging forwards with small pages visits everything exactly once.
+    assert await read_all(backstage, first=3) == keys(everything)
+
+    # Paging backwards from the head visits everything exactly once.
+    edges = []
+    page = (await backstage(NOTIFICATIONS, last=4))["notifications"]
+    edges[:0] = keys(page)
+    while page["pageInfo"]["hasPreviousPage"]:
+        page = (await backstage(
+            NOTIFICATIONS, last=4, before=page["pageInfo"]["startCursor"],
+        ))["notifications"]
+        edges[:0] = keys(page)
+    assert edges == keys(everything)
+
+
+@pytest.mark.asyncio
+async def test_notifications_only_decodes_what_it_emits(
+        system_runner, backstage, monkeypatch,
+):
+    for _ in range(5):
+        example.policies.Commands.create_order()
+
+    decoded = []
+    for application in system_runner.processes.values():
+        mapper = application.event_store.event_mapper
+        original = mapper.event_from_topic_and_state
+
+        def counting(topic, state, original=original):
+            decoded.append(topic)
+            return original(topic, state)
+
+        monkeypatch.setattr(mapper, "event_from_topic_and_state", counting)
+
+    page = (await backstage(NOTIFICATIONS, last=3))["notifications"]
+    assert len(page["edges"]) == 3
+    assert len(decoded) <= 3 + len(system_runner.processes)
+
+
+APPLICATION_NOTIFICATIONS = """
+query ($first: Int, $last: Int, $after: String, $before: String) {
+  applications {
+    name
+    notifications(first: $first, last: $last, after: $after, before: $before) {
+      pageInfo { hasPreviousPage hasNextPage startCursor endCursor }
+      edges { node { notificationId } }
+    }
+  }
+}
+"""
+
+
+async def application_notifications(backstage, name, **kwargs):
+    data = await backstage(APPLICATION_NOTIFICATIONS, **kwargs)
+    for application in data["applications"]:
+        if application["name"] == name:
+            return application["notifications"]
+
+
+@pytest.mark.asyncio
+async def test_application_notifications_use_keyset_reads(
+        system_runner, backstage, statements,
+):
+    for _ in range(3):
+        example.policies.Commands.create_order()
+
+    statements.clear()
+    page = await application_notifications(backstage, "commands", first=4)
+    ids = [edge["node"]["notificationId"] for edge in page["edges"]]
+    assert ids == [1, 2, 3, 4]
+    assert page["pageInfo"]["hasNextPage"]
+    assert not page["pageInfo"]["hasPreviousPage"]
+
+    # One range read per application, and no reads of the log's head.
+    reads = [s for s in statements if "stored_events.notification_id" in s]
+    assert len(reads) == len(system_runner.processes)
+    assert all("LIMIT" in s and "max(" not in s for s in reads)
+
+    following = await application_notifications(
+        backstage, "commands", first=4, after=page["pageInfo"]["endCursor"],
+    )
+    assert following["edges"][0]["node"]["notificationId"] == 5
+    assert following["pageInfo"]["hasPreviousPage"]
+
+    previous = await application_notifications(
+        backstage, "commands", last=2,
+        before=following["pageInfo"]["startCursor"],
+    )
+    assert [
+        edge["node"]["notificationId"] for edge in previous["edges"]
+    ] == [3, 4]
+    assert previous["pageInfo"]["hasPreviousPage"]
+    assert previous["pageInfo"]["hasNextPage"]
+
+
+WINDOW = """
+query ($from: Datetime, $to: Datetime) {
+  notifications(first: 1000, from: $from, to: $to) {
+    edges { application { name } node { notificationId event { timestamp } } }
+  }
+  applications {
+    name
+    notifications(first: 1000, from: $from, to: $to) {
+      edges { node { notificationId } }
+    }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_notifications_in_time_window(system_runner, backstage):
+    example.policies.Commands.create_order()
+    since = datetime.datetime.now(datetime.timezone.utc)
+    for _ in range(3):
+        example.policies.Commands.create_order()
+    until = datetime.datetime.now(datetime.timezone.utc)
+    example.policies.Commands.create_order()
+
+    data = await backstage(
+        WINDOW, **{"from": since.isoformat(), "to": until.isoformat()},
+    )
+
+    edges = data["notifications"]["edges"]
+    # Three orders, with the events of every application they went through.
+    assert len(edges) > 3 * 3
+    for edge in edges:
+        timestamp = datetime.datetime.fromisoformat(
+            edge["node"]["event"]["timestamp"],
+        )
+        assert since <= timestamp < until
+
+    # The applications' own notifications add up to the merged ones.
+    assert sorted(keys(data["notifications"])) == sorted(
+        (application["name"], edge["node"]["notificationId"])
+        for application in data["applications"]
+        for edge in application["notifications"]["edges"]
+    )
+
+
+METADATA = """
+query ($from: Datetime) {
+  notifications(first: 100, from: $from) {
+    edges { application { name } node { notificationId topic } }
+  }
+}
+"""
+
+
+@pytest.fixture
+def unindexed(monkeypatch):
+    """
+    Two applications, with events recorded before they had a timestamp
+    index.
+    """
+    applications = {}
+    for name in ("first", "second"):
+        application = example.application.Application(
+            name="%s-%s" % (name, uuid.uuid4().hex[:8]), setup_table=True,
+        )
+        for _ in range(2):
+            order = example.domain.Order.create(command_id=uuid.uuid4())
+            application.record_process_event(ProcessEvent(
+                domain_events=order.__batch_pending_events__(),
+            ))
+        index = application.event_store.timestamps
+        session = application.session
+        session.query(index.record_class).filter(
+            index.record_class.application_name == application.name,
+        ).delete(synchronize_session=False)
+        session.commit()
+        applications[application.name] = application
+
+    async def get_system_runner():
+        return type("Runner", (), dict(processes=applications))
+
+    monkeypatch.setattr(gqles.schema, "get_system_runner", get_system_runner)
+    yield applications
+    for application in applications.values():
+        application.close()
+
+
+@pytest.mark.asyncio
+async def test_merged_metadata_of_unindexed_events(
+        unindexed, backstage, statements,
+):
+    data = await backstage(METADATA)
+    assert len(data["notifications"]["edges"]) == 4
+    # The states are read one by one, for their timestamps.
+    assert not any(
+        "stored_events.state" in statement and "LIMIT" in statement
+        for statement in statements
+    )
+
+    for application in unindexed.values():
+        gqles.rebuild.rebuild(application)
+
+    statements.clear()
+    data = await backstage(METADATA)
+    assert len(data["notifications"]["edges"]) == 4
+    assert not any(
+        "stored_events.state" in statement for statement in statements
+    )
+
+
+@pytest.mark.asyncio
+async def test_time_windows_of_rebuilt_indexes(unindexed, backstage):
+    since = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    data = await backstage(METADATA, **{"from": since.isoformat()})
+    assert data["notifications"]["edges"] == []
+
+    reports = [
+        gqles.rebuild.rebuild(application)
+        for application in unindexed.values()
+    ]
+    assert [report["indexedTimestamps"] for report in reports] == [2, 2]
+    # Rebuilding again adds nothing.
+    assert gqles.rebuild.rebuild(
+        next(iter(unindexed.values())),
+    )["indexedTimestamps"] == 0
+
+    data = await backstage(METADATA, **{"from": since.isoformat()})
+    assert len(data["notifications"]["edges"]) == 4
@@ -0,0 +1,112 @@
+import functools
+
+import pytest
+
+import ariadne.asgi
+
+import gqles
+import gqles.profiling
+
+import example.policies
+import example.schema
+
+
+NOTIFICATIONS = """
+query {
+  notifications(applicationNames: ["commands"], last: 5) {
+    edges { node { notificationId event { timestamp } } }
+  }
+}
+"""
+
+CREATE_ORDER = """
+mutation { createOrder(input: {}) { created { uuid } } }
+"""
+
+
+def test_statement_shapes():
+    assert gqles.profiling.get_statement_shape(
+        "SELECT a\n  FROM t WHERE id IN (?, ?, ?)",
+    ) == gqles.profiling.get_statement_shape(
+        "SELECT a FROM t WHERE id IN (?)",
+    ) == "SELECT a FROM t WHERE id IN (?)"
+
+
+@pytest.mark.asyncio
+async def test_profile_is_reported_with_the_header(system_runner, asgi):
+    example.policies.Commands.create_order()
+    app = gqles.BackstageGraphQL(profiling=True)
+
+    response = await asgi(app, "POST", "/", dict(query=NOTIFICATIONS))
+    assert "profile" not in response.json().get("extensions", {})
+
+    response = await asgi(
+        app, "POST", "/", dict(query=NOTIFICATIONS),
+        headers=[(gqles.profiling.PROFILE_HEADER, "1")],
+    )
+    profile = response.json()["extensions"]["profile"]
+
+    paths = {resolver["path"] for resolver in profile["resolvers"]}
+    assert "notifications" in paths
+    assert "notifications.edges.*.node.event.timestamp" in paths
+    assert profile["sql"]["count"] > 0
+    assert profile["sql"]["count"] == sum(
+        statement["count"] for statement in profile["sql"]["statements"]
+    )
+    assert profile["sql"]["nPlusOne"] == []
+
+
+def test_repeated_statements_are_flagged():
+    profile = gqles.profiling.Profile(n_plus_one_threshold=2)
+    for i in range(3):
+        profile.add_statement("SELECT a FROM t WHERE id = ?", 0.001)
+    profile.add_statement("SELECT b FROM t WHERE id IN (?, ?)", 0.001)
+    profile.add_statement("SELECT b FROM t WHERE id IN (?, ?, ?)", 0.001)
+
+    sql = profile.report()["sql"]
+    assert sql["count"] == 5
+    assert sql["nPlusOne"] == [
+        dict(statement="SELECT a FROM t WHERE id = ?", count=3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batched_events_are_not_flagged(system_runner, asgi):
+    command_ids = [example.policies.Commands.create_order() for _ in range(3)]
+    app = gqles.BackstageGraphQL(extensions=[functools.partial(
+        gqles.profiling.ProfilingExtension, n_plus_one_threshold=1,
+    )])
+    query = "query {%s}" % " ".join(
+        """
+        e%d: event(
+          applicationName: "commands", originatorId: "%s", originatorVersion: 1,
+        ) { topic }
+        """ % (i, command_id)
+        for i, command_id in enumerate(command_ids)
+    )
+
+    response = await asgi(
+        app, "POST", "/", dict(query=query),
+        headers=[(gqles.profiling.PROFILE_HEADER, "1")],
+    )
+
+    profile = response.json()["extensions"]["profile"]
+    assert profile["sql"]["count"] > 0
+    assert profile["sql"]["nPlusOne"] == []
+
+
+@pytest.mark.asyncio
+async def test_app_schemas_can_be_profiled(system_runner, asgi):
+    app = ariadne.asgi.GraphQL(
+        example.schema.schema,
+        extensions=[gqles.profiling.ProfilingExtension],
+    )
+
+    response = await asgi(
+        app, "POST", "/", dict(query=CREATE_ORDER),
+        headers=[(gqles.profiling.PROFILE_HEADER, "1")],
+    )
+
+    profile = response.json()["extensions"]["profile"]
+    assert profile["resolvers"][0]["path"] == "createOrder"
+    assert profile["sql"]["count"] > 0
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+import sqlalchemy
+import sqlalchemy.orm
+
+import gqles.application
+import gqles.metrics
+
+import example.application
+import example.policies
+
+
+NOTIFICATIONS = """
+query {
+  notifications(last: 100) { edges { node { topic event { applicationName } } } }
+}
+"""
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError):
+        gqles.application.get_runner_class("fibers")
+
+
+@pytest.fixture
+def file_application(tmp_path):
+    # The runner's threads can not share an in-memory database.
+    engine = sqlalchemy.create_engine(
+        "sqlite:///%s" % (tmp_path / "example.sqlite"),
+        connect_args=dict(check_same_thread=False),
+    )
+    session = sqlalchemy.orm.scoped_session(
+        sqlalchemy.orm.sessionmaker(bind=engine),
+        scopefunc=threading.get_ident,
+    )
+
+    class FileApplication(example.application.Application):
+        def __init__(self, session=None, **kwargs):
+            super().__init__(session=session or default_session, **kwargs)
+
+    default_session = session
+    yield FileApplication
+    session.remove()
+    engine.dispose()
+
+
+async def wait_until_processed(processes, timeout=10):
+    """
+    Wait until every application has caught up with the applications it
+    follows, twice in a row with the same heads: lag is not read from
+    all the applications at once.
+    """
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    previous = None
+    while True:
+        lag = [
+            (position, head)
+            for application in processes.values()
+            for _, position, head in gqles.metrics.get_lag(application, processes)
+        ]
+        caught_up = all(position == head for position, head in lag)
+        if caught_up and lag == previous or loop.time() > deadline:
+            return caught_up
+        previous = lag
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_threaded_runner(file_application, backstage):
+    runner = await gqles.application.start_system_runner(
+        gqles.application.make_system_runner(
+            example.policies.system,
+            mode=gqles.application.THREADS,
+            infrastructure_class=file_application,
+            setup_tables=True,
+        ),
+    )
+    try:
+        assert set(runner.threads) == set(runner.processes)
+        example.policies.Commands.create_order()
+
+        # The saga runs in the background. Tracking records are written
+        # with the events they cause, so once every application has
+        # caught up with the applications it follows, it is done.
+        assert await wait_until_processed(runner.processes)
+
+        data = await backstage(NOTIFICATIONS)
+        names = {
+            edge["node"]["event"]["applicationName"]
+            for edge in data["notifications"]["edges"]
+        }
+        assert names == {"commands", "orders", "reservations", "payments"}
+    finally:
+        await gqles.application.close_system_runner()
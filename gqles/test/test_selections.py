@@ -0,0 +1,68 @@
+import pytest
+
+import gqles.cache
+
+import example.policies
+
+
+NOTIFICATIONS = """
+query {
+  notifications(applicationNames: ["commands"], last: 10) {
+    edges { node { ...metadata } }
+  }
+}
+
+fragment metadata on Notification {
+  notificationId
+  topic
+  event { originatorVersion }
+}
+"""
+
+
+def reads_state(statements):
+    return any("stored_events.state" in statement for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_metadata_is_listed_without_decoding(
+        system_runner, backstage, statements,
+):
+    for _ in range(3):
+        example.policies.Commands.create_order()
+    misses = gqles.cache.event_cache.misses
+
+    statements.clear()
+    data = await backstage(NOTIFICATIONS)
+
+    assert len(data["notifications"]["edges"]) == 10
+    assert not reads_state(statements)
+    assert gqles.cache.event_cache.misses == misses
+
+
+@pytest.mark.asyncio
+async def test_event_tiers(system_runner, backstage, statements):
+    command_id = example.policies.Commands.create_order()
+    query = """
+    query ($id: UUID!) {
+      event(
+        applicationName: "commands", originatorId: $id, originatorVersion: 1,
+      ) { %s }
+    }
+    """
+
+    statements.clear()
+    data = await backstage(query % "topic", id=str(command_id))
+    assert data["event"]["topic"]
+    assert not reads_state(statements)
+
+    misses = gqles.cache.event_cache.misses
+    statements.clear()
+    data = await backstage(query % "state", id=str(command_id))
+    assert data["event"]["state"]
+    assert reads_state(statements)
+    assert gqles.cache.event_cache.misses == misses
+
+    data = await backstage(query % "timestamp", id=str(command_id))
+    assert data["event"]["timestamp"]
+    assert gqles.cache.event_cache.misses == misses + 1
@@ -0,0 +1,206 @@
+import datetime
+import decimal
+import uuid
+
+import pytest
+
+from eventsourcing.application.simple import ProcessEvent
+from eventsourcing.domain.model.aggregate import AggregateRoot
+from eventsourcing.domain.model.decorators import subclassevents
+
+import gqles.schema
+import gqles.snapshots
+from gqles.model import Model
+
+import example.application
+
+
+@subclassevents
+class Counter(Model, AggregateRoot):
+
+    name: str
+    count: int = 0
+
+    class Incremented(AggregateRoot.Event):
+        def mutate(self, counter: "Counter"):
+            counter.count += 1
+
+    def increment(self):
+        self.__trigger_event__(Counter.Incremented)
+
+
+def record(application, aggregate):
+    application.record_process_event(ProcessEvent(
+        domain_events=aggregate.__batch_pending_events__(),
+    ))
+
+
+@pytest.fixture
+def counters():
+    application = example.application.Application(
+        name="counters-%s" % uuid.uuid4().hex,
+        snapshotting=gqles.snapshots.EveryNEvents(4),
+        setup_table=True,
+    )
+    yield application
+    application.close()
+
+
+def test_model_snapshots_round_trip():
+    counter = Counter.__create__(name="a")
+    counter.increment()
+
+    strategy = gqles.snapshots.SnapshotStrategy(snapshot_store=None)
+    snapshot = gqles.snapshots.ModelSnapshot(
+        originator_id=counter.id,
+        originator_version=counter.__version__,
+        topic="gqles.test.test_snapshots#Counter",
+        state=gqles.snapshots.get_snapshot_state(counter),
+    )
+    restored = snapshot.__mutate__(None)
+
+    assert isinstance(restored, Counter)
+    assert restored.count == 1
+    assert restored.name == "a"
+    assert restored.__fields_set__ == counter.__fields_set__
+    assert restored.__version__ == counter.__version__
+    assert strategy.snapshot_store is None
+
+
+def test_every_n_events_rejects_empty_periods():
+    with pytest.raises(ValueError):
+        gqles.snapshots.EveryNEvents(0)
+
+
+def test_aggregates_are_snapshotted_and_loaded_from_snapshots(counters):
+    counter = Counter.__create__(name="a")
+    for _ in range(9):
+        counter.increment()
+    record(counters, counter)
+
+    # Versions 3 and 7 are snapshotted.
+    snapshot = counters.snapshot_strategy.get_snapshot(counter.id)
+    assert snapshot.originator_version == 7
+
+    loaded = counters.repository[counter.id]
+    assert loaded.count == 9
+    assert loaded.__version__ == 9
+
+    aggregate, snapshot_version, replayed = gqles.snapshots.get_state_at(
+        counters, counter.id, version=5,
+    )
+    assert aggregate.count == 5
+    assert snapshot_version == 3
+    assert replayed == 2
+
+    aggregate, snapshot_version, replayed = gqles.snapshots.get_state_at(
+        counters, counter.id, version=2,
+    )
+    assert aggregate.count == 2
+    assert snapshot_version is None
+    assert replayed == 3
+
+
+def test_size_threshold_snapshots(counters):
+    counters.snapshotting = gqles.snapshots.SizeThreshold(1)
+    counter = Counter.__create__(name="a")
+    record(counters, counter)
+    assert counters.snapshot_strategy.get_snapshot(
+        counter.id,
+    ).originator_version == 0
+
+    counters.snapshotting = gqles.snapshots.SizeThreshold(10 ** 6)
+    counter.increment()
+    record(counters, counter)
+    assert counters.snapshot_strategy.get_snapshot(
+        counter.id,
+    ).originator_version == 0
+
+
+STATE_AT = """
+query ($originatorId: UUID!, $version: Int, $timestamp: Datetime) {
+  applications {
+    name
+    originator(originatorId: $originatorId) {
+      stateAt(version: $version, timestamp: $timestamp) {
+        originatorVersion snapshotVersion replayedEvents
+        stateInsight { key text }
+      }
+    }
+  }
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_state_at_query(counters, backstage, monkeypatch):
+    async def get_system_runner():
+        return type("Runner", (), dict(processes={counters.name: counters}))
+
+    monkeypatch.setattr(gqles.schema, "get_system_runner", get_system_runner)
+
+    counter = Counter.__create__(name="a")
+    for _ in range(5):
+        counter.increment()
+    record(counters, counter)
+
+    async def state_at(**variables):
+        data = await backstage(
+            STATE_AT, originatorId=str(counter.id), **variables,
+        )
+        state = data["applications"][0]["originator"]["stateAt"]
+        if state is not None:
+            state["stateInsight"] = {
+                insight["key"]: insight["text"]
+                for insight in state["stateInsight"]
+            }
+        return state
+
+    state = await state_at(version=4)
+    assert state["originatorVersion"] == 4
+    assert state["snapshotVersion"] == 3
+    assert state["replayedEvents"] == 1
+    assert state["stateInsight"]["count"] == "4"
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    state = await state_at(timestamp=now.isoformat())
+    assert state["originatorVersion"] == 5
+    assert state["stateInsight"]["count"] == "5"
+
+    before = now - datetime.timedelta(days=1)
+    assert await state_at(timestamp=before.isoformat()) is None
+
+
+def test_timestamp_insights_keep_microseconds():
+    insight = gqles.schema.get_state_insight(
+        "timestamp", decimal.Decimal("1600000000.123456"),
+    )
+    assert insight["datetime"] == datetime.datetime(
+        2020, 9, 13, 12, 26, 40, 123456, tzinfo=datetime.timezone.utc,
+    )
+
+
+def test_size_threshold_counts_the_events_of_its_application(counters):
+    others = example.application.Application(
+        name="counters-%s" % uuid.uuid4().hex, setup_table=True,
+    )
+    try:
+        counter = Counter.__create__(name="a")
+        counter.increment()
+        events = counter.__batch_pending_events__()
+        for application in (counters, others):
+            application.record_process_event(
+                ProcessEvent(domain_events=events),
+            )
+
+        size = sum(
+            len(item.state)
+            for item in counters.event_store.record_manager.get_items(
+                counter.id,
+            )
+        )
+        assert gqles.snapshots.SizeThreshold(1).get_size_since(
+            counters, counter.id, None,
+        ) == size
+    finally:
+        others.close()
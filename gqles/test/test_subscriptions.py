@@ -0,0 +1,169 @@
+import asyncio
+import threading
+
+import pytest
+
+import ariadne
+
+from eventsourcing.application.simple import PromptToPull
+
+import gqles.database
+import gqles.notifications
+import gqles.schema
+import gqles.tailing
+
+import example.policies
+
+
+SUBSCRIPTION = """
+subscription ($after: String) {
+  notifications(after: $after) {
+    cursor
+    application { name }
+    node { notificationId topic }
+  }
+}
+"""
+
+
+async def subscribe(**variables):
+    success, results = await ariadne.subscribe(
+        gqles.schema.schema,
+        dict(query=SUBSCRIPTION, variables=variables),
+        context_value={},
+    )
+    assert success, results
+    return results
+
+
+async def take(results, count):
+    edges = []
+    async for result in results:
+        assert "errors" not in result, result
+        edges.append(result.data["notifications"])
+        if len(edges) == count:
+            return edges
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_one_tailer_per_application(system_runner):
+    first = await subscribe()
+    second = await subscribe()
+
+    # Subscriptions only start once the first result is awaited. Tailers
+    # read concurrently, so all the events of the order are taken.
+    first_edges = asyncio.ensure_future(take(first, 6))
+    second_edges = asyncio.ensure_future(take(second, 6))
+    await asyncio.sleep(0.1)
+
+    tailers = [
+        gqles.tailing.get_tailer(application)
+        for application in system_runner.processes.values()
+    ]
+    assert all(len(tailer.subscribers) == 2 for tailer in tailers)
+
+    example.policies.Commands.create_order()
+
+    first_edges = await asyncio.wait_for(first_edges, 5)
+    second_edges = await asyncio.wait_for(second_edges, 5)
+
+    topics = [edge["node"]["topic"] for edge in first_edges]
+    assert "example.domain#CreateOrder.Created" in topics
+    assert first_edges == second_edges
+
+    tasks = [tailer._task for tailer in tailers]
+    await first.aclose()
+    await second.aclose()
+    await asyncio.sleep(0)
+    assert all(not tailer.subscribers for tailer in tailers)
+    # Tailers stop once their last read is done.
+    await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+
+@pytest.mark.asyncio
+async def test_subscriptions_catch_up_from_cursor(system_runner, backstage):
+    example.policies.Commands.create_order()
+
+    page = await backstage("""
+    { notifications(first: 10000) { edges { cursor } } }
+    """)
+    edges = page["notifications"]["edges"]
+
+    results = await subscribe(after=edges[-4]["cursor"])
+    caught_up = await asyncio.wait_for(take(results, 3), 5)
+    await results.aclose()
+
+    assert [edge["cursor"] for edge in caught_up] == [
+        edge["cursor"] for edge in edges[-3:]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_subscriptions_catch_up_in_worker_threads(
+        system_runner, backstage, monkeypatch,
+):
+    monkeypatch.setattr(gqles.schema, "CATCH_UP_CHUNK_SIZE", 2)
+    merge_notifications = gqles.notifications.merge_notifications
+    threads = []
+
+    def merge_in_thread(*args, **kwargs):
+        for item in merge_notifications(*args, **kwargs):
+            threads.append(threading.get_ident())
+            yield item
+
+    example.policies.Commands.create_order()
+
+    page = await backstage("""
+    { notifications(first: 10000) { edges { cursor } } }
+    """)
+    edges = page["notifications"]["edges"]
+
+    monkeypatch.setattr(
+        gqles.notifications, "merge_notifications", merge_in_thread,
+    )
+    results = await subscribe(after=edges[-6]["cursor"])
+    caught_up = await asyncio.wait_for(take(results, 5), 5)
+    await results.aclose()
+
+    assert [edge["cursor"] for edge in caught_up] == [
+        edge["cursor"] for edge in edges[-5:]
+    ]
+    assert len(threads) == 5
+    assert threading.get_ident() not in threads
+
+
+def test_tailers_are_not_prompted_once_their_loop_is_closed():
+    application = type("Application", (), dict(name="orders"))()
+    tailer = gqles.tailing.NotificationTailer(application)
+    tailer._loop = asyncio.new_event_loop()
+    tailer._wakeup = asyncio.Event()
+    tailer._loop.close()
+
+    # Writers publish prompts whatever the state of the backstage.
+    tailer._on_prompt(PromptToPull(application.name, 0))
+
+
+@pytest.mark.asyncio
+async def test_tailers_read_in_a_session_scope_of_their_own(system_runner):
+    application = system_runner.processes["orders"]
+    tailer = gqles.tailing.NotificationTailer(application)
+    read_notifications = tailer._read_notifications
+    scopes = []
+
+    def record_scope():
+        scopes.append(gqles.database.get_current_scope())
+        return read_notifications()
+
+    tailer._read_notifications = record_scope
+    queue = asyncio.Queue()
+    with gqles.database.session_scope():
+        subscriber_scope = gqles.database.get_current_scope()
+        tailer.subscribe(queue)
+    task = tailer._task
+    await asyncio.sleep(0.1)
+    tailer.unsubscribe(queue)
+    await asyncio.wait_for(task, 5)
+
+    assert scopes
+    assert subscriber_scope not in scopes
+    assert len(set(scopes)) == 1
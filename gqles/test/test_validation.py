@@ -0,0 +1,70 @@
+import pytest
+
+import ariadne
+
+import gqles.schema
+import gqles.validation
+
+
+NESTED = """
+query ($last: Int) {
+  notifications(last: $last) {
+    edges {
+      node {
+        event {
+          previousEvents(last: 5) {
+            edges { node { nextEvents { edges { node { originatorVersion } } } } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+async def execute(query, max_cost=100000, max_depth=100, **variables):
+    context = {}
+    _, result = await ariadne.graphql(
+        gqles.schema.schema,
+        dict(query=query, variables=variables),
+        context_value=context,
+        validation_rules=gqles.validation.get_validation_rules(
+            max_cost, max_depth,
+        ),
+        extensions=[gqles.validation.QueryCostExtension],
+    )
+    return result
+
+
+@pytest.mark.asyncio
+async def test_cost_multiplies_connections_by_nesting(system_runner):
+    result = await execute(NESTED, last=10)
+
+    assert "errors" not in result, result
+    # 10 notifications, each with 5 previous events, each with the
+    # default of 20 next events.
+    assert result["extensions"]["cost"]["requestedQueryCost"] == (
+        10 + 10 * 5 + 10 * 5 * 20
+    )
+    assert result["extensions"]["cost"]["depth"] == 11
+
+
+@pytest.mark.asyncio
+async def test_expensive_queries_are_rejected_with_their_cost(system_runner):
+    result = await execute(NESTED, max_cost=1000, last=10)
+
+    [error] = result["errors"]
+    assert error["extensions"]["cost"] == dict(
+        requestedQueryCost=1060, maximumAvailable=1000,
+    )
+    assert "data" not in result
+
+
+@pytest.mark.asyncio
+async def test_deep_queries_are_rejected(system_runner):
+    result = await execute(NESTED, max_depth=8, last=1)
+
+    [error] = result["errors"]
+    assert "maximum depth of 8" in error["message"]
+    assert error["extensions"]["cost"]["depth"] == 11
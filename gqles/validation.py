@@ -0,0 +1,158 @@
+import functools
+
+from graphql import GraphQLError
+from graphql.language import FieldNode, FragmentSpreadNode
+from graphql.validation import ValidationRule
+
+import ariadne.types
+import ariadne.validation.query_cost
+
+
+DEFAULT_MAX_COST = 10000
+DEFAULT_MAX_DEPTH = 15
+
+# Every field that reads from the event stores costs one read, and
+# connections multiply the cost of what they contain by their page size.
+CONNECTION = {"complexity": 1, "multipliers": ["first", "last"]}
+READ = {"complexity": 1}
+
+COST_MAP = {
+    "Query": {
+        "applications": READ,
+        "notifications": CONNECTION,
+        "event": READ,
+        "insights": {"complexity": 1, "multipliers": ["uuids"]},
+        "originators": CONNECTION,
+    },
+    "Application": {
+        "originator": READ,
+        "notifications": CONNECTION,
+    },
+    "Originator": {
+        "last": READ,
+        "events": CONNECTION,
+    },
+    "Event": {
+        "previousEvents": CONNECTION,
+        "nextEvents": CONNECTION,
+    },
+}
+
+REPORT_KEY = "queryCost"
+
+
+class CostValidator(ariadne.validation.query_cost.CostValidator):
+    """
+    Cost validator for the backstage schema.
+
+    Connections are sized by `first` if it is given, and `last`
+    otherwise, rather than by their sum. The computed cost is written
+    to `report`, rejected or not.
+    """
+
+    def __init__(self, context, maximum_cost, *, report=None, **kwargs):
+        super().__init__(context, maximum_cost, **kwargs)
+        self.report = report if report is not None else {}
+
+    def get_multipliers_from_string(self, multipliers, field_args):
+        multipliers = super().get_multipliers_from_string(
+            multipliers, field_args,
+        )
+        return [
+            multiplier for multiplier in multipliers if multiplier is not None
+        ][:1]
+
+    def leave_operation_definition(self, node, key, parent, path, ancestors):
+        self.report.update(
+            requestedQueryCost=self.cost,
+            maximumAvailable=self.maximum_cost,
+        )
+        super().leave_operation_definition(node, key, parent, path, ancestors)
+
+
+class DepthValidator(ValidationRule):
+    """
+    Reject operations that nest fields deeper than `maximum_depth`.
+    """
+
+    def __init__(self, context, maximum_depth, *, report=None):
+        super().__init__(context)
+        self.maximum_depth = maximum_depth
+        self.report = report if report is not None else {}
+
+    def compute_depth(self, selection_set, fragments=()):
+        if selection_set is None:
+            return 0
+        depth = 0
+        for node in selection_set.selections:
+            if isinstance(node, FieldNode):
+                depth = max(depth, 1 + self.compute_depth(
+                    node.selection_set, fragments,
+                ))
+            elif isinstance(node, FragmentSpreadNode):
+                # Fragment cycles are reported by another rule.
+                name = node.name.value
+                fragment = self.context.get_fragment(name)
+                if fragment is not None and name not in fragments:
+                    depth = max(depth, self.compute_depth(
+                        fragment.selection_set, (*fragments, name),
+                    ))
+            else:
+                depth = max(depth, self.compute_depth(
+                    node.selection_set, fragments,
+                ))
+        return depth
+
+    def enter_operation_definition(self, node, *args):
+        depth = self.compute_depth(node.selection_set)
+        self.report.update(depth=depth, maximumDepth=self.maximum_depth)
+        if depth > self.maximum_depth:
+            self.report_error(GraphQLError(
+                "The query exceeds the maximum depth of %d. Actual depth is %d"
+                % (self.maximum_depth, depth),
+                node,
+                extensions={"cost": dict(self.report)},
+            ))
+
+
+def get_validation_rules(max_cost=DEFAULT_MAX_COST, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Return validation rules enforcing a maximum cost and depth.
+
+    The rules need the request's variables, so this returns a callable
+    to be passed as `validation_rules` to ariadne. The computed cost is
+    kept in the context, see QueryCostExtension.
+    """
+
+    def validation_rules(context_value, document, data):
+        report = {}
+        if isinstance(context_value, dict):
+            report = context_value.setdefault(REPORT_KEY, report)
+
+        return [
+            functools.partial(
+                CostValidator,
+                maximum_cost=max_cost,
+                variables=data.get("variables"),
+                cost_map=COST_MAP,
+                report=report,
+            ),
+            functools.partial(
+                DepthValidator,
+                maximum_depth=max_depth,
+                report=report,
+            ),
+        ]
+
+    return validation_rules
+
+
+class QueryCostExtension(ariadne.types.Extension):
+    """
+    Report the computed cost of queries in the response's extensions.
+    """
+
+    def format(self, context):
+        if isinstance(context, dict) and context.get(REPORT_KEY):
+            return {"cost": context[REPORT_KEY]}
+        return None